@@ -11,6 +11,7 @@
 
 import logging
 
+import astropy.io.fits as fits
 import numina.datamodel as dm
 from numina.keydef import QueryAttribute
 
@@ -40,6 +41,9 @@ class EmirDataModel(dm.DataModel):
         "insconf": QueryAttribute("insconf", str),
     }
 
+    # data access policy: images stored in files are memory-mapped
+    memmap = True
+
     def __init__(self):
         defaults = self.default_mappings()
         # FIXME: this should be computed
@@ -74,6 +78,66 @@ class EmirDataModel(dm.DataModel):
         img[0].header["NUMUTC2"] = time2.isoformat()
         return img
 
+    def open_image(self, filename):
+        """Open a FITS file following the data access policy.
+
+        The file is opened in readonly mode, memory-mapped if
+        'memmap' is True (astropy maps the data copy-on-write, so
+        that the file is never modified). Scaled data (BZERO, BSCALE)
+        are decoded when accessed.
+
+        """
+        # with memmap=None, astropy does not memory-map scaled data
+        return fits.open(
+            filename, mode="readonly", memmap=None if self.memmap else False
+        )
+
+    def open_frame(self, frame):
+        """Open the image of a DataFrame, without copying its data.
+
+        The returned HDUList must not be modified, in-memory images
+        are returned as they are.
+
+        """
+        if frame.frame is not None:
+            return frame.frame
+        return self.open_image(frame.filename)
+
+    def read_frame(self, frame):
+        """Private, writeable copy of the image of a DataFrame.
+
+        Images stored in files are read following the data access
+        policy, and their data are shared with the file: memory pages
+        are only copied when they are written. In-memory images are
+        copied.
+
+        """
+        if frame.frame is not None:
+            return fits.HDUList([hdu.copy() for hdu in frame.frame])
+        with self.open_image(frame.filename) as hdulist:
+            return fits.HDUList([_share_hdu(hdu) for hdu in hdulist])
+
+    def copy_hdulist(self, hdulist):
+        """Copy of an HDUList sharing the data of its image extensions.
+
+        The headers are copied, and the data of the image extensions
+        are read-only views of the original data (they must be
+        replaced, not modified in place). Other extensions are copied.
+
+        """
+        return fits.HDUList([_share_hdu(hdu, readonly=True) for hdu in hdulist])
+
+
+def _share_hdu(hdu, readonly=False):
+    """Copy of an HDU with the same (or a read-only view of the) data"""
+    if not isinstance(hdu, (fits.PrimaryHDU, fits.ImageHDU)):
+        return hdu.copy()
+    data = hdu.data
+    if readonly and data is not None:
+        data = data.view()
+        data.flags.writeable = False
+    return hdu.__class__(data=data, header=hdu.header.copy())
+
 
 def get_mecs_header(hdulist):
     if "MECS" in hdulist:
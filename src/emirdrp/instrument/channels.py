@@ -49,6 +49,9 @@ CHANNELS_READOUT = list(braid(_CH3, _CH4, _CH1, _CH2))
 RCHANNELS_1 = [chan for chans in [_CH3, _CH1, _CH2, _CH4] for chan in chans]
 FULL = RCHANNELS_1
 
+# Channels of the H2RG detector (32 columns of 64 pixels)
+H2RG_FULL = [(slice(0, 2048), slice(i * 64, (i + 1) * 64)) for i in range(32)]
+
 
 # Quadrants are listed starting at left-top and counter-clockwise then
 QUADRANTS = [(_P2, _P1), (_P1, _P1), (_P1, _P2), (_P2, _P2)]
@@ -0,0 +1,146 @@
+#
+# Copyright 2024 Universidad Complutense de Madrid
+#
+# This file is part of PyEmir
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+# License-Filename: LICENSE.txt
+#
+
+"""Channel layout of the EMIR detectors"""
+
+import numpy as np
+
+import emirdrp.instrument.channels as channels
+
+# shape of the EMIR detectors
+DETECTOR_SHAPE = (2048, 2048)
+
+_layouts = {}
+
+
+def channel_pixel_index(label_image, nchannels):
+    """CSR-style index of the pixels of each channel in a label image.
+
+    Parameters
+    ----------
+    label_image : numpy array
+        Image with the channel number (starting at 1) of each pixel.
+        Pixels with label 0 (or larger than nchannels) do not belong
+        to any channel.
+    nchannels : int
+        Number of channels.
+
+    Returns
+    -------
+    indptr : numpy array
+        Array of size nchannels + 1. The pixels of channel k (starting
+        at 1) are indices[indptr[k - 1]:indptr[k]].
+    indices : numpy array
+        Indices in the flattened image of the pixels of all the
+        channels, sorted by channel (and in increasing order within
+        each channel).
+
+    """
+
+    labels = np.asarray(label_image).ravel()
+    valid = (labels > 0) & (labels <= nchannels)
+    indices = np.flatnonzero(valid)
+    order = np.argsort(labels[indices], kind="stable")
+    indices = indices[order]
+    counts = np.bincount(labels[valid].astype(int), minlength=nchannels + 1)
+    indptr = np.zeros(nchannels + 1, dtype=np.intp)
+    np.cumsum(counts[1:], out=indptr[1:])
+    indptr.flags.writeable = False
+    indices.flags.writeable = False
+    return indptr, indices
+
+
+class DetectorLayout:
+    """Channel layout of a detector.
+
+    The layout is defined either by the slices of each channel or by
+    an image with the channel number of each pixel (for example, the
+    ICHANNEL extension of a reprojected image). The label image and
+    the pixel index are computed the first time they are requested,
+    and they are read-only, so that they can be shared by all the
+    frames and recipes.
+
+    Parameters
+    ----------
+    name : str
+        Name of the layout.
+    nchannels : int
+        Number of channels.
+    channels : list of tuples of slices or None
+        Region of each channel in the detector.
+    label_image : numpy array or None
+        Image with the channel number (starting at 1) of each pixel.
+        If None, it is computed from 'channels'.
+    shape : tuple of int
+        Shape of the detector.
+
+    """
+
+    def __init__(
+        self, name, nchannels, channels=None, label_image=None, shape=DETECTOR_SHAPE
+    ):
+        if channels is None and label_image is None:
+            raise ValueError("channels or label_image must be provided")
+        self.name = name
+        self.nchannels = nchannels
+        self.channels = None if channels is None else tuple(channels)
+        if label_image is None:
+            self.shape = tuple(shape)
+            self._label_image = None
+        else:
+            label_image = np.asarray(label_image).view()
+            label_image.flags.writeable = False
+            self.shape = label_image.shape
+            self._label_image = label_image
+        self._pixel_index = None
+
+    @classmethod
+    def from_label_image(cls, name, label_image, nchannels):
+        """Layout defined by an image with the channel of each pixel"""
+        return cls(name, nchannels, label_image=label_image)
+
+    @property
+    def label_image(self):
+        """Image with the channel number (starting at 1) of each pixel"""
+        if self._label_image is None:
+            label_image = np.zeros(self.shape, dtype="uint8")
+            for label, region in enumerate(self.channels, start=1):
+                label_image[region] = label
+            label_image.flags.writeable = False
+            self._label_image = label_image
+        return self._label_image
+
+    @property
+    def pixel_index(self):
+        """CSR-style index (indptr, indices) of the pixels of each channel"""
+        if self._pixel_index is None:
+            self._pixel_index = channel_pixel_index(self.label_image, self.nchannels)
+        return self._pixel_index
+
+    def channel_pixels(self, label):
+        """Indices in the flattened image of the pixels of a channel"""
+        indptr, indices = self.pixel_index
+        return indices[indptr[label - 1] : indptr[label]]
+
+
+def get_detector_layout(name):
+    """Channel layout of a detector ('FULL' or 'H2RG_FULL').
+
+    The layouts are created once and shared.
+
+    """
+
+    if name not in _layouts:
+        if name not in ("FULL", "H2RG_FULL"):
+            raise ValueError(f"Unexpected detector: {name}")
+        detector_channels = getattr(channels, name)
+        _layouts[name] = DetectorLayout(
+            name, len(detector_channels), channels=detector_channels
+        )
+    return _layouts[name]
@@ -0,0 +1,304 @@
+#
+# Copyright 2024 Universidad Complutense de Madrid
+#
+# This file is part of PyEmir
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+# License-Filename: LICENSE.txt
+#
+
+"""Running accumulation of images across observing rounds"""
+
+from collections import OrderedDict
+import tempfile
+
+import astropy.io.fits as fits
+import numpy as np
+
+# maximum number of accumulators kept alive between rounds
+ACCUMULATOR_REGISTRY_MAXSIZE = 4
+
+_accumulators = OrderedDict()
+
+# planes of the accumulation array
+_WEIGHT, _MEAN, _M2, _COUNT = range(4)
+
+# keyword with the number of rounds of an accumulated result, whose
+# MAP and VARIANCE extensions hold the count and variance of each pixel
+ACCUM_KEYWORD = "NACCUM"
+
+
+class FrameAccumulator:
+    """Running weighted mean and variance of a sequence of images.
+
+    The sum of weights, the weighted mean, the sum of squared
+    deviations (updated with Welford's algorithm) and the number of
+    valid values of each pixel are kept in a single array, so that
+    adding a new image is an in-place update of the accumulated
+    values. The array can be stored in a memory-mapped temporary file.
+
+    Parameters
+    ----------
+    shape : tuple of int
+        Shape of the accumulated image.
+    memmap : bool
+        If True, the accumulated values are stored in a memory-mapped
+        temporary file.
+    directory : str or None
+        Directory where the temporary file is created. If None, the
+        default temporary directory is employed.
+
+    Attributes
+    ----------
+    header : astropy header or None
+        Header of the last image built from the accumulated values.
+
+    """
+
+    def __init__(self, shape, memmap=False, directory=None):
+        self.memmap = memmap
+        self.directory = directory
+        self.header = None
+        self._file = None
+        self._planes = self._allocate(tuple(shape))
+
+    def _allocate(self, shape):
+        if not self.memmap:
+            return np.zeros((4,) + shape)
+        newfile = tempfile.TemporaryFile(
+            prefix="accumulator_", suffix=".dat", dir=self.directory
+        )
+        planes = np.memmap(newfile, dtype=float, mode="w+", shape=(4,) + shape)
+        self._file = newfile
+        return planes
+
+    @property
+    def shape(self):
+        """Shape of the accumulated image"""
+        return self._planes.shape[1:]
+
+    @property
+    def weight(self):
+        """Sum of weights of each pixel"""
+        return self._planes[_WEIGHT]
+
+    @property
+    def mean(self):
+        """Weighted mean of each pixel"""
+        return self._planes[_MEAN]
+
+    @property
+    def count(self):
+        """Number of valid values of each pixel"""
+        return self._planes[_COUNT]
+
+    def variance(self):
+        """Variance of the accumulated values of each pixel.
+
+        The sum of squared deviations is divided by
+        weight * (1 - 1 / count), which is the unbiased estimator
+        when all the images have the same weight. Pixels with less
+        than two values have zero variance.
+
+        """
+        weight = self._planes[_WEIGHT]
+        count = self._planes[_COUNT]
+        valid = count > 1
+        denominator = np.where(valid, weight * (1.0 - 1.0 / np.maximum(count, 1)), 1.0)
+        return np.where(valid, self._planes[_M2] / denominator, 0.0)
+
+    def add(self, data, weight=1.0, mask=None, region=None):
+        """Add an image to the accumulated values.
+
+        Parameters
+        ----------
+        data : numpy array
+            Image to be added.
+        weight : float
+            Weight of the image.
+        mask : numpy array or None
+            Mask of the image, nonzero values are not accumulated.
+        region : tuple of slices or None
+            Region of the accumulated image where the image is added.
+            If None, the image must have the shape of the accumulated
+            image.
+
+        """
+
+        if region is None:
+            region = tuple(slice(None) for _ in self.shape)
+        planes = self._planes[(slice(None),) + tuple(region)]
+        if planes.shape[1:] != data.shape:
+            raise ValueError(
+                f"data shape {data.shape} does not match region "
+                f"shape {planes.shape[1:]}"
+            )
+
+        if mask is None:
+            valid = np.ones(data.shape, dtype=bool)
+        else:
+            valid = np.asarray(mask) == 0
+        weights = np.where(valid, float(weight), 0.0)
+        data = np.where(valid, data, 0.0)
+
+        planes[_WEIGHT] += weights
+        delta = data - planes[_MEAN]
+        ratio = np.divide(
+            weights,
+            planes[_WEIGHT],
+            where=planes[_WEIGHT] > 0,
+            out=np.zeros(data.shape),
+        )
+        planes[_MEAN] += ratio * delta
+        planes[_M2] += weights * delta * (data - planes[_MEAN])
+        planes[_COUNT] += valid
+
+    def load(self, mean, count, variance=None):
+        """Set the accumulated values from a stored result.
+
+        All the accumulated images are assumed to have unit weight, so
+        that the sum of weights of each pixel is its number of values.
+
+        Parameters
+        ----------
+        mean : numpy array
+            Mean of each pixel.
+        count : numpy array
+            Number of valid values of each pixel.
+        variance : numpy array or None
+            Variance of each pixel (see variance). If None, the
+            variance is set to zero.
+
+        """
+
+        count = np.asarray(count, dtype=float)
+        if count.shape != self.shape or np.shape(mean) != self.shape:
+            raise ValueError(f"arrays do not match the shape {self.shape}")
+        self._planes[_WEIGHT] = count
+        self._planes[_MEAN] = np.where(count > 0, mean, 0.0)
+        if variance is None:
+            self._planes[_M2] = 0.0
+        else:
+            self._planes[_M2] = np.where(count > 1, variance * (count - 1), 0.0)
+        self._planes[_COUNT] = count
+
+    def expand(self, shape, region):
+        """Enlarge the accumulated image.
+
+        Parameters
+        ----------
+        shape : tuple of int
+            New shape of the accumulated image.
+        region : tuple of slices
+            Region of the new image where the current accumulated
+            values are placed.
+
+        """
+
+        shape = tuple(shape)
+        if shape == self.shape:
+            return
+        oldfile = self._file
+        planes = self._allocate(shape)
+        planes[(slice(None),) + tuple(region)] = self._planes
+        self._planes = planes
+        if oldfile is not None:
+            oldfile.close()
+
+    def close(self):
+        """Release the accumulated values"""
+        self._planes = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def restore_accumulator(hdulist, naccum, mask=None):
+    """Accumulator rebuilt from the stored result of previous rounds.
+
+    The mean, the number of values and the variance of each pixel are
+    read from an accumulated result (with the keyword ACCUM_KEYWORD and
+    the MAP and VARIANCE extensions), so that the following rounds give
+    the same result as with the accumulator of the previous round.
+    Otherwise (the result of the first round), the valid pixels of the
+    image are given weight naccum - 1.
+
+    Parameters
+    ----------
+    hdulist : HDUList object
+        Accumulated result of the previous rounds.
+    naccum : int
+        Number of the current round.
+    mask : numpy array or None
+        Mask of the image (nonzero values are masked), only employed
+        when the image is not an accumulated result.
+
+    Returns
+    -------
+    accumulator : FrameAccumulator instance
+        Accumulator, with the primary header of the image.
+
+    """
+
+    accumulator = FrameAccumulator(hdulist[0].shape)
+    accumulator.header = hdulist[0].header.copy()
+    if ACCUM_KEYWORD in hdulist[0].header and "MAP" in hdulist:
+        variance = hdulist["VARIANCE"].data if "VARIANCE" in hdulist else None
+        accumulator.load(hdulist[0].data, hdulist["MAP"].data, variance)
+    else:
+        if mask is None:
+            count = np.full(hdulist[0].shape, naccum - 1.0)
+        else:
+            count = np.where(np.asarray(mask) == 0, naccum - 1.0, 0.0)
+        accumulator.load(hdulist[0].data, count)
+    return accumulator
+
+
+def dataframe_uuid(frame):
+    """UUID of the image referenced by a DataFrame.
+
+    Only the primary header is read when the image is stored in
+    a file.
+
+    """
+
+    if frame.frame is not None:
+        header = frame.frame[0].header
+    else:
+        header = fits.getheader(frame.filename)
+    return header.get("UUID")
+
+
+def find_accumulator(key, remove=False):
+    """Accumulator registered with a given key (or None).
+
+    If remove is True, the accumulator is removed from the registry.
+    This must be done before modifying it, so that a failed round does
+    not leave a modified accumulator registered under the UUID of the
+    previous result (it is registered again with the new result).
+
+    """
+    if key is None or key not in _accumulators:
+        return None
+    if remove:
+        return _accumulators.pop(key)
+    _accumulators.move_to_end(key)
+    return _accumulators[key]
+
+
+def register_accumulator(key, accumulator):
+    """Keep an accumulator alive, using as key the UUID of its result.
+
+    Only the most recently used accumulators are kept.
+
+    """
+
+    _accumulators[key] = accumulator
+    _accumulators.move_to_end(key)
+    # an accumulator is registered under the UUID of its last result
+    for oldkey in [k for k, v in _accumulators.items() if v is accumulator]:
+        if oldkey != key:
+            del _accumulators[oldkey]
+    while len(_accumulators) > ACCUMULATOR_REGISTRY_MAXSIZE:
+        _, oldacc = _accumulators.popitem(last=False)
+        oldacc.close()
@@ -0,0 +1,125 @@
+#
+# Copyright 2024 Universidad Complutense de Madrid
+#
+# This file is part of PyEmir
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+# License-Filename: LICENSE.txt
+#
+
+"""Disk-backed storage of sequences of images"""
+
+import tempfile
+
+import astropy.io.fits as fits
+import numpy as np
+
+
+class FrameStore:
+    """Sequence of images kept in a memory-mapped temporary file.
+
+    The data of the primary HDU of each image are stored in a single
+    memory-mapped 3D array, created when the first image is stored
+    (all the images must have the same shape). Only the headers and the
+    remaining HDUs are kept in memory. The temporary file is removed
+    when the store is closed.
+
+    Parameters
+    ----------
+    nframes : int
+        Number of images.
+    dtype : str or numpy dtype
+        Data type employed to store the images.
+    directory : str or None
+        Directory where the temporary file is created. If None, the
+        default temporary directory is employed.
+
+    """
+
+    def __init__(self, nframes, dtype="float32", directory=None):
+        self.nframes = nframes
+        self.dtype = np.dtype(dtype)
+        self.directory = directory
+        self._file = None
+        self._data = None
+        self._headers = [None] * nframes
+        self._extensions = [None] * nframes
+
+    def __len__(self):
+        return self.nframes
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def shape(self):
+        """Shape of the stored images (None if the store is empty)"""
+        if self._data is None:
+            return None
+        return self._data.shape[1:]
+
+    def _allocate(self, shape):
+        self._file = tempfile.TemporaryFile(
+            prefix="framestore_", suffix=".dat", dir=self.directory
+        )
+        self._data = np.memmap(
+            self._file, dtype=self.dtype, mode="w+", shape=(self.nframes,) + shape
+        )
+
+    def put(self, index, hdulist):
+        """Store an image.
+
+        Parameters
+        ----------
+        index : int
+            Position of the image in the sequence.
+        hdulist : HDUList object
+            Image to be stored. The data of the primary HDU are cast to
+            the data type of the store; the header and the remaining
+            HDUs are stored without copying them.
+
+        """
+        data = hdulist[0].data
+        if self._data is None:
+            self._allocate(data.shape)
+        elif data.shape != self.shape:
+            raise ValueError(
+                "Unexpected image shape {}, expected {}".format(data.shape, self.shape)
+            )
+        self._data[index] = data
+        self._headers[index] = hdulist[0].header
+        self._extensions[index] = list(hdulist[1:])
+
+    def data(self, index):
+        """Memory-mapped (writable) data of an image"""
+        if self._headers[index] is None:
+            raise KeyError("Image {} has not been stored".format(index))
+        return self._data[index]
+
+    def header(self, index):
+        """Header of an image (modifications are kept in the store)"""
+        if self._headers[index] is None:
+            raise KeyError("Image {} has not been stored".format(index))
+        return self._headers[index]
+
+    def hdulist(self, index):
+        """HDUList with the memory-mapped data of an image.
+
+        The data of the primary HDU are not copied, and the header is a
+        copy of the stored header.
+
+        """
+        hdu = fits.PrimaryHDU(self.data(index), header=self.header(index))
+        return fits.HDUList([hdu] + self._extensions[index])
+
+    def close(self):
+        """Release the memory map and remove the temporary file"""
+        # the memory map is released once the views of the data
+        # returned by the store are no longer in use
+        self._data = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,89 @@
+#
+# Copyright 2024 Universidad Complutense de Madrid
+#
+# This file is part of PyEmir
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+# License-Filename: LICENSE.txt
+#
+
+"""Ordered concurrent processing of sequences of items"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+
+def available_cpus():
+    """Number of CPUs available to the current process"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def imap_ordered(function, iterable, max_workers=1, max_pending=None, item_size=None):
+    """Apply a function to a sequence of items using a pool of threads.
+
+    The items are drawn from the iterable in the calling thread (which
+    acts as a reader stage) and processed by the worker threads. The
+    results are yielded in the same order as the items, as soon as
+    they are available. The size of the items submitted and not yet
+    delivered is limited, so that only a few results are kept in
+    memory when the consumer is slower than the workers.
+
+    Parameters
+    ----------
+    function : callable
+        Function applied to each item.
+    iterable : iterable
+        Sequence of items (it can be a generator).
+    max_workers : int
+        Number of worker threads. If 0, the number of available CPUs
+        is employed. With a single worker, the items are processed
+        sequentially in the calling thread.
+    max_pending : int or None
+        Maximum size of the items submitted and not yet delivered
+        (at least one item is always submitted). If None, twice the
+        number of workers is employed.
+    item_size : callable or None
+        Function returning the size of each item (for example, the
+        number of images it contains). If None, every item has size 1.
+
+    Yields
+    ------
+    result : object
+        Result of the function for each item.
+
+    """
+
+    if max_workers == 0:
+        max_workers = available_cpus()
+    if max_workers < 1:
+        raise ValueError("Unexpected max_workers value=" + str(max_workers))
+
+    if max_workers == 1:
+        for item in iterable:
+            yield function(item)
+        return
+
+    if max_pending is None:
+        max_pending = 2 * max_workers
+    pending = deque()
+    pending_size = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            for item in iterable:
+                size = 1 if item_size is None else item_size(item)
+                pending.append((executor.submit(function, item), size))
+                pending_size += size
+                while pending_size >= max_pending and pending:
+                    future, size = pending.popleft()
+                    pending_size -= size
+                    yield future.result()
+            while pending:
+                future, _ = pending.popleft()
+                yield future.result()
+        finally:
+            for future, _ in pending:
+                future.cancel()
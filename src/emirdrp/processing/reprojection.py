@@ -0,0 +1,166 @@
+#
+# Copyright 2024 Universidad Complutense de Madrid
+#
+# This file is part of PyEmir
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+# License-Filename: LICENSE.txt
+#
+
+"""Reprojection of sets of images sharing the same WCS"""
+
+from collections import OrderedDict
+import hashlib
+
+from astropy.wcs.utils import pixel_to_pixel
+import numpy as np
+from reproject import reproject_adaptive, reproject_exact
+from scipy.ndimage import map_coordinates
+
+# maximum number of pixel mappings kept in memory
+MAPPING_CACHE_MAXSIZE = 2
+
+_mapping_cache = OrderedDict()
+
+
+def wcs_signature(wcs):
+    """Signature (md5 hash) of the keywords of a WCS"""
+    header = wcs.to_header(relax=True)
+    cards = sorted(f"{key}={header[key]!r}" for key in header)
+    return hashlib.md5("\n".join(cards).encode()).hexdigest()
+
+
+def pixel_mapping(wcs_in, wcs_out, shape_in, shape_out):
+    """Pixel of the input image corresponding to each output pixel.
+
+    The mapping is computed as in reproject_interp (output pixels that
+    do not round-trip are discarded, and coordinates in the outer half
+    of the border pixels are moved to the center of those pixels). The
+    mappings are kept in memory, using as key the signatures of both
+    WCS and the image shapes.
+
+    Parameters
+    ----------
+    wcs_in : astropy.wcs.WCS
+        WCS of the input images.
+    wcs_out : astropy.wcs.WCS
+        WCS of the output images.
+    shape_in : tuple of int
+        Shape of the input images.
+    shape_out : tuple of int
+        Shape of the output images.
+
+    Returns
+    -------
+    pixel_in : numpy array
+        Array of shape (2, npixels_out) with the (row, column)
+        coordinates in the input image. Undefined values are NaN.
+        The cached array is returned, and must not be modified.
+
+    """
+
+    def compute_mapping():
+        rows, columns = np.meshgrid(
+            *[np.arange(size, dtype=float) for size in shape_out], indexing="ij"
+        )
+        pixel_out = (columns.ravel(), rows.ravel())
+        x_in, y_in = pixel_to_pixel(wcs_out, wcs_in, *pixel_out)
+        # coordinates that do not round-trip are not valid
+        x_check, y_check = pixel_to_pixel(wcs_in, wcs_out, x_in, y_in)
+        reset = (np.abs(x_check - pixel_out[0]) > 1) | (
+            np.abs(y_check - pixel_out[1]) > 1
+        )
+        pixel_in = np.array([y_in, x_in])
+        pixel_in[:, reset] = np.nan
+        # interpolate up to the outer border of the edge pixels
+        for coords, size in zip(pixel_in, shape_in):
+            coords[(coords < 0) & (coords >= -0.5)] = 0
+            coords[(coords < size - 0.5) & (coords >= size - 1)] = size - 1
+        pixel_in.flags.writeable = False
+        return pixel_in
+
+    key = (
+        wcs_signature(wcs_in),
+        wcs_signature(wcs_out),
+        tuple(shape_in),
+        tuple(shape_out),
+    )
+    if key in _mapping_cache:
+        _mapping_cache.move_to_end(key)
+    else:
+        _mapping_cache[key] = compute_mapping()
+        while len(_mapping_cache) > MAPPING_CACHE_MAXSIZE:
+            _mapping_cache.popitem(last=False)
+    return _mapping_cache[key]
+
+
+def reproject_planes(list_data, wcs_in, wcs_out, shape_out, method="interp"):
+    """Reproject a set of images sharing the same WCS.
+
+    With method='interp', the pixel mapping between both WCS is
+    computed once (see pixel_mapping) and every image is interpolated
+    (bilinear interpolation) as in reproject_interp. With the
+    remaining methods, the images are stacked and reprojected in a
+    single call, so that the transformation is computed only once.
+
+    Parameters
+    ----------
+    list_data : list of numpy arrays
+        Images to be reprojected.
+    wcs_in : astropy.wcs.WCS
+        WCS of the input images.
+    wcs_out : astropy.wcs.WCS
+        WCS of the output images.
+    shape_out : tuple of int
+        Shape of the output images.
+    method : str
+        Reprojection method: 'interp', 'adaptive' or 'exact'.
+
+    Returns
+    -------
+    list_data_out : list of numpy arrays
+        Reprojected images.
+    list_footprint : list of numpy arrays
+        Footprint of each reprojected image.
+
+    """
+
+    shape_out = tuple(shape_out)
+    if method == "interp":
+        shape_in = list_data[0].shape
+        pixel_in = pixel_mapping(wcs_in, wcs_out, shape_in, shape_out)
+        list_data_out = []
+        for data in list_data:
+            if data.shape != shape_in:
+                raise ValueError("Images with different shapes")
+            if data.dtype.kind != "f" or data.dtype.itemsize < 4:
+                data = data.astype("float32")
+            data_out = np.empty(shape_out)
+            map_coordinates(
+                data,
+                pixel_in,
+                order=1,
+                mode="constant",
+                cval=np.nan,
+                output=data_out.reshape(-1),
+            )
+            list_data_out.append(data_out)
+        list_footprint = [
+            (~np.isnan(data_out)).astype(float) for data_out in list_data_out
+        ]
+    elif method in ("adaptive", "exact"):
+        if method == "adaptive":
+            reproject_function = reproject_adaptive
+        else:
+            reproject_function = reproject_exact
+        data_out, footprint = reproject_function(
+            input_data=(np.stack(list_data), wcs_in),
+            output_projection=wcs_out,
+            shape_out=(len(list_data),) + shape_out,
+        )
+        list_data_out = [plane.copy() for plane in data_out]
+        list_footprint = [plane.copy() for plane in footprint]
+    else:
+        raise ValueError(f"Unexpected reprojection method: {method}")
+
+    return list_data_out, list_footprint
@@ -0,0 +1,181 @@
+#
+# Copyright 2024 Universidad Complutense de Madrid
+#
+# This file is part of PyEmir
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+# License-Filename: LICENSE.txt
+#
+
+"""Combination of images with fractional offsets in the Y direction"""
+
+import math
+
+import numpy as np
+
+
+def shift_rows(image2d, yoffset, row_range=None, dtype=None):
+    """Shift an image in the Y direction.
+
+    Equivalent to numina's shift_image2d(image2d, yoffset=yoffset) with
+    flux preserving interpolation: each row of the shifted image is a
+    weighted sum of the two rows of the initial image overlapping with
+    it. Rows outside the initial image are taken as zero.
+
+    Parameters
+    ----------
+    image2d : numpy array
+        Initial 2D image.
+    yoffset : float
+        Offset in the Y direction.
+    row_range : tuple of int or None
+        Rows (first, last + 1) of the shifted image to be computed. If
+        None, the whole image is computed.
+    dtype : numpy dtype or None
+        Data type of the result. If None, float is employed. The
+        interpolation is always computed in double precision.
+
+    Returns
+    -------
+    image2d_shifted : numpy array
+        Shifted image (or the requested rows of it).
+
+    """
+
+    naxis2 = image2d.shape[0]
+    if row_range is None:
+        row_range = (0, naxis2)
+    row1, row2 = row_range
+
+    # row i of the shifted image corresponds to row i - yoffset
+    offset = -yoffset
+    ioffset = math.floor(offset)
+    fraction = offset - ioffset
+
+    result = np.zeros((row2 - row1,) + image2d.shape[1:])
+    for k, weight in ((ioffset, 1.0 - fraction), (ioffset + 1, fraction)):
+        if weight == 0:
+            continue
+        i1 = max(row1, -k)
+        i2 = min(row2, naxis2 - k)
+        if i1 < i2:
+            result[(i1 - row1) : (i2 - row1)] += np.multiply(
+                image2d[(i1 + k) : (i2 + k)], weight, dtype=float
+            )
+
+    if dtype is not None:
+        result = result.astype(dtype)
+    return result
+
+
+def shift_combine(
+    list_data,
+    list_yoffsets,
+    method,
+    method_kwargs=None,
+    dtype="float32",
+    nrows_strip=None,
+):
+    """Shift and combine a set of images.
+
+    The images are shifted with shift_rows and combined with a
+    combination method of numina.array.combine, without storing the
+    shifted images. In the strip-wise mode, the output image is
+    computed in strips of rows, so that only the shifted strips of the
+    input images are kept in memory.
+
+    Parameters
+    ----------
+    list_data : list of numpy arrays
+        Images to be combined (they can be memory-mapped arrays).
+    list_yoffsets : list of float
+        Offset in the Y direction applied to each image. Images with
+        zero offset are not interpolated.
+    method : callable
+        Combination method (e.g. numina.array.combine.mean).
+    method_kwargs : dict or None
+        Additional arguments for the combination method.
+    dtype : numpy dtype
+        Data type of the shifted images and of the result.
+    nrows_strip : int or None
+        Number of rows in each strip. If None, the whole images are
+        processed at once.
+
+    Returns
+    -------
+    combined_data : tuple of numpy arrays
+        Combined image, variance and number of pixels, as returned by
+        the combination method.
+
+    """
+
+    if len(list_data) != len(list_yoffsets):
+        raise ValueError("list_data and list_yoffsets lengths are different")
+    if len(list_data) == 0:
+        raise ValueError("No images to combine")
+    method_kwargs = dict(method_kwargs or {})
+    method_kwargs.setdefault("dtype", dtype)
+
+    naxis2 = list_data[0].shape[0]
+    if nrows_strip is None:
+        nrows_strip = naxis2
+    if nrows_strip < 1:
+        raise ValueError("Unexpected nrows_strip value=" + str(nrows_strip))
+
+    combined_data = None
+    for row1 in range(0, naxis2, nrows_strip):
+        row2 = min(row1 + nrows_strip, naxis2)
+        list_strips = []
+        for data, yoffset in zip(list_data, list_yoffsets):
+            if yoffset == 0:
+                list_strips.append(np.asarray(data[row1:row2], dtype=dtype))
+            else:
+                list_strips.append(
+                    shift_rows(data, yoffset, row_range=(row1, row2), dtype=dtype)
+                )
+        result = method(list_strips, **method_kwargs)
+        if combined_data is None:
+            combined_data = tuple(
+                np.empty((naxis2,) + item.shape[1:], dtype=item.dtype)
+                for item in result
+            )
+        for item_combined, item in zip(combined_data, result):
+            item_combined[row1:row2] = item
+
+    return combined_data
+
+
+def shift_combine_method(method, list_yoffsets, nrows_strip=None):
+    """Combination method that shifts the images before combining them.
+
+    The returned function can be employed as the combination method
+    of numina's combine_imgs, which handles the headers of the result.
+
+    Parameters
+    ----------
+    method : callable
+        Combination method (e.g. numina.array.combine.mean).
+    list_yoffsets : list of float
+        Offset in the Y direction applied to each image.
+    nrows_strip : int or None
+        Number of rows in each strip (see shift_combine).
+
+    Returns
+    -------
+    shifted_method : callable
+        Combination method, with the same name as 'method'.
+
+    """
+
+    def shifted_method(arrays, dtype="float32", **method_kwargs):
+        return shift_combine(
+            arrays,
+            list_yoffsets,
+            method,
+            method_kwargs=method_kwargs,
+            dtype=dtype,
+            nrows_strip=nrows_strip,
+        )
+
+    shifted_method.__name__ = method.__name__
+    return shifted_method
@@ -0,0 +1,190 @@
+#
+# Copyright 2024 Universidad Complutense de Madrid
+#
+# This file is part of PyEmir
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+# License-Filename: LICENSE.txt
+#
+
+"""Cache of pixel solid-angle maps indexed by the WCS distortion"""
+
+from collections import OrderedDict, namedtuple
+import hashlib
+import os
+import tempfile
+
+from numina.tools.pixel_solid_angle_arcsec2 import pixel_solid_angle_arcsec2
+import numpy as np
+
+# maximum number of solid angle maps kept in memory
+SOLID_ANGLE_CACHE_MAXSIZE = 4
+
+SolidAngleCacheInfo = namedtuple(
+    "SolidAngleCacheInfo", ["hits", "disk_hits", "misses", "maxsize", "currsize"]
+)
+
+_solid_angle_cache = OrderedDict()
+_cache_stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+_cache_directory = None
+
+
+def distortion_signature(wcs, naxis1, naxis2, method=3, kernel_size=(11, 11)):
+    """Signature (md5 hash) of the WCS terms that define the pixel area.
+
+    The solid angle of the pixels does not depend on the celestial
+    coordinates of the reference pixel (CRVAL, LONPOLE, LATPOLE), which
+    only rotate the sky, so that these values are not included. The
+    signature depends on the projection, the reference pixel, the
+    linear transformation (CD or PC and CDELT), the PV and SIP
+    distortion coefficients and the remaining arguments.
+
+    Parameters
+    ----------
+    wcs : astropy.wcs.WCS
+        WCS of the image.
+    naxis1 : int
+        Number of pixels along the first axis (NAXIS1).
+    naxis2 : int
+        Number of pixels along the second axis (NAXIS2).
+    method : int
+        Method employed to compute the solid angle.
+    kernel_size : tuple of int or None
+        Size of the median filter applied to the solid angle.
+
+    Returns
+    -------
+    signature : str
+        Hexadecimal md5 hash.
+
+    """
+
+    items = [
+        [ctype[4:] for ctype in wcs.wcs.ctype],
+        wcs.wcs.crpix.tolist(),
+        wcs.pixel_scale_matrix.tolist(),
+        sorted(tuple(item) for item in wcs.wcs.get_pv()),
+        naxis1,
+        naxis2,
+        method,
+        None if kernel_size is None else tuple(kernel_size),
+    ]
+    if wcs.sip is not None:
+        items.append(wcs.sip.crpix.tolist())
+        for coefficients in (wcs.sip.a, wcs.sip.b, wcs.sip.ap, wcs.sip.bp):
+            items.append(None if coefficients is None else coefficients.tolist())
+    md5 = hashlib.md5(repr(items).encode())
+    # lookup table distortions
+    for table in (wcs.cpdis1, wcs.cpdis2, wcs.det2im1, wcs.det2im2):
+        if table is not None:
+            md5.update(np.ascontiguousarray(table.data).tobytes())
+            md5.update(repr((table.crpix, table.crval, table.cdelt)).encode())
+    return md5.hexdigest()
+
+
+def set_solid_angle_cache_directory(directory):
+    """Directory of the on-disk store of solid angle maps.
+
+    The maps computed from now on are saved in this directory (as npy
+    files named after their signature), and maps not found in memory
+    are looked for in it. If None, the on-disk store is not employed.
+
+    """
+
+    global _cache_directory
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+    _cache_directory = directory
+
+
+def solid_angle_cache_info():
+    """Hits (in memory and on disk), misses and size of the cache"""
+    return SolidAngleCacheInfo(
+        _cache_stats["hits"],
+        _cache_stats["disk_hits"],
+        _cache_stats["misses"],
+        SOLID_ANGLE_CACHE_MAXSIZE,
+        len(_solid_angle_cache),
+    )
+
+
+def clear_solid_angle_cache():
+    """Remove the maps kept in memory and reset the counters"""
+    _solid_angle_cache.clear()
+    for key in _cache_stats:
+        _cache_stats[key] = 0
+
+
+def _store_path(directory, signature):
+    return os.path.join(directory, f"solid_angle_{signature}.npy")
+
+
+def cached_pixel_solid_angle_arcsec2(
+    wcs, naxis1, naxis2, method=3, kernel_size=(11, 11), cache_dir=None
+):
+    """Solid angle (arcsec**2) of every pixel, cached by WCS distortion.
+
+    Cached version of numina's pixel_solid_angle_arcsec2. The maps are
+    looked for in memory, then in the on-disk store and, if not found,
+    they are computed. The key is the distortion_signature of the WCS.
+
+    Parameters
+    ----------
+    wcs : astropy.wcs.WCS
+        WCS of the image.
+    naxis1 : int
+        Number of pixels along the first axis (NAXIS1).
+    naxis2 : int
+        Number of pixels along the second axis (NAXIS2).
+    method : int
+        Method employed to compute the solid angle.
+    kernel_size : tuple of int or None
+        Size of the median filter applied to the solid angle.
+    cache_dir : str or None
+        Directory of the on-disk store. If None, the directory set
+        with set_solid_angle_cache_directory is employed (if any).
+
+    Returns
+    -------
+    result : numpy array
+        2D array with the solid angle (arcsec**2) of each pixel. The
+        cached array is returned, and it is read-only.
+
+    """
+
+    key = distortion_signature(wcs, naxis1, naxis2, method, kernel_size)
+    if key in _solid_angle_cache:
+        _cache_stats["hits"] += 1
+        _solid_angle_cache.move_to_end(key)
+        return _solid_angle_cache[key]
+
+    if cache_dir is None:
+        cache_dir = _cache_directory
+    result = None
+    if cache_dir is not None and os.path.exists(_store_path(cache_dir, key)):
+        result = np.load(_store_path(cache_dir, key), mmap_mode="r")
+        _cache_stats["disk_hits"] += 1
+    if result is None:
+        _cache_stats["misses"] += 1
+        result = pixel_solid_angle_arcsec2(
+            wcs=wcs,
+            naxis1=naxis1,
+            naxis2=naxis2,
+            method=method,
+            kernel_size=kernel_size,
+        )
+        result.flags.writeable = False
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            # write to a temporary file, so that other processes never
+            # read incomplete files
+            with tempfile.NamedTemporaryFile(
+                dir=cache_dir, suffix=".npy", delete=False
+            ) as tmpfile:
+                np.save(tmpfile, result)
+            os.replace(tmpfile.name, _store_path(cache_dir, key))
+
+    _solid_angle_cache[key] = result
+    while len(_solid_angle_cache) > SOLID_ANGLE_CACHE_MAXSIZE:
+        _solid_angle_cache.popitem(last=False)
+    return result
@@ -0,0 +1,168 @@
+#
+# Copyright 2024 Universidad Complutense de Madrid
+#
+# This file is part of PyEmir
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+# License-Filename: LICENSE.txt
+#
+
+"""Spatial profiles of a target along the slitlets of a set of images"""
+
+import numpy as np
+from scipy import ndimage
+
+from numina.array.wavecalib.crosscorrelation import periodic_corr1d
+
+from emirdrp.processing.wavecal.crosscorrelation import periodic_corr1d_batch
+
+
+def mean_spatial_profiles(
+    list_data,
+    list_data_sky,
+    vpix_region,
+    xisok,
+    vpix_region_sky=None,
+    nwidth_medfilt=0,
+):
+    """Mean spatial profiles of a region in a set of images.
+
+    The target region (and the sky region, when provided) of all the
+    images is extracted as a single 3D array, so that the sky
+    subtraction, the median filter in the X direction and the mean
+    along the useful pixels are computed at once for all the images.
+
+    Parameters
+    ----------
+    list_data : list of numpy arrays
+        Images (they can be memory-mapped arrays).
+    list_data_sky : list of numpy arrays or None
+        Images subtracted from the corresponding image in 'list_data'
+        before computing the profiles. If None, no images are
+        subtracted.
+    vpix_region : tuple of int
+        First and last rows (FITS criterion) of the target region.
+    xisok : numpy array
+        Boolean array with the useful pixels in the X direction.
+    vpix_region_sky : tuple of int or None
+        First and last rows (FITS criterion) of the sky region. If not
+        None, the median of this region in each image is subtracted
+        from the target region.
+    nwidth_medfilt : int
+        Width of the median filter applied in the X direction. No
+        filter is applied when this value is smaller than 2.
+
+    Returns
+    -------
+    profiles : numpy array
+        2D array with the spatial profile of each image in each row.
+
+    """
+
+    if list_data_sky is not None and len(list_data_sky) != len(list_data):
+        raise ValueError("list_data and list_data_sky lengths are different")
+
+    def extract_strips(nsmin, nsmax):
+        rows = slice(nsmin - 1, nsmax)
+        if list_data_sky is None:
+            return np.stack([data[rows] for data in list_data])
+        return np.stack(
+            [data[rows] - sky[rows] for data, sky in zip(list_data, list_data_sky)]
+        )
+
+    nsmin, nsmax = vpix_region
+    slitlets3d = extract_strips(nsmin, nsmax)
+    if vpix_region_sky is not None:
+        sky3d = extract_strips(vpix_region_sky[0], vpix_region_sky[1])
+        slitlets3d -= np.median(sky3d, axis=1)[:, np.newaxis, :]
+
+    # selected wavelength regions after blocking OH lines
+    slitlets3d_blocked = slitlets3d[:, :, xisok]
+
+    # apply median filter in the X direction
+    if nwidth_medfilt > 1:
+        slitlets3d_blocked = ndimage.median_filter(
+            slitlets3d_blocked, size=(1, 1, nwidth_medfilt)
+        )
+
+    return np.mean(slitlets3d_blocked, axis=2)
+
+
+def spatial_profile_offsets(
+    reference_profile,
+    profiles,
+    naround_zero=None,
+    decimals=4,
+    plottitles=None,
+    pdf=None,
+):
+    """Offsets of a set of spatial profiles relative to a reference one.
+
+    The offsets are computed with the periodic cross-correlation of
+    all the profiles with the reference profile in a single batch,
+    tapering the profiles with a cosine bell and padding them with
+    zeros. The individual cross-correlation is only computed when
+    plots are requested.
+
+    Parameters
+    ----------
+    reference_profile : numpy array
+        Reference spatial profile.
+    profiles : numpy array
+        2D array with one spatial profile in each row.
+    naround_zero : int or None
+        Half width of the window (around zero offset) to look for
+        the correlation peak.
+    decimals : int
+        Number of decimal places of the rounded offsets.
+    plottitles : list of str or None
+        Title of the plot of each cross-correlation.
+    pdf : PdfFile object or None
+        If not None, the cross-correlation plots are sent to this
+        PDF file.
+
+    Returns
+    -------
+    offsets : numpy array
+        Rounded offset of each profile.
+    fpeak : numpy array
+        Maximum of each cross-correlation function.
+
+    """
+
+    if pdf is None:
+        offsets, fpeak = periodic_corr1d_batch(
+            sp_reference=reference_profile,
+            sp_offset=profiles,
+            frac_cosbell=0.10,
+            zero_padding=11,
+            naround_zero=naround_zero,
+            nfit_peak=5,
+        )
+    else:
+        if plottitles is None:
+            plottitles = [None] * len(profiles)
+        offsets = np.zeros(len(profiles))
+        fpeak = np.zeros(len(profiles))
+        for i, (profile, plottitle) in enumerate(zip(profiles, plottitles)):
+            offsets[i], fpeak[i] = periodic_corr1d(
+                sp_reference=reference_profile,
+                sp_offset=profile,
+                remove_mean=False,
+                frac_cosbell=0.10,
+                zero_padding=11,
+                fminmax=None,
+                nfit_peak=5,
+                naround_zero=naround_zero,
+                sp_label="spatial profile",
+                plottitle=plottitle,
+                pdf=pdf,
+            )
+    # round with the builtin function (correctly rounded), avoiding -0.0
+    offsets = np.array(
+        [
+            0.0 if abs(offset) < 10.0 ** (-decimals) else round(offset, decimals)
+            for offset in offsets.tolist()
+        ]
+    )
+    return offsets, fpeak
@@ -9,14 +9,16 @@
 
 import argparse
 from astropy.io import fits
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from itertools import repeat
 import logging
 import numpy as np
 import sys
 
 from numina.array.display.logging_from_debugplot import logging_from_debugplot
 from numina.array.wavecalib.apply_integer_offsets import apply_integer_offsets
-from numina.array.wavecalib.fix_pix_borders import find_pix_borders
 from numina.array.wavecalib.resample import resample_image2d_flux
 from numina.frame.utils import copy_img
 from numina.tools.arg_file_is_new import arg_file_is_new
@@ -24,6 +26,9 @@ from numina.tools.arg_file_is_new import arg_file_is_new
 from emirdrp.instrument.components.dtu import DtuConf
 from emirdrp.products import RectWaveCoeff
 
+from .pix_borders import find_useful_region
+from .rectification_operator import apply_rectification_matrix
+from .rectification_operator import get_rectification_operator
 from .set_wv_parameters import set_wv_parameters
 from .slitlet2d import Slitlet2D
 
@@ -38,6 +43,11 @@ def apply_rectwv_coeff(
     args_resampling=2,
     args_ignore_dtu_configuration=True,
     debugplot=0,
+    parallel=None,
+    max_workers=None,
+    use_rectification_operator=False,
+    operator_cache_dir=None,
+    rect_operator=None,
 ):
     """Compute rectification and wavelength calibration coefficients.
 
@@ -56,6 +66,26 @@ def apply_rectwv_coeff(
     debugplot : int
         Debugging level for messages and plots. For details see
         'numina.array.display.pause_debugplot.py'.
+    parallel : str or None
+        If None, the slitlets are processed serially. If 'thread' or
+        'process', the slitlets are rectified and wavelength calibrated
+        concurrently using a pool of threads or processes. Ignored
+        when debugplot != 0.
+    max_workers : int or None
+        Maximum number of workers in the pool. If None, the default
+        of concurrent.futures is used.
+    use_rectification_operator : bool
+        If True, the slitlets are rectified with the sparse matrices of
+        the RectificationOperator associated to rectwv_coeff, which is
+        computed only once and reused for all the frames sharing the
+        same coefficients.
+    operator_cache_dir : str or None
+        Directory where the RectificationOperator instances are stored
+        between runs (only used with use_rectification_operator=True).
+    rect_operator : RectificationOperator instance or None
+        RectificationOperator of rectwv_coeff (computed with the same
+        resampling). If not None, the slitlets are rectified with its
+        sparse matrices.
 
     Returns
     -------
@@ -77,35 +107,10 @@ def apply_rectwv_coeff(
         offy=rectwv_coeff.global_integer_offset_y_pix,
     )
 
-    # check grism and filter
-    filter_name = header["filter"]
-    logger.info("Filter: " + filter_name)
-    if filter_name != rectwv_coeff.tags["filter"]:
-        raise ValueError("Filter name does not match!")
-    grism_name = header["grism"]
-    logger.info("Grism: " + grism_name)
-    if grism_name != rectwv_coeff.tags["grism"]:
-        raise ValueError("Grism name does not match!")
-
-    # read the DTU configuration from the image header
-    # mecs_header = datamodel.get_mecs_header(reduced_image)
-    dtu_conf = DtuConf.from_img(reduced_image)
-
-    # retrieve DTU configuration from RectWaveCoeff object
-    dtu_conf_calib = DtuConf.from_header(rectwv_coeff.meta_info["dtu_configuration"])
-    # check that the DTU configuration employed to obtain the calibration
-    # corresponds to the DTU configuration in the input FITS file
-    if dtu_conf != dtu_conf_calib:
-        if args_ignore_dtu_configuration:
-            logger.warning("DTU configuration differences found!")
-        else:
-            logger.warning("DTU configuration from image header:")
-            logger.warning(dtu_conf)
-            logger.warning("DTU configuration from master calibration:")
-            logger.warning(dtu_conf_calib)
-            raise ValueError("DTU configurations do not match!")
-    else:
-        logger.info("DTU configuration match!")
+    # check grism, filter and DTU configuration
+    filter_name, grism_name = check_rectwv_coeff(
+        reduced_image, rectwv_coeff, args_ignore_dtu_configuration
+    )
 
     # valid slitlet numbers
     list_valid_islitlets = list(range(1, EMIR_NBARS + 1))
@@ -118,9 +123,6 @@ def apply_rectwv_coeff(
     # relevant wavelength calibration parameters for rectified and wavelength
     # calibrated image
     wv_parameters = set_wv_parameters(filter_name, grism_name)
-    crpix1_enlarged = wv_parameters["crpix1_enlarged"]
-    crval1_enlarged = wv_parameters["crval1_enlarged"]
-    cdelt1_enlarged = wv_parameters["cdelt1_enlarged"]
     naxis1_enlarged = wv_parameters["naxis1_enlarged"]
 
     # initialize rectified and wavelength calibrated image
@@ -132,101 +134,315 @@ def apply_rectwv_coeff(
     logger.info("Applying rectification and wavelength calibration")
     logger.info("RectWaveCoeff uuid={}".format(rectwv_coeff.uuid))
 
-    cout = "0"
-    for islitlet in range(1, EMIR_NBARS + 1):
+    # rectification and wavelength calibration of the individual slitlets;
+    # each slitlet is written into a disjoint row range of the output image
+    # and the header keywords are merged afterwards in slitlet order
+    if rect_operator is None and use_rectification_operator:
+        rect_operator = get_rectification_operator(
+            rectwv_coeff, args_resampling, cache_dir=operator_cache_dir
+        )
+    list_slt = []
+    list_slitlet2d = []
+    list_matrices = []
+    for islitlet in list_valid_islitlets:
+        # define Slitlet2D object
+        slt = Slitlet2D(
+            islitlet=islitlet, rectwv_coeff=rectwv_coeff, debugplot=debugplot
+        )
+        # extract (distorted) slitlet from the initial image
+        list_slitlet2d.append(slt.extract_slitlet2d(image2d))
+        list_slt.append(slt)
+        if rect_operator is None:
+            list_matrices.append(None)
+        else:
+            list_matrices.append(rect_operator.matrices[islitlet])
+
+    if parallel is not None and debugplot != 0:
+        logger.warning("debugplot != 0: ignoring parallel={}".format(parallel))
+        parallel = None
+    if parallel is None:
+        list_results = map(
+            rectwv_slitlet2d,
+            list_slt,
+            list_slitlet2d,
+            repeat(args_resampling),
+            repeat(wv_parameters),
+            list_matrices,
+        )
+    elif parallel in ["thread", "process"]:
+        if parallel == "thread":
+            executor_class = ThreadPoolExecutor
+        else:
+            executor_class = ProcessPoolExecutor
+        logger.info("Using {} pool with max_workers={}".format(parallel, max_workers))
+        with executor_class(max_workers=max_workers) as executor:
+            list_results = list(
+                executor.map(
+                    rectwv_slitlet2d,
+                    list_slt,
+                    list_slitlet2d,
+                    repeat(args_resampling),
+                    repeat(wv_parameters),
+                    list_matrices,
+                )
+            )
+    else:
+        raise ValueError("Unexpected parallel value=" + str(parallel))
 
-        if islitlet in list_valid_islitlets:
+    dict_limits = {}
+    for slt, result in zip(list_slt, list_results):
+        # save rectified slitlet in its corresponding location within
+        # the full 2d rectified image; the minimum and maximum useful row
+        # in the full 2d rectified image start from 0
+        slitlet2d_rect_wv, jminslt, jmaxslt = result
+        image2d_rectwv[(slt.iminslt - 1) : slt.imaxslt, :] = slitlet2d_rect_wv
+        dict_limits[slt.islitlet] = (slt.iminslt, slt.imaxslt, jminslt, jmaxslt)
 
-            # define Slitlet2D object
-            slt = Slitlet2D(
-                islitlet=islitlet, rectwv_coeff=rectwv_coeff, debugplot=debugplot
-            )
+    update_rectwv_header(header, rectwv_coeff, wv_parameters, dict_limits)
 
-            # extract (distorted) slitlet from the initial image
-            slitlet2d = slt.extract_slitlet2d(image2d)
+    logger.info("Generating rectified and wavelength calibrated image")
+    rectwv_image[0].data = image2d_rectwv
+    return rectwv_image
 
-            # rectify slitlet
-            slitlet2d_rect = slt.rectify(slitlet2d, resampling=args_resampling)
 
-            # wavelength calibration of the rectifed slitlet
-            slitlet2d_rect_wv = resample_image2d_flux(
-                image2d_orig=slitlet2d_rect,
-                naxis1=naxis1_enlarged,
-                cdelt1=cdelt1_enlarged,
-                crval1=crval1_enlarged,
-                crpix1=crpix1_enlarged,
-                coeff=slt.wpoly,
+def apply_rectwv_coeff_batch(
+    list_reduced_images,
+    rectwv_coeff,
+    args_resampling=2,
+    args_ignore_dtu_configuration=True,
+    use_rectification_operator=False,
+    operator_cache_dir=None,
+):
+    """Apply the same rectification and wavelength calibration to many images.
+
+    This function is equivalent to calling apply_rectwv_coeff for each
+    image, but the checks of the coefficients, the wavelength
+    calibration parameters and the Slitlet2D instances are computed
+    only once. Each slitlet is processed for all the images at once,
+    as a stack of slitlet images: the wavelength calibration of the
+    stack is computed in a single call, while the rectification is
+    computed in a single (sparse product) call only when
+    use_rectification_operator=True; otherwise, each image of the
+    stack is rectified separately with Slitlet2D.rectify.
+
+    Parameters
+    ----------
+    list_reduced_images : list of HDUList objects
+        Images with preliminary basic reduction: bpm, bias, dark and
+        flatfield.
+    rectwv_coeff : RectWaveCoeff instance
+        Rectification and wavelength calibration coefficients for the
+        particular CSU configuration, shared by all the images.
+    args_resampling : int
+        1: nearest neighbour, 2: flux preserving interpolation.
+    args_ignore_dtu_configuration : bool
+        If True, ignore differences in DTU configuration.
+    use_rectification_operator : bool
+        If True, the slitlets are rectified with the sparse matrices of
+        the RectificationOperator associated to rectwv_coeff, using a
+        single sparse product for all the images.
+    operator_cache_dir : str or None
+        Directory where the RectificationOperator instances are stored
+        between runs (only used with use_rectification_operator=True).
+
+    Returns
+    -------
+    list_rectwv_images : list of HDUList objects
+        Rectified and wavelength calibrated images.
+
+    """
+
+    logger = logging.getLogger(__name__)
+
+    nimages = len(list_reduced_images)
+    list_rectwv_images = []
+    list_image2d = []
+    wv_parameters = None
+    for reduced_image in list_reduced_images:
+        rectwv_image = copy_img(reduced_image)
+        list_rectwv_images.append(rectwv_image)
+        # apply global offsets
+        list_image2d.append(
+            apply_integer_offsets(
+                image2d=rectwv_image[0].data,
+                offx=rectwv_coeff.global_integer_offset_x_pix,
+                offy=rectwv_coeff.global_integer_offset_y_pix,
             )
+        )
+        # check grism, filter and DTU configuration
+        filter_name, grism_name = check_rectwv_coeff(
+            reduced_image, rectwv_coeff, args_ignore_dtu_configuration
+        )
+        if wv_parameters is None:
+            wv_parameters = set_wv_parameters(filter_name, grism_name)
+
+    if nimages == 0:
+        return list_rectwv_images
 
-            # minimum and maximum useful row in the full 2d rectified image
-            # (starting from 0)
-            i1 = slt.iminslt - 1
-            i2 = slt.imaxslt
+    # valid slitlet numbers
+    list_valid_islitlets = list(range(1, EMIR_NBARS + 1))
+    for idel in rectwv_coeff.missing_slitlets:
+        list_valid_islitlets.remove(idel)
+    logger.debug("Valid slitlet numbers:\n" + str(list_valid_islitlets))
 
-            # minimum and maximum scan in the rectified slitlet
-            # (in pixels, from 1 to NAXIS2)
-            ii1 = slt.min_row_rectified
-            ii2 = slt.max_row_rectified + 1
+    # initialize rectified and wavelength calibrated images
+    naxis1_enlarged = wv_parameters["naxis1_enlarged"]
+    naxis2_enlarged = EMIR_NBARS * EMIR_NPIXPERSLIT_RECTIFIED
+    image3d_rectwv = np.zeros(
+        (nimages, naxis2_enlarged, naxis1_enlarged), dtype="float32"
+    )
 
-            # save rectified slitlet in its corresponding location within
-            # the full 2d rectified image
-            image2d_rectwv[i1:i2, :] = slitlet2d_rect_wv[ii1:ii2, :]
+    logger.info(
+        "Applying rectification and wavelength calibration to {} images".format(nimages)
+    )
+    logger.info("RectWaveCoeff uuid={}".format(rectwv_coeff.uuid))
 
-            # include scan range in FITS header
-            header["imnslt" + str(islitlet).zfill(2)] = (
+    if use_rectification_operator:
+        rect_operator = get_rectification_operator(
+            rectwv_coeff, args_resampling, cache_dir=operator_cache_dir
+        )
+    else:
+        rect_operator = None
+
+    list_dict_limits = [{} for _ in range(nimages)]
+    for islitlet in list_valid_islitlets:
+        slt = Slitlet2D(islitlet=islitlet, rectwv_coeff=rectwv_coeff, debugplot=0)
+        # stack of (distorted) slitlets extracted from the initial images
+        slitlet3d = np.stack(
+            [slt.extract_slitlet2d(image2d) for image2d in list_image2d]
+        )
+        if rect_operator is None:
+            matrix = None
+        else:
+            matrix = rect_operator.matrices[islitlet]
+        slitlet3d_rect_wv, jminslt, jmaxslt = rectwv_slitlet2d(
+            slt, slitlet3d, args_resampling, wv_parameters, matrix
+        )
+        image3d_rectwv[:, (slt.iminslt - 1) : slt.imaxslt, :] = slitlet3d_rect_wv
+        for k in range(nimages):
+            list_dict_limits[k][islitlet] = (
                 slt.iminslt,
-                "minimum Y pixel of useful slitlet region",
-            )
-            header["imxslt" + str(islitlet).zfill(2)] = (
                 slt.imaxslt,
-                "maximum Y pixel of useful slitlet region",
+                int(jminslt[k]),
+                int(jmaxslt[k]),
             )
 
-            # determine useful channel region in each spectrum and include
-            # that information in FITS header
-            jminslt = []
-            jmaxslt = []
-            for idum in range(ii1, ii2 + 1):
-                jminmax = find_pix_borders(slitlet2d_rect_wv[idum, :], sought_value=0)
-                if jminmax != (-1, naxis1_enlarged):
-                    jminslt.append(jminmax[0])
-                    jmaxslt.append(jminmax[1])
-            if len(jminslt) > 0:
-                slt.jminslt = min(jminslt) + 1
-                slt.jmaxslt = max(jmaxslt) + 1
-            header["jmnslt" + str(islitlet).zfill(2)] = (
-                slt.jminslt,
-                "minimum X pixel of useful slitlet region",
-            )
-            header["jmxslt" + str(islitlet).zfill(2)] = (
-                slt.jmaxslt,
-                "maximum X pixel of useful slitlet region",
-            )
+    for k, rectwv_image in enumerate(list_rectwv_images):
+        update_rectwv_header(
+            rectwv_image[0].header, rectwv_coeff, wv_parameters, list_dict_limits[k]
+        )
+        rectwv_image[0].data = image3d_rectwv[k]
 
-            cout += "."
+    return list_rectwv_images
+
+
+def check_rectwv_coeff(reduced_image, rectwv_coeff, ignore_dtu_configuration):
+    """Check that the coefficients can be applied to a given image.
+
+    Parameters
+    ----------
+    reduced_image : HDUList object
+        Image to be rectified and wavelength calibrated.
+    rectwv_coeff : RectWaveCoeff instance
+        Rectification and wavelength calibration coefficients.
+    ignore_dtu_configuration : bool
+        If True, ignore differences in DTU configuration.
+
+    Returns
+    -------
+    filter_name : str
+        Filter name.
+    grism_name : str
+        Grism name.
+
+    """
+
+    logger = logging.getLogger(__name__)
+
+    header = reduced_image[0].header
+
+    # check grism and filter
+    filter_name = header["filter"]
+    logger.info("Filter: " + filter_name)
+    if filter_name != rectwv_coeff.tags["filter"]:
+        raise ValueError("Filter name does not match!")
+    grism_name = header["grism"]
+    logger.info("Grism: " + grism_name)
+    if grism_name != rectwv_coeff.tags["grism"]:
+        raise ValueError("Grism name does not match!")
+
+    # read the DTU configuration from the image header
+    # mecs_header = datamodel.get_mecs_header(reduced_image)
+    dtu_conf = DtuConf.from_img(reduced_image)
 
+    # retrieve DTU configuration from RectWaveCoeff object
+    dtu_conf_calib = DtuConf.from_header(rectwv_coeff.meta_info["dtu_configuration"])
+    # check that the DTU configuration employed to obtain the calibration
+    # corresponds to the DTU configuration in the input FITS file
+    if dtu_conf != dtu_conf_calib:
+        if ignore_dtu_configuration:
+            logger.warning("DTU configuration differences found!")
         else:
+            logger.warning("DTU configuration from image header:")
+            logger.warning(dtu_conf)
+            logger.warning("DTU configuration from master calibration:")
+            logger.warning(dtu_conf_calib)
+            raise ValueError("DTU configurations do not match!")
+    else:
+        logger.info("DTU configuration match!")
 
-            # include scan and channel range in FITS header
-            header["imnslt" + str(islitlet).zfill(2)] = (
-                0,
-                "minimum Y pixel of useful slitlet region",
-            )
-            header["imxslt" + str(islitlet).zfill(2)] = (
-                0,
-                "maximum Y pixel of useful slitlet region",
-            )
-            header["jmnslt" + str(islitlet).zfill(2)] = (
-                0,
-                "minimum X pixel of useful slitlet region",
-            )
-            header["jmxslt" + str(islitlet).zfill(2)] = (
-                0,
-                "maximum X pixel of useful slitlet region",
-            )
+    return filter_name, grism_name
+
+
+def update_rectwv_header(header, rectwv_coeff, wv_parameters, dict_limits):
+    """Update header of rectified and wavelength calibrated image.
+
+    Parameters
+    ----------
+    header : astropy.io.fits.Header
+        Header to be updated.
+    rectwv_coeff : RectWaveCoeff instance
+        Rectification and wavelength calibration coefficients.
+    wv_parameters : dictionary
+        Wavelength calibration parameters of the rectified image,
+        as returned by set_wv_parameters.
+    dict_limits : dictionary
+        Useful region (iminslt, imaxslt, jminslt, jmaxslt) of each
+        valid slitlet in the rectified image. Slitlets not present in
+        this dictionary are stored with zero limits.
 
+    """
+
+    logger = logging.getLogger(__name__)
+
+    cout = "0"
+    for islitlet in range(1, EMIR_NBARS + 1):
+
+        if islitlet in dict_limits:
+            iminslt, imaxslt, jminslt, jmaxslt = dict_limits[islitlet]
+            cout += "."
+        else:
+            iminslt = imaxslt = jminslt = jmaxslt = 0
             cout += "i"
 
+        # include scan and channel range in FITS header
+        header["imnslt" + str(islitlet).zfill(2)] = (
+            iminslt,
+            "minimum Y pixel of useful slitlet region",
+        )
+        header["imxslt" + str(islitlet).zfill(2)] = (
+            imaxslt,
+            "maximum Y pixel of useful slitlet region",
+        )
+        header["jmnslt" + str(islitlet).zfill(2)] = (
+            jminslt,
+            "minimum X pixel of useful slitlet region",
+        )
+        header["jmxslt" + str(islitlet).zfill(2)] = (
+            jmaxslt,
+            "maximum X pixel of useful slitlet region",
+        )
+
         if islitlet % 10 == 0:
             if cout != "i":
                 cout = str(islitlet // 10)
@@ -238,9 +454,15 @@ def apply_rectwv_coeff(
     for keyword in ["crval1", "crpix1", "crval2", "crpix2"]:
         if keyword in header:
             header.remove(keyword)
-    header["crpix1"] = (crpix1_enlarged, "reference pixel")
-    header["crval1"] = (crval1_enlarged, "central wavelength at crpix1")
-    header["cdelt1"] = (cdelt1_enlarged, "linear dispersion (Angstrom/pixel)")
+    header["crpix1"] = (wv_parameters["crpix1_enlarged"], "reference pixel")
+    header["crval1"] = (
+        wv_parameters["crval1_enlarged"],
+        "central wavelength at crpix1",
+    )
+    header["cdelt1"] = (
+        wv_parameters["cdelt1_enlarged"],
+        "linear dispersion (Angstrom/pixel)",
+    )
     header["cunit1"] = ("Angstrom", "units along axis1")
     header["ctype1"] = "WAVE"
     header["crpix2"] = (0.0, "reference pixel")
@@ -278,13 +500,87 @@ def apply_rectwv_coeff(
         "Rectification and wavelength calibration time " + datetime.now().isoformat()
     )
 
-    logger.info("Generating rectified and wavelength calibrated image")
-    rectwv_image[0].data = image2d_rectwv
-    return rectwv_image
 
-    rectwv_image[0].data = image2d_rectwv
-    rectwv_image[0].header = header
-    return rectwv_image
+def rectwv_slitlet2d(slt, slitlet2d, resampling, wv_parameters, matrix=None):
+    """Rectify and wavelength calibrate a single slitlet.
+
+    Parameters
+    ----------
+    slt : Slitlet2D instance
+        Slitlet to be processed.
+    slitlet2d : numpy array
+        Image corresponding to the slitlet region defined by its
+        bounding box (see Slitlet2D.extract_slitlet2d), or 3d array
+        with a stack of such images.
+    resampling : int
+        1: nearest neighbour, 2: flux preserving interpolation.
+    wv_parameters : dictionary
+        Wavelength calibration parameters of the rectified image,
+        as returned by set_wv_parameters.
+    matrix : scipy.sparse matrix or None
+        If not None, sparse matrix performing the rectification of the
+        slitlet (see RectificationOperator), applied to the whole stack
+        with a single product. Otherwise, the images of the stack are
+        rectified one by one with Slitlet2D.rectify.
+
+    Returns
+    -------
+    slitlet2d_rect_wv : numpy array
+        Useful rows of the rectified and wavelength calibrated
+        slitlet, to be placed between rows iminslt and imaxslt of the
+        full 2d rectified image (3d array for a stack of images).
+    jminslt : int or numpy array
+        Minimum useful channel in output full 2d rectified image (one
+        value per image for a stack of images).
+    jmaxslt : int or numpy array
+        Maximum useful channel in output full 2d rectified image (one
+        value per image for a stack of images).
+
+    """
+
+    naxis1_enlarged = wv_parameters["naxis1_enlarged"]
+
+    if slitlet2d.ndim == 2:
+        slitlet3d = slitlet2d[np.newaxis]
+    else:
+        slitlet3d = slitlet2d
+    nimages, naxis2, naxis1 = slitlet3d.shape
+
+    # rectify slitlet (rectify2d works on a single image)
+    if matrix is None:
+        slitlet3d_rect = np.stack(
+            [slt.rectify(image2d, resampling=resampling) for image2d in slitlet3d]
+        )
+    else:
+        slitlet3d_rect = apply_rectification_matrix(matrix, slitlet3d)
+
+    # wavelength calibration of the rectifed slitlet (all the images
+    # are resampled at once, piling up their rows)
+    slitlet3d_rect_wv = resample_image2d_flux(
+        image2d_orig=slitlet3d_rect.reshape(nimages * naxis2, naxis1),
+        naxis1=naxis1_enlarged,
+        cdelt1=wv_parameters["cdelt1_enlarged"],
+        crval1=wv_parameters["crval1_enlarged"],
+        crpix1=wv_parameters["crpix1_enlarged"],
+        coeff=slt.wpoly,
+    ).reshape(nimages, naxis2, naxis1_enlarged)
+
+    # minimum and maximum scan in the rectified slitlet
+    # (in pixels, from 1 to NAXIS2)
+    ii1 = slt.min_row_rectified
+    ii2 = slt.max_row_rectified + 1
+
+    # determine useful channel region in each spectrum
+    jminslt, jmaxslt = find_useful_region(
+        slitlet3d_rect_wv[:, ii1 : (ii2 + 1), :], sought_value=0
+    )
+    found = jminslt != -1
+    jminslt = np.where(found, jminslt + 1, slt.jminslt)
+    jmaxslt = np.where(found, jmaxslt + 1, slt.jmaxslt)
+
+    if slitlet2d.ndim == 2:
+        return slitlet3d_rect_wv[0, ii1:ii2, :], int(jminslt[0]), int(jmaxslt[0])
+    return slitlet3d_rect_wv[:, ii1:ii2, :], jminslt, jmaxslt
 
 
 def main(args=None):
@@ -340,6 +636,25 @@ def main(args=None):
         "transformation and input image",
         action="store_true",
     )
+    parser.add_argument(
+        "--parallel",
+        help="Process slitlets concurrently using a pool of threads "
+        "or processes (default: serial processing)",
+        default=None,
+        choices=("thread", "process"),
+    )
+    parser.add_argument(
+        "--max_workers",
+        help="Maximum number of workers when using --parallel",
+        default=None,
+        type=int,
+    )
+    parser.add_argument(
+        "--operator_cache_dir",
+        help="Rectify using sparse rectification operators, stored "
+        "in this directory between runs",
+        default=None,
+    )
     parser.add_argument(
         "--debugplot",
         help="Integer indicating plotting & debugging options" " (default=0)",
@@ -375,6 +690,10 @@ def main(args=None):
         args_resampling=args.resampling,
         args_ignore_dtu_configuration=args.ignore_dtu_configuration,
         debugplot=args.debugplot,
+        parallel=args.parallel,
+        max_workers=args.max_workers,
+        use_rectification_operator=args.operator_cache_dir is not None,
+        operator_cache_dir=args.operator_cache_dir,
     )
 
     # save result
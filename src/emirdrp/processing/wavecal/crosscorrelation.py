@@ -0,0 +1,200 @@
+#
+# Copyright 2024 Universidad Complutense de Madrid
+#
+# This file is part of PyEmir
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+# License-Filename: LICENSE.txt
+#
+
+"""Batched cross-correlation of spectra against a reference spectrum"""
+
+from collections import OrderedDict
+import hashlib
+
+import numpy as np
+
+from numina.array.wavecalib.crosscorrelation import convolve_comb_lines
+from numina.array.wavecalib.crosscorrelation import cosinebell
+
+# maximum number of reference spectra kept in memory
+REFERENCE_CACHE_MAXSIZE = 8
+
+_reference_cache = OrderedDict()
+
+
+def periodic_corr1d_batch(
+    sp_reference,
+    sp_offset,
+    frac_cosbell=None,
+    zero_padding=None,
+    naround_zero=None,
+    nfit_peak=7,
+):
+    """Periodic correlation of a set of spectra with a reference spectrum.
+
+    Vectorized version of numina's periodic_corr1d (without mean
+    removal, frequency filtering, normalization or plots). The FFT of
+    the reference spectrum is computed only once, and the FFTs of all
+    the spectra are computed in a single call.
+
+    Parameters
+    ----------
+    sp_reference : numpy array
+        Reference spectrum.
+    sp_offset : numpy array
+        2D array with one spectrum in each row, which offset is going
+        to be measured relative to the reference spectrum.
+    frac_cosbell : float or None
+        Fraction of spectrum where the cosine bell falls to zero.
+    zero_padding : int or None
+        Number of extended pixels set to zero.
+    naround_zero : int
+        Half width of the window (around zero offset) to look for
+        the correlation peak. If None, the whole correlation
+        spectrum is employed. Otherwise, the peak will be sought
+        in the interval [-naround_zero, +naround_zero].
+    nfit_peak : int
+        Total number of points (must be odd!) around the peak of the
+        crosscorrelation function to be employed to estimate the peak
+        location (using a fit to a second order polynomial).
+
+    Returns
+    -------
+    offset : numpy array
+        Offset between each spectrum and the reference spectrum.
+    fpeak : numpy array
+        Maximum of each cross-correlation function.
+
+    """
+
+    # protections
+    if sp_reference.ndim != 1 or sp_offset.ndim != 2:
+        raise ValueError("Invalid array dimensions")
+    if sp_reference.shape[0] != sp_offset.shape[1]:
+        raise ValueError("x and y shapes are different")
+    if nfit_peak % 2 == 0:
+        nfit_peak += 1
+
+    nspec = sp_offset.shape[0]
+    offset = np.zeros(nspec)
+    fpeak = np.zeros(nspec)
+    if nspec == 0:
+        return offset, fpeak
+
+    # cosine bell
+    if frac_cosbell is not None:
+        if frac_cosbell < 0.0 or frac_cosbell > 0.5:
+            raise ValueError(f"Invalid frac_cosbell: {frac_cosbell}")
+        bell = cosinebell(sp_reference.size, frac_cosbell)
+        sp_reference = sp_reference * bell
+        sp_offset = sp_offset * bell
+
+    # zero padding
+    if zero_padding is not None:
+        if zero_padding < 0:
+            raise ValueError(f"Invalid zero_padding: {zero_padding}")
+        sp_reference = np.concatenate((sp_reference, np.zeros(zero_padding)))
+        sp_offset = np.concatenate((sp_offset, np.zeros((nspec, zero_padding))), axis=1)
+
+    naxis1 = sp_offset.shape[1]
+
+    # offsets corresponding to each pixel of the sorted correlation
+    xcorr = np.arange(naxis1, dtype=int)
+    naxis1_half = int(naxis1 / 2)
+    naxis1_half_remainder = naxis1 % 2
+    xcorr[naxis1_half + naxis1_half_remainder :] -= naxis1
+    isort = xcorr.argsort()
+    xcorr = xcorr[isort]
+
+    fft_reference = np.fft.fft(sp_reference).conj()
+    corr = np.fft.ifft(np.fft.fft(sp_offset, axis=1) * fft_reference, axis=1).real
+    corr = corr[:, isort]
+
+    # determine correlation peak
+    if naround_zero is None:
+        iminpeak = 0
+        imaxpeak = naxis1 - 1
+    else:
+        izero = np.where(xcorr == 0)[0][0]
+        iminpeak = max(izero - naround_zero, 0)
+        imaxpeak = min(izero + naround_zero, naxis1 - 1)
+    ixpeak = corr[:, iminpeak : (imaxpeak + 1)].argmax(axis=1) + iminpeak
+
+    # fit correlation peak with 2nd order polynomial; the fit is
+    # computed in coordinates relative to the peak, so that all the
+    # spectra share the same design matrix
+    nmed = nfit_peak // 2
+    lpeak_ok = (ixpeak - nmed >= 0) & (ixpeak + nmed < naxis1)
+    u = np.arange(-nmed, nmed + 1)
+    design = np.vander(u, 3, increasing=True)
+    ifit = np.clip(ixpeak[lpeak_ok, np.newaxis] + u, 0, naxis1 - 1)
+    y_fit = np.take_along_axis(corr[lpeak_ok], ifit, axis=1)
+    coef = np.linalg.lstsq(design, y_fit.T, rcond=None)[0]
+    c0, c1, c2 = coef
+    xpeak = xcorr[ixpeak[lpeak_ok]].astype(float)
+    curved = c2 != 0
+    # refined peak relative to xpeak (when the fit is not a parabola,
+    # the peak is evaluated at zero offset, as in periodic_corr1d)
+    urefined = np.where(curved, -c1 / (2.0 * np.where(curved, c2, 1.0)), -xpeak)
+    offset[lpeak_ok] = np.where(curved, xpeak + urefined, 0.0)
+    fpeak[lpeak_ok] = c0 + c1 * urefined + c2 * urefined**2
+
+    return offset, fpeak
+
+
+def cached_convolve_comb_lines(
+    lines_wave, lines_flux, sigma, crpix1, crval1, cdelt1, naxis1
+):
+    """Convolve a set of lines of known wavelengths and flux.
+
+    Cached version of numina's convolve_comb_lines. The resulting
+    spectra are kept in memory, using as key the line catalogue, the
+    broadening sigma and the wavelength calibration parameters.
+
+    Parameters
+    ----------
+    lines_wave : array like
+        Input array with wavelengths
+    lines_flux : array like
+        Input array with fluxes
+    sigma : float
+        Sigma of the broadening gaussian to be applied.
+    crpix1 : float
+        CRPIX1 of the desired wavelength calibration.
+    crval1 : float
+        CRVAL1 of the desired wavelength calibration.
+    cdelt1 : float
+        CDELT1 of the desired wavelength calibration.
+    naxis1 : integer
+        NAXIS1 of the output spectrum.
+
+    Returns
+    -------
+    xwave : array like
+        Array with wavelengths for the output spectrum.
+    spectrum : array like
+        Array with the expected fluxes at each pixel. A new copy is
+        returned in each call.
+
+    """
+
+    lines_wave = np.asarray(lines_wave, dtype=float)
+    lines_flux = np.asarray(lines_flux, dtype=float)
+    md5 = hashlib.md5()
+    md5.update(lines_wave.tobytes())
+    md5.update(lines_flux.tobytes())
+    md5.update(repr((sigma, crpix1, crval1, cdelt1, naxis1)).encode())
+    key = md5.hexdigest()
+
+    if key in _reference_cache:
+        _reference_cache.move_to_end(key)
+    else:
+        _reference_cache[key] = convolve_comb_lines(
+            lines_wave, lines_flux, sigma, crpix1, crval1, cdelt1, naxis1
+        )
+        while len(_reference_cache) > REFERENCE_CACHE_MAXSIZE:
+            _reference_cache.popitem(last=False)
+
+    xwave, spectrum = _reference_cache[key]
+    return xwave.copy(), spectrum.copy()
@@ -17,7 +17,6 @@ from emirdrp.instrument.csu_configuration import CsuConfiguration
 
 from numina.array.display.ximshow import ximshow
 from numina.array.wavecalib.fix_pix_borders import define_mask_borders
-from numina.frame.utils import copy_img
 from numina.tools.arg_file_is_new import arg_file_is_new
 
 from emirdrp.core import EMIR_NBARS
@@ -29,7 +28,7 @@ from emirdrp.core import EMIR_MAXIMUM_SLITLET_WIDTH_MM
 
 
 def median_slitlets_rectified(
-    input_image, mode=0, list_useful_slitlets=None, debugplot=0
+    input_image, mode=0, list_useful_slitlets=None, useful_rows=False, debugplot=0
 ):
     """Compute median spectrum for each slitlet.
 
@@ -49,6 +48,12 @@ def median_slitlets_rectified(
     list_useful_slitlets : list of integers or None
         List of useful slitlets (from 1 to EMIR_NBARS). If None, the
         list contains all the slitlets.
+    useful_rows : bool
+        If True, the median spectrum of each slitlet is computed using
+        only the rows within the useful slitlet region, as given by the
+        keywords IMNSLTxx and IMXSLTxx of the input image header (the
+        full slitlet band is employed for the slitlets without these
+        keywords). Otherwise, all the rows of the slitlet band are used.
     debugplot : int
         Determines whether intermediate computations and/or plots
         are displayed. The valid codes are defined in
@@ -59,9 +64,13 @@ def median_slitlets_rectified(
     image_median : HDUList object
         Output image.
 
+    Notes
+    -----
+    The median spectra are computed slitlet by slitlet, using views of
+    the input data array, which can be a memory-mapped array.
+
     """
 
-    result = copy_img(input_image)
     image_header = input_image[0].header
     image2d = input_image[0].data
 
@@ -87,14 +96,17 @@ def median_slitlets_rectified(
     for i in range(EMIR_NBARS):
         ns1 = i * EMIR_NPIXPERSLIT_RECTIFIED + 1
         ns2 = ns1 + EMIR_NPIXPERSLIT_RECTIFIED - 1
+        if useful_rows:
+            iminslt = image_header.get("imnslt" + str(i + 1).zfill(2), 0)
+            imaxslt = image_header.get("imxslt" + str(i + 1).zfill(2), 0)
+            if 0 < iminslt <= imaxslt:
+                ns1, ns2 = max(ns1, iminslt), min(ns2, imaxslt)
         sp_median = np.median(image2d[(ns1 - 1) : ns2, :], axis=0)
 
         if mode == 0:
-            image2d_median[(ns1 - 1) : ns2, :] = np.tile(
-                sp_median, (EMIR_NPIXPERSLIT_RECTIFIED, 1)
-            )
+            image2d_median[(ns1 - 1) : ns2, :] = sp_median
         else:
-            image2d_median[i] = np.copy(sp_median)
+            image2d_median[i] = sp_median
 
     if mode == 2:
         # define wavelength calibration parameters
@@ -157,9 +169,15 @@ def median_slitlets_rectified(
         # median spectrum
         image1d_median = np.ma.median(image2d_masked, axis=0).data
 
-        result[0].data = image1d_median.astype("float32")
+        result_data = image1d_median.astype("float32")
     else:
-        result[0].data = image2d_median.astype("float32")
+        result_data = image2d_median
+
+    # the input data array is not duplicated
+    result = fits.HDUList(
+        [fits.PrimaryHDU(result_data, header=image_header.copy())]
+        + [hdu.copy() for hdu in input_image[1:]]
+    )
 
     return result
 
@@ -204,6 +222,11 @@ def main(args=None):
         default=EMIR_MAXIMUM_SLITLET_WIDTH_MM,
         type=float,
     )
+    parser.add_argument(
+        "--useful_rows",
+        help="Use only the useful region (IMNSLTxx, IMXSLTxx) of each slitlet",
+        action="store_true",
+    )
     parser.add_argument(
         "--debugplot",
         help="Integer indicating plotting/debugging" + " (default=0)",
@@ -233,6 +256,7 @@ def main(args=None):
         hdulist,
         mode=args.mode,
         list_useful_slitlets=list_useful_slitlets,
+        useful_rows=args.useful_rows,
         debugplot=args.debugplot,
     )
 
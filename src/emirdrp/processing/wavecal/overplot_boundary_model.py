@@ -11,8 +11,6 @@ import argparse
 from astropy.io import fits
 import numpy as np
 import os.path
-import pkgutil
-from io import StringIO
 import sys
 
 from numina.array.display.pause_debugplot import pause_debugplot
@@ -22,6 +20,7 @@ from numina.tools.arg_file_is_new import arg_file_is_new
 
 from emirdrp.instrument.csu_configuration import CsuConfiguration
 from emirdrp.products import MasterRectWave
+from emirdrp.processing.wavecal.retrieve_catlines import retrieve_catlines
 from emirdrp.processing.wavecal.rectwv_coeff_from_mos_library import (
     rectwv_coeff_from_mos_library,
 )
@@ -295,25 +294,9 @@ def main(args=None):
         # rectwv_coeff.writeto('xxx.json')
 
         if args.arc_lines:
-            if grism == "LR":
-                catlines_file = "lines_argon_neon_xenon_empirical_LR.dat"
-            else:
-                catlines_file = "lines_argon_neon_xenon_empirical.dat"
-            dumdata = pkgutil.get_data("emirdrp.instrument.configs", catlines_file)
-            arc_lines_tmpfile = StringIO(dumdata.decode("utf8"))
-            catlines = np.genfromtxt(arc_lines_tmpfile)
-            # define wavelength and flux as separate arrays
-            catlines_all_wave = catlines[:, 0]
-            # catlines_all_flux = catlines[:, 1]
+            catlines_all_wave, _ = retrieve_catlines(1, grism)
         elif args.oh_lines:
-            dumdata = pkgutil.get_data(
-                "emirdrp.instrument.configs", "Oliva_etal_2013.dat"
-            )
-            oh_lines_tmpfile = StringIO(dumdata.decode("utf8"))
-            catlines = np.genfromtxt(oh_lines_tmpfile)
-            # define wavelength and flux as separate arrays
-            catlines_all_wave = np.concatenate((catlines[:, 1], catlines[:, 0]))
-            # catlines_all_flux = np.concatenate((catlines[:, 2], catlines[:, 2]))
+            catlines_all_wave, _ = retrieve_catlines(11, grism)
         else:
             raise ValueError("This should not happen!")
 
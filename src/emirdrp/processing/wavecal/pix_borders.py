@@ -0,0 +1,123 @@
+#
+# Copyright 2024 Universidad Complutense de Madrid
+#
+# This file is part of PyEmir
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+# License-Filename: LICENSE.txt
+#
+
+"""Vectorized determination of the useful region of spectra"""
+
+import numpy as np
+
+
+def find_pix_borders_2d(image, sought_value):
+    """Find useful region of all the spectra of an image.
+
+    Vectorized version of numina's find_pix_borders: the initial (final)
+    pixels with values equal to 'sought_value' are skipped, for all the
+    spectra (rows) of the input array at once.
+
+    Parameters
+    ----------
+    image : numpy array
+        Input array. The spectral direction corresponds to the last
+        axis (a 1D array is a single spectrum).
+    sought_value : int, float, bool
+        Pixel value that indicate missing data in the spectrum.
+
+    Returns
+    -------
+    jmin, jmax : numpy arrays (integers)
+        Valid region of each spectrum (in array coordinates, from 0 to
+        NAXIS1 - 1), with shape image.shape[:-1]. If the values of all
+        the pixels in a spectrum are equal to 'sought_value', the
+        returned values are jmin=-1 and jmax=naxis1. For a 1D input
+        array, two integers are returned.
+
+    """
+
+    mask = np.asarray(image) != sought_value
+    naxis1 = mask.shape[-1]
+    anyvalid = mask.any(axis=-1)
+    jmin = np.where(anyvalid, mask.argmax(axis=-1), -1)
+    jmax = np.where(anyvalid, naxis1 - 1 - mask[..., ::-1].argmax(axis=-1), naxis1)
+
+    if mask.ndim == 1:
+        return int(jmin), int(jmax)
+    return jmin, jmax
+
+
+def find_useful_region(image, sought_value):
+    """Find the useful channel region of a set of spectra.
+
+    Parameters
+    ----------
+    image : numpy array
+        Input array. The spectral direction corresponds to the last
+        axis and the spectra to combine correspond to the previous one
+        (a 3D array is treated as a stack of independent 2D images).
+    sought_value : int, float, bool
+        Pixel value that indicate missing data in the spectrum.
+
+    Returns
+    -------
+    jmin, jmax : numpy arrays (integers)
+        Minimum and maximum of the valid region of the individual
+        spectra (in array coordinates, from 0 to NAXIS1 - 1), ignoring
+        the spectra without valid pixels. If none of the spectra
+        contains valid pixels, the returned values are jmin=-1 and
+        jmax=naxis1.
+
+    """
+
+    naxis1 = image.shape[-1]
+    jmin, jmax = find_pix_borders_2d(image, sought_value)
+    valid = jmin != -1
+    anyvalid = valid.any(axis=-1)
+    jmin = np.where(anyvalid, np.where(valid, jmin, naxis1).min(axis=-1), -1)
+    jmax = np.where(anyvalid, np.where(valid, jmax, -1).max(axis=-1), naxis1)
+    return jmin, jmax
+
+
+def fix_pix_borders_2d(image2d, nreplace, sought_value, replacement_value):
+    """Replace a few pixels at the borders of each spectrum.
+
+    Vectorized version of numina's fix_pix_borders: 'nreplace' pixels
+    at the beginning (at the end) of each spectrum, just after (before)
+    the spectrum value changes from (to) 'sought_value', as seen from
+    the image borders, are set to 'replacement_value'.
+
+    Parameters
+    ----------
+    image2d : numpy array
+        Initial 2D image. It is modified in place.
+    nreplace : int
+        Number of pixels to be replaced in each border.
+    sought_value : int, float, bool
+        Pixel value that indicates missing data in the spectrum.
+    replacement_value : int, float, bool
+        Pixel value to be employed in the 'nreplace' pixels.
+
+    Returns
+    -------
+    image2d : numpy array
+        Final 2D image.
+
+    """
+
+    naxis1 = image2d.shape[1]
+    jborder_min, jborder_max = find_pix_borders_2d(image2d, sought_value)
+    jj = np.arange(naxis1)
+    # rows with only 'sought_value' pixels are not modified
+    valid = (jborder_min != -1)[:, np.newaxis]
+    left = (jj >= jborder_min[:, np.newaxis]) & (
+        jj < (jborder_min + nreplace)[:, np.newaxis]
+    )
+    right = (jj <= jborder_max[:, np.newaxis]) & (
+        jj > (jborder_max - nreplace)[:, np.newaxis]
+    )
+    image2d[valid & (left | right)] = replacement_value
+
+    return image2d
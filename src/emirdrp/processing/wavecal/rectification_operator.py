@@ -0,0 +1,355 @@
+#
+# Copyright 2024 Universidad Complutense de Madrid
+#
+# This file is part of PyEmir
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+# License-Filename: LICENSE.txt
+#
+
+"""Sparse rectification operator for the slitlets of a RectWaveCoeff"""
+
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+from scipy import sparse
+
+from numina.array.distortion import fmap
+from numina.array.distortion import order_fmap
+from numina.array.distortion import rectify2d
+
+from emirdrp.core import EMIR_NBARS
+from .slitlet2d import Slitlet2D
+
+# maximum number of RectificationOperator instances kept in memory
+OPERATOR_CACHE_MAXSIZE = 4
+
+_operator_cache = OrderedDict()
+
+
+def rectification_matrix(naxis1, naxis2, aij, bij, resampling):
+    """Compute the sparse matrix equivalent to rectify2d.
+
+    The rectification performed by rectify2d (both with nearest
+    neighbour and with flux preserving interpolation) is linear in
+    the input image. This function returns the corresponding matrix,
+    so that rectify2d(image2d, aij, bij, resampling) is equal to
+    (matrix @ image2d.ravel()).reshape(naxis2, naxis1), except for
+    rounding errors introduced by the different order of the sums.
+
+    For resampling=2, the weights (areas of the intersections of the
+    distorted pixels with the pixels of the input image) are obtained
+    by applying rectify2d to a small set of probe images containing
+    isolated unit pixels. The separation between those pixels exceeds
+    the size of the region of the input image that contributes to any
+    output pixel, so each output pixel receives signal from at most
+    one unit pixel per probe image.
+
+    Parameters
+    ----------
+    naxis1 : int
+        NAXIS1 of the input (and output) image.
+    naxis2 : int
+        NAXIS2 of the input (and output) image.
+    aij : numpy array
+        Coefficients a_ij of the transformation.
+    bij : numpy array
+        Coefficients b_ij of the transformation.
+    resampling : int
+        1: nearest neighbour, 2: flux preserving interpolation.
+
+    Returns
+    -------
+    matrix : scipy.sparse.csr_matrix
+        Matrix of shape (naxis2 * naxis1, naxis2 * naxis1).
+
+    """
+
+    aij = np.asarray(aij, dtype=float)
+    bij = np.asarray(bij, dtype=float)
+    ncoef = len(aij)
+    if len(bij) != ncoef:
+        raise ValueError("aij and bij lengths are different!")
+    order = order_fmap(ncoef)
+    npix = naxis1 * naxis2
+
+    if resampling == 1:
+        # same computation as in rectify2d
+        j = np.arange(0, naxis1, dtype=float)
+        i = np.arange(0, naxis2, dtype=float)
+        xx = np.tile(j, (len(i),))
+        yy = np.repeat(i, len(j))
+        xxx, yyy = fmap(order, aij, bij, xx, yy)
+        ixxx = np.rint(xxx).astype(int)
+        iyyy = np.rint(yyy).astype(int)
+        lok = (ixxx >= 0) & (ixxx < naxis1) & (iyyy >= 0) & (iyyy < naxis2)
+        rows = (yy.astype(int) * naxis1 + xx.astype(int))[lok]
+        cols = (iyyy * naxis1 + ixxx)[lok]
+        data = np.ones(rows.size)
+    elif resampling == 2:
+        # distorted corners of every output pixel, following the same
+        # ordering employed in rectify2d: pixel k corresponds to
+        # column k // naxis2 and row k % naxis2
+        j = np.array([[k - 0.5, k + 0.5, k + 0.5, k - 0.5] for k in range(naxis1)])
+        i = np.array([[k - 0.5, k - 0.5, k + 0.5, k + 0.5] for k in range(naxis2)])
+        xx = np.reshape(np.tile(j, naxis2), npix * 4)
+        yy = np.concatenate([np.reshape(i, naxis2 * 4)] * naxis1)
+        xxx, yyy = fmap(order, aij, bij, xx, yy)
+        xxx = xxx.reshape(npix, 4)
+        yyy = yyy.reshape(npix, 4)
+        # pixels of the input image that can intersect each distorted
+        # pixel (note that the C cast truncates towards zero)
+        jmin = np.trunc(xxx.min(axis=1) + 0.5).astype(int)
+        jmax = np.trunc(xxx.max(axis=1) + 0.5).astype(int)
+        imin = np.trunc(yyy.min(axis=1) + 0.5).astype(int)
+        imax = np.trunc(yyy.max(axis=1) + 0.5).astype(int)
+        ixx = np.repeat(np.arange(naxis1), naxis2)
+        iyy = np.tile(np.arange(naxis2), (naxis1,))
+        # step between unit pixels in the probe images
+        istep = max(1, int(np.max(imax - imin)) + 1)
+        jstep = max(1, int(np.max(jmax - jmin)) + 1)
+        list_rows = []
+        list_cols = []
+        list_data = []
+        for ioff in range(istep):
+            # the only input pixel of the current probe image that can
+            # intersect each distorted pixel
+            icand = imin + np.mod(ioff - imin, istep)
+            for joff in range(jstep):
+                jcand = jmin + np.mod(joff - jmin, jstep)
+                probe = np.zeros((naxis2, naxis1))
+                probe[ioff::istep, joff::jstep] = 1.0
+                weights = rectify2d(probe, aij, bij, resampling=2)[iyy, ixx]
+                lok = weights != 0
+                list_rows.append((iyy * naxis1 + ixx)[lok])
+                list_cols.append((icand * naxis1 + jcand)[lok])
+                list_data.append(weights[lok])
+        rows = np.concatenate(list_rows)
+        cols = np.concatenate(list_cols)
+        data = np.concatenate(list_data)
+    else:
+        raise ValueError("Unexpected resampling value=" + str(resampling))
+
+    matrix = sparse.csr_matrix((data, (rows, cols)), shape=(npix, npix))
+    matrix.sum_duplicates()
+    return matrix
+
+
+def apply_rectification_matrix(matrix, image2d):
+    """Apply a matrix computed with rectification_matrix.
+
+    Parameters
+    ----------
+    matrix : scipy.sparse matrix
+        Rectification matrix.
+    image2d : numpy array
+        2D image, or 3D array with a stack of 2D images, which are
+        rectified with a single sparse product.
+
+    Returns
+    -------
+    image2d_rect : numpy array
+        Rectified image (or stack of images).
+
+    """
+    if image2d.ndim == 2:
+        return (matrix @ image2d.ravel()).reshape(image2d.shape)
+    nimages = image2d.shape[0]
+    result = matrix @ image2d.reshape(nimages, -1).T
+    return result.T.reshape(image2d.shape)
+
+
+class RectificationOperator:
+    """Rectification of the slitlets of a RectWaveCoeff as sparse matrices.
+
+    Parameters
+    ----------
+    signature : str
+        Identifier of the rectification transformation (see
+        rectification_signature).
+    resampling : int
+        1: nearest neighbour, 2: flux preserving interpolation.
+    matrices : dict
+        Sparse matrix (see rectification_matrix) for each slitlet
+        number, computed using the direct transformation.
+    shapes : dict
+        Shape (naxis2, naxis1) of the slitlet bounding box for each
+        slitlet number.
+
+    """
+
+    def __init__(self, signature, resampling, matrices, shapes):
+        self.signature = signature
+        self.resampling = resampling
+        self.matrices = matrices
+        self.shapes = shapes
+
+    @classmethod
+    def from_rectwv_coeff(cls, rectwv_coeff, resampling):
+        """Compute the rectification matrices of all the valid slitlets"""
+        matrices = {}
+        shapes = {}
+        for islitlet in range(1, EMIR_NBARS + 1):
+            if islitlet in rectwv_coeff.missing_slitlets:
+                continue
+            slt = Slitlet2D(islitlet=islitlet, rectwv_coeff=rectwv_coeff, debugplot=0)
+            naxis1 = slt.bb_nc2_orig - slt.bb_nc1_orig + 1
+            naxis2 = slt.bb_ns2_orig - slt.bb_ns1_orig + 1
+            matrices[islitlet] = rectification_matrix(
+                naxis1, naxis2, slt.ttd_aij, slt.ttd_bij, resampling
+            )
+            shapes[islitlet] = (naxis2, naxis1)
+        return cls(rectification_signature(rectwv_coeff), resampling, matrices, shapes)
+
+    def rectify(self, islitlet, slitlet2d):
+        """Rectify a slitlet (or a stack of slitlets).
+
+        Parameters
+        ----------
+        islitlet : int
+            Slitlet number.
+        slitlet2d : numpy array
+            Image containing the 2d slitlet image, or 3d array with a
+            stack of such images, with the shape of the slitlet
+            bounding box.
+
+        Returns
+        -------
+        slitlet2d_rect : numpy array
+            Rectified slitlet image (or stack of images).
+
+        """
+        if slitlet2d.shape[-2:] != self.shapes[islitlet]:
+            raise ValueError("Unexpected slitlet2d shape")
+        return apply_rectification_matrix(self.matrices[islitlet], slitlet2d)
+
+    def writeto(self, filename):
+        """Save operator in a NumPy .npz file"""
+        arrays = {}
+        for islitlet, matrix in self.matrices.items():
+            cslitlet = "slitlet" + str(islitlet).zfill(2)
+            arrays[cslitlet + "_data"] = matrix.data
+            arrays[cslitlet + "_indices"] = matrix.indices
+            arrays[cslitlet + "_indptr"] = matrix.indptr
+            arrays[cslitlet + "_shape"] = np.array(self.shapes[islitlet])
+        header = {
+            "signature": self.signature,
+            "resampling": self.resampling,
+            "slitlets": sorted(self.matrices),
+        }
+        arrays["header"] = np.array(json.dumps(header))
+        with open(filename, "wb") as fd:
+            np.savez(fd, **arrays)
+
+    @classmethod
+    def load(cls, filename):
+        """Read operator from a NumPy .npz file"""
+        with np.load(filename) as npz:
+            header = json.loads(str(npz["header"]))
+            matrices = {}
+            shapes = {}
+            for islitlet in header["slitlets"]:
+                cslitlet = "slitlet" + str(islitlet).zfill(2)
+                shape = tuple(int(n) for n in npz[cslitlet + "_shape"])
+                npix = shape[0] * shape[1]
+                matrices[islitlet] = sparse.csr_matrix(
+                    (
+                        npz[cslitlet + "_data"],
+                        npz[cslitlet + "_indices"],
+                        npz[cslitlet + "_indptr"],
+                    ),
+                    shape=(npix, npix),
+                )
+                shapes[islitlet] = shape
+        return cls(header["signature"], header["resampling"], matrices, shapes)
+
+
+def rectification_signature(rectwv_coeff):
+    """Identifier of the rectification transformation of a RectWaveCoeff.
+
+    The identifier combines the UUID of the RectWaveCoeff instance with
+    a hash of the parameters that determine the rectification of each
+    slitlet (bounding boxes and direct transformation), so that a
+    modified copy sharing the same UUID is not mistaken for the
+    original.
+    """
+    keys = [
+        "bb_nc1_orig",
+        "bb_nc2_orig",
+        "bb_ns1_orig",
+        "bb_ns2_orig",
+        "ttd_aij",
+        "ttd_bij",
+    ]
+    params = []
+    for islitlet in range(1, EMIR_NBARS + 1):
+        if islitlet in rectwv_coeff.missing_slitlets:
+            continue
+        tmpcontent = rectwv_coeff.contents[islitlet - 1]
+        params.append(
+            [islitlet] + [np.asarray(tmpcontent[key]).tolist() for key in keys]
+        )
+    digest = hashlib.md5(json.dumps(params).encode("utf-8")).hexdigest()
+    return "{}-{}".format(rectwv_coeff.uuid, digest)
+
+
+def get_rectification_operator(rectwv_coeff, resampling, cache_dir=None):
+    """Return the RectificationOperator of a RectWaveCoeff.
+
+    Operators are kept in memory (the last OPERATOR_CACHE_MAXSIZE
+    computed) and, optionally, stored in cache_dir, so that the
+    geometry of the rectification is computed only once for all
+    the frames sharing the same RectWaveCoeff.
+
+    Parameters
+    ----------
+    rectwv_coeff : RectWaveCoeff instance
+        Rectification and wavelength calibration coefficients.
+    resampling : int
+        1: nearest neighbour, 2: flux preserving interpolation.
+    cache_dir : str or None
+        Directory where operators are stored between runs. If None,
+        the operators are only kept in memory.
+
+    Returns
+    -------
+    operator : RectificationOperator instance
+        Rectification operator.
+
+    """
+
+    logger = logging.getLogger(__name__)
+
+    signature = rectification_signature(rectwv_coeff)
+    key = (signature, resampling)
+    if key in _operator_cache:
+        _operator_cache.move_to_end(key)
+        logger.debug("Using cached rectification operator %s", signature)
+        return _operator_cache[key]
+
+    filename = None
+    operator = None
+    if cache_dir is not None:
+        filename = os.path.join(
+            cache_dir, "rectop_{}_r{}.npz".format(signature, resampling)
+        )
+        if os.path.isfile(filename):
+            logger.info("Reading rectification operator from %s", filename)
+            operator = RectificationOperator.load(filename)
+
+    if operator is None:
+        logger.info("Computing rectification operator %s", signature)
+        operator = RectificationOperator.from_rectwv_coeff(rectwv_coeff, resampling)
+        if filename is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            logger.info("Saving rectification operator in %s", filename)
+            operator.writeto(filename)
+
+    _operator_cache[key] = operator
+    while len(_operator_cache) > OPERATOR_CACHE_MAXSIZE:
+        _operator_cache.popitem(last=False)
+    return operator
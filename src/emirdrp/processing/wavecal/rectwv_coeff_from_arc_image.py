@@ -13,6 +13,7 @@ Rectification and wavelength calibration polynomials from arc image
 
 import argparse
 from astropy.io import fits
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 import logging
 import numpy as np
@@ -44,6 +45,9 @@ from numina.array.display.pause_debugplot import DEBUGPLOT_CODES
 from emirdrp.core import EMIR_NAXIS1
 from emirdrp.core import EMIR_NBARS
 
+# data shared by all the slitlets in each worker process
+_worker_state = {}
+
 
 def rectwv_coeff_from_arc_image(
     reduced_image,
@@ -64,6 +68,8 @@ def rectwv_coeff_from_arc_image(
     args_pdf=None,
     args_geometry=(0, 0, 640, 480),
     debugplot=0,
+    parallel=None,
+    max_workers=None,
 ):
     """Evaluate rect.+wavecal. coefficients from arc image
 
@@ -106,6 +112,12 @@ def rectwv_coeff_from_arc_image(
     debugplot : int
             Debugging level for messages and plots. For details see
             'numina.array.display.pause_debugplot.py'.
+    parallel : str or None
+        If 'process', the slitlets are computed in a pool of worker
+        processes (ignored when debugplot != 0, args_interactive=True
+        or args_pdf is not None).
+    max_workers : int or None
+        Maximum number of worker processes when parallel='process'.
 
     Returns
     -------
@@ -207,6 +219,49 @@ def rectwv_coeff_from_arc_image(
     # compute rectification transformation and wavelength calibration
     # polynomials
 
+    arc_parameters = {
+        "csu_conf": csu_conf,
+        "params": params,
+        "parmodel": parmodel,
+        "wv_master": wv_master,
+        "wv_master_all": wv_master_all,
+        "nbrightlines": nbrightlines,
+        "poly_crval1_linear": poly_crval1_linear,
+        "poly_cdelt1_linear": poly_cdelt1_linear,
+        "wvmin_expected": wvmin_expected,
+        "wvmax_expected": wvmax_expected,
+        "wvmin_useful": wvmin_useful,
+        "wvmax_useful": wvmax_useful,
+        "args_ymargin_bb": args_ymargin_bb,
+        "args_remove_sp_background": args_remove_sp_background,
+        "args_times_sigma_threshold": args_times_sigma_threshold,
+        "args_order_fmap": args_order_fmap,
+        "args_sigma_gaussian_filtering": args_sigma_gaussian_filtering,
+        "args_margin_npix": args_margin_npix,
+        "args_poldeg_initial": args_poldeg_initial,
+        "args_poldeg_refined": args_poldeg_refined,
+        "args_interactive": args_interactive,
+        "args_threshold_wv": args_threshold_wv,
+        "args_ylogscale": args_ylogscale,
+        "args_pdf": args_pdf,
+        "args_geometry": args_geometry,
+    }
+
+    # the slitlets are independent: they can be computed in parallel
+    # (except when plots or interactive mode are required)
+    list_islitlets = list(range(islitlet_min, islitlet_max + 1))
+    if parallel is not None:
+        if debugplot != 0 or args_interactive or args_pdf is not None:
+            logger.warning(
+                "debugplot, interactive or pdf in use: ignoring "
+                "parallel={}".format(parallel)
+            )
+            parallel = None
+    list_results = _compute_slitlets(
+        list_islitlets, image2d, arc_parameters, debugplot, parallel, max_workers
+    )
+    dict_results = dict(zip(list_islitlets, list_results))
+
     measured_slitlets = []
 
     cout = "0"
@@ -214,189 +269,15 @@ def rectwv_coeff_from_arc_image(
 
         if islitlet_min <= islitlet <= islitlet_max:
 
-            # define Slitlet2dArc object
-            slt = Slitlet2dArc(
-                islitlet=islitlet,
-                csu_conf=csu_conf,
-                ymargin_bb=args_ymargin_bb,
-                params=params,
-                parmodel=parmodel,
-                debugplot=debugplot,
-            )
-
-            # extract 2D image corresponding to the selected slitlet, clipping
-            # the image beyond the unrectified slitlet (in order to isolate
-            # the arc lines of the current slitlet; otherwise there are
-            # problems with arc lines from neighbour slitlets)
-            image2d_tmp = select_unrectified_slitlet(
-                image2d=image2d,
-                islitlet=islitlet,
-                csu_bar_slit_center=csu_conf.csu_bar_slit_center(islitlet),
-                params=params,
-                parmodel=parmodel,
-                maskonly=False,
-            )
-            slitlet2d = slt.extract_slitlet2d(image2d_tmp)
-
-            # subtract smooth background computed as follows:
-            # - median collapsed spectrum of the whole slitlet2d
-            # - independent median filtering of the previous spectrum in the
-            #   two halves in the spectral direction
-            if args_remove_sp_background:
-                spmedian = np.median(slitlet2d, axis=0)
-                naxis1_tmp = spmedian.shape[0]
-                jmidpoint = naxis1_tmp // 2
-                sp1 = medfilt(spmedian[:jmidpoint], [201])
-                sp2 = medfilt(spmedian[jmidpoint:], [201])
-                spbackground = np.concatenate((sp1, sp2))
-                slitlet2d -= spbackground
-
-            # locate unknown arc lines
-            slt.locate_unknown_arc_lines(
-                slitlet2d=slitlet2d, times_sigma_threshold=args_times_sigma_threshold
-            )
-
-            # continue working with current slitlet only if arc lines have
-            # been detected
-            if slt.list_arc_lines is not None:
-
-                # compute intersections between spectrum trails and arc lines
-                slt.xy_spectrail_arc_intersections(slitlet2d=slitlet2d)
-
-                # compute rectification transformation
-                slt.estimate_tt_to_rectify(order=args_order_fmap, slitlet2d=slitlet2d)
-
-                # rectify image
-                slitlet2d_rect = slt.rectify(slitlet2d, resampling=2, transformation=1)
-
-                # median spectrum and line peaks from rectified image
-                sp_median, fxpeaks = slt.median_spectrum_from_rectified_image(
-                    slitlet2d_rect,
-                    sigma_gaussian_filtering=args_sigma_gaussian_filtering,
-                    nwinwidth_initial=5,
-                    nwinwidth_refined=5,
-                    times_sigma_threshold=5,
-                    npix_avoid_border=6,
-                    nbrightlines=nbrightlines,
-                )
-
+            slt, sp_median, status = dict_results[islitlet]
+            if sp_median is not None:
                 image2d_55sp[islitlet - 1, :] = sp_median
-
-                # determine expected wavelength limits prior to the wavelength
-                # calibration
-                csu_bar_slit_center = csu_conf.csu_bar_slit_center(islitlet)
-                crval1_linear = poly_crval1_linear(csu_bar_slit_center)
-                cdelt1_linear = poly_cdelt1_linear(csu_bar_slit_center)
-                expected_wvmin = crval1_linear - args_margin_npix * cdelt1_linear
-                naxis1_linear = sp_median.shape[0]
-                crvaln_linear = crval1_linear + (naxis1_linear - 1) * cdelt1_linear
-                expected_wvmax = crvaln_linear + args_margin_npix * cdelt1_linear
-                # override previous estimates when necessary
-                if wvmin_expected is not None:
-                    expected_wvmin = wvmin_expected
-                if wvmax_expected is not None:
-                    expected_wvmax = wvmax_expected
-
-                # clip initial master arc line list with bright lines to
-                # the expected wavelength range
-                lok1 = expected_wvmin <= wv_master
-                lok2 = wv_master <= expected_wvmax
-                lok = lok1 * lok2
-                wv_master_eff = wv_master[lok]
-
-                # perform initial wavelength calibration
-                solution_wv = wvcal_spectrum(
-                    sp=sp_median,
-                    fxpeaks=fxpeaks,
-                    poly_degree_wfit=args_poldeg_initial,
-                    wv_master=wv_master_eff,
-                    wv_ini_search=expected_wvmin,
-                    wv_end_search=expected_wvmax,
-                    wvmin_useful=wvmin_useful,
-                    wvmax_useful=wvmax_useful,
-                    geometry=args_geometry,
-                    debugplot=slt.debugplot,
-                )
-                # store initial wavelength calibration polynomial in current
-                # slitlet instance
-                slt.wpoly = np.polynomial.Polynomial(solution_wv.coeff)
-                pause_debugplot(debugplot)
-
-                # clip initial master arc line list with all the lines to
-                # the expected wavelength range
-                lok1 = expected_wvmin <= wv_master_all
-                lok2 = wv_master_all <= expected_wvmax
-                lok = lok1 * lok2
-                wv_master_all_eff = wv_master_all[lok]
-
-                # clip master arc line list to useful region
-                if wvmin_useful is not None:
-                    lok = wvmin_useful <= wv_master_all_eff
-                    wv_master_all_eff = wv_master_all_eff[lok]
-                if wvmax_useful is not None:
-                    lok = wv_master_all_eff <= wvmax_useful
-                    wv_master_all_eff = wv_master_all_eff[lok]
-
-                # refine wavelength calibration
-                if args_poldeg_refined > 0:
-                    plottitle = "[slitlet#{}, refined]".format(islitlet)
-                    poly_refined, yres_summary = refine_arccalibration(
-                        sp=sp_median,
-                        poly_initial=slt.wpoly,
-                        wv_master=wv_master_all_eff,
-                        poldeg=args_poldeg_refined,
-                        ntimes_match_wv=1,
-                        interactive=args_interactive,
-                        threshold=args_threshold_wv,
-                        plottitle=plottitle,
-                        ylogscale=args_ylogscale,
-                        geometry=args_geometry,
-                        pdf=args_pdf,
-                        debugplot=slt.debugplot,
-                    )
-                    # store refined wavelength calibration polynomial in
-                    # current slitlet instance
-                    slt.wpoly = poly_refined
-
-                # compute approximate linear values for CRVAL1 and CDELT1
-                naxis1_linear = sp_median.shape[0]
-                crmin1_linear = slt.wpoly(1)
-                crmax1_linear = slt.wpoly(naxis1_linear)
-                slt.crval1_linear = crmin1_linear
-                slt.cdelt1_linear = (crmax1_linear - crmin1_linear) / (
-                    naxis1_linear - 1
-                )
-
-                # check that the trimming of wv_master and wv_master_all has
-                # preserved the wavelength range [crmin1_linear, crmax1_linear]
-                if crmin1_linear < expected_wvmin:
-                    logger.warning(">>> islitlet: " + str(islitlet))
-                    logger.warning("expected_wvmin: " + str(expected_wvmin))
-                    logger.warning("crmin1_linear.: " + str(crmin1_linear))
-                    logger.warning(
-                        "WARNING: Unexpected crmin1_linear < " "expected_wvmin"
-                    )
-                if crmax1_linear > expected_wvmax:
-                    logger.warning(">>> islitlet: " + str(islitlet))
-                    logger.warning("expected_wvmax: " + str(expected_wvmax))
-                    logger.warning("crmax1_linear.: " + str(crmax1_linear))
-                    logger.warning(
-                        "WARNING: Unexpected crmax1_linear > " "expected_wvmax"
-                    )
-
-                cout += "."
-
-            else:
-
-                cout += "x"
+            cout += status
 
             if islitlet % 10 == 0:
                 if cout != "x":
                     cout = str(islitlet // 10)
 
-            if debugplot != 0:
-                pause_debugplot(debugplot)
-
         else:
 
             # define Slitlet2dArc object
@@ -611,6 +492,290 @@ def rectwv_coeff_from_arc_image(
     return rectwv_coeff, reduced_55sp
 
 
+def rectwv_slitlet2darc(islitlet, image2d, arc_parameters, debugplot=0):
+    """Compute rect.+wavecal. coefficients of a single slitlet.
+
+    Parameters
+    ----------
+    islitlet : int
+        Slitlet number.
+    image2d : numpy array
+        Arc image with preliminary basic reduction.
+    arc_parameters : dictionary
+        Common parameters for all the slitlets, as computed in
+        rectwv_coeff_from_arc_image: 'csu_conf', 'params', 'parmodel',
+        'wv_master', 'wv_master_all', 'nbrightlines', the
+        wavelength calibration parameters 'poly_crval1_linear',
+        'poly_cdelt1_linear', 'wvmin_expected', 'wvmax_expected',
+        'wvmin_useful' and 'wvmax_useful', and the 'args_*' arguments
+        of rectwv_coeff_from_arc_image.
+    debugplot : int
+        Debugging level for messages and plots. For details see
+        'numina.array.display.pause_debugplot.py'.
+
+    Returns
+    -------
+    slt : Slitlet2dArc instance
+        Slitlet with the computed rectification transformation and
+        wavelength calibration polynomial.
+    sp_median : numpy array or None
+        Median spectrum of the rectified slitlet. None if no arc lines
+        have been detected.
+    status : str
+        '.' if the slitlet has been calibrated, 'x' if no arc lines
+        have been detected.
+
+    """
+
+    logger = logging.getLogger(__name__)
+
+    csu_conf = arc_parameters["csu_conf"]
+    params = arc_parameters["params"]
+    parmodel = arc_parameters["parmodel"]
+    wv_master = arc_parameters["wv_master"]
+    wv_master_all = arc_parameters["wv_master_all"]
+    nbrightlines = arc_parameters["nbrightlines"]
+    poly_crval1_linear = arc_parameters["poly_crval1_linear"]
+    poly_cdelt1_linear = arc_parameters["poly_cdelt1_linear"]
+    wvmin_expected = arc_parameters["wvmin_expected"]
+    wvmax_expected = arc_parameters["wvmax_expected"]
+    wvmin_useful = arc_parameters["wvmin_useful"]
+    wvmax_useful = arc_parameters["wvmax_useful"]
+    args_ymargin_bb = arc_parameters["args_ymargin_bb"]
+    args_remove_sp_background = arc_parameters["args_remove_sp_background"]
+    args_times_sigma_threshold = arc_parameters["args_times_sigma_threshold"]
+    args_order_fmap = arc_parameters["args_order_fmap"]
+    args_sigma_gaussian_filtering = arc_parameters["args_sigma_gaussian_filtering"]
+    args_margin_npix = arc_parameters["args_margin_npix"]
+    args_poldeg_initial = arc_parameters["args_poldeg_initial"]
+    args_poldeg_refined = arc_parameters["args_poldeg_refined"]
+    args_interactive = arc_parameters["args_interactive"]
+    args_threshold_wv = arc_parameters["args_threshold_wv"]
+    args_ylogscale = arc_parameters["args_ylogscale"]
+    args_pdf = arc_parameters["args_pdf"]
+    args_geometry = arc_parameters["args_geometry"]
+
+    # define Slitlet2dArc object
+    slt = Slitlet2dArc(
+        islitlet=islitlet,
+        csu_conf=csu_conf,
+        ymargin_bb=args_ymargin_bb,
+        params=params,
+        parmodel=parmodel,
+        debugplot=debugplot,
+    )
+
+    # extract 2D image corresponding to the selected slitlet, clipping
+    # the image beyond the unrectified slitlet (in order to isolate
+    # the arc lines of the current slitlet; otherwise there are
+    # problems with arc lines from neighbour slitlets)
+    image2d_tmp = select_unrectified_slitlet(
+        image2d=image2d,
+        islitlet=islitlet,
+        csu_bar_slit_center=csu_conf.csu_bar_slit_center(islitlet),
+        params=params,
+        parmodel=parmodel,
+        maskonly=False,
+    )
+    slitlet2d = slt.extract_slitlet2d(image2d_tmp)
+
+    # subtract smooth background computed as follows:
+    # - median collapsed spectrum of the whole slitlet2d
+    # - independent median filtering of the previous spectrum in the
+    #   two halves in the spectral direction
+    if args_remove_sp_background:
+        spmedian = np.median(slitlet2d, axis=0)
+        naxis1_tmp = spmedian.shape[0]
+        jmidpoint = naxis1_tmp // 2
+        sp1 = medfilt(spmedian[:jmidpoint], [201])
+        sp2 = medfilt(spmedian[jmidpoint:], [201])
+        spbackground = np.concatenate((sp1, sp2))
+        slitlet2d -= spbackground
+
+    # locate unknown arc lines
+    slt.locate_unknown_arc_lines(
+        slitlet2d=slitlet2d, times_sigma_threshold=args_times_sigma_threshold
+    )
+
+    # continue working with current slitlet only if arc lines have
+    # been detected
+    if slt.list_arc_lines is not None:
+
+        # compute intersections between spectrum trails and arc lines
+        slt.xy_spectrail_arc_intersections(slitlet2d=slitlet2d)
+
+        # compute rectification transformation
+        slt.estimate_tt_to_rectify(order=args_order_fmap, slitlet2d=slitlet2d)
+
+        # rectify image
+        slitlet2d_rect = slt.rectify(slitlet2d, resampling=2, transformation=1)
+
+        # median spectrum and line peaks from rectified image
+        sp_median, fxpeaks = slt.median_spectrum_from_rectified_image(
+            slitlet2d_rect,
+            sigma_gaussian_filtering=args_sigma_gaussian_filtering,
+            nwinwidth_initial=5,
+            nwinwidth_refined=5,
+            times_sigma_threshold=5,
+            npix_avoid_border=6,
+            nbrightlines=nbrightlines,
+        )
+
+        # determine expected wavelength limits prior to the wavelength
+        # calibration
+        csu_bar_slit_center = csu_conf.csu_bar_slit_center(islitlet)
+        crval1_linear = poly_crval1_linear(csu_bar_slit_center)
+        cdelt1_linear = poly_cdelt1_linear(csu_bar_slit_center)
+        expected_wvmin = crval1_linear - args_margin_npix * cdelt1_linear
+        naxis1_linear = sp_median.shape[0]
+        crvaln_linear = crval1_linear + (naxis1_linear - 1) * cdelt1_linear
+        expected_wvmax = crvaln_linear + args_margin_npix * cdelt1_linear
+        # override previous estimates when necessary
+        if wvmin_expected is not None:
+            expected_wvmin = wvmin_expected
+        if wvmax_expected is not None:
+            expected_wvmax = wvmax_expected
+
+        # clip initial master arc line list with bright lines to
+        # the expected wavelength range
+        lok1 = expected_wvmin <= wv_master
+        lok2 = wv_master <= expected_wvmax
+        lok = lok1 * lok2
+        wv_master_eff = wv_master[lok]
+
+        # perform initial wavelength calibration
+        solution_wv = wvcal_spectrum(
+            sp=sp_median,
+            fxpeaks=fxpeaks,
+            poly_degree_wfit=args_poldeg_initial,
+            wv_master=wv_master_eff,
+            wv_ini_search=expected_wvmin,
+            wv_end_search=expected_wvmax,
+            wvmin_useful=wvmin_useful,
+            wvmax_useful=wvmax_useful,
+            geometry=args_geometry,
+            debugplot=slt.debugplot,
+        )
+        # store initial wavelength calibration polynomial in current
+        # slitlet instance
+        slt.wpoly = np.polynomial.Polynomial(solution_wv.coeff)
+        pause_debugplot(debugplot)
+
+        # clip initial master arc line list with all the lines to
+        # the expected wavelength range
+        lok1 = expected_wvmin <= wv_master_all
+        lok2 = wv_master_all <= expected_wvmax
+        lok = lok1 * lok2
+        wv_master_all_eff = wv_master_all[lok]
+
+        # clip master arc line list to useful region
+        if wvmin_useful is not None:
+            lok = wvmin_useful <= wv_master_all_eff
+            wv_master_all_eff = wv_master_all_eff[lok]
+        if wvmax_useful is not None:
+            lok = wv_master_all_eff <= wvmax_useful
+            wv_master_all_eff = wv_master_all_eff[lok]
+
+        # refine wavelength calibration
+        if args_poldeg_refined > 0:
+            plottitle = "[slitlet#{}, refined]".format(islitlet)
+            poly_refined, yres_summary = refine_arccalibration(
+                sp=sp_median,
+                poly_initial=slt.wpoly,
+                wv_master=wv_master_all_eff,
+                poldeg=args_poldeg_refined,
+                ntimes_match_wv=1,
+                interactive=args_interactive,
+                threshold=args_threshold_wv,
+                plottitle=plottitle,
+                ylogscale=args_ylogscale,
+                geometry=args_geometry,
+                pdf=args_pdf,
+                debugplot=slt.debugplot,
+            )
+            # store refined wavelength calibration polynomial in
+            # current slitlet instance
+            slt.wpoly = poly_refined
+
+        # compute approximate linear values for CRVAL1 and CDELT1
+        naxis1_linear = sp_median.shape[0]
+        crmin1_linear = slt.wpoly(1)
+        crmax1_linear = slt.wpoly(naxis1_linear)
+        slt.crval1_linear = crmin1_linear
+        slt.cdelt1_linear = (crmax1_linear - crmin1_linear) / (naxis1_linear - 1)
+
+        # check that the trimming of wv_master and wv_master_all has
+        # preserved the wavelength range [crmin1_linear, crmax1_linear]
+        if crmin1_linear < expected_wvmin:
+            logger.warning(">>> islitlet: " + str(islitlet))
+            logger.warning("expected_wvmin: " + str(expected_wvmin))
+            logger.warning("crmin1_linear.: " + str(crmin1_linear))
+            logger.warning("WARNING: Unexpected crmin1_linear < " "expected_wvmin")
+        if crmax1_linear > expected_wvmax:
+            logger.warning(">>> islitlet: " + str(islitlet))
+            logger.warning("expected_wvmax: " + str(expected_wvmax))
+            logger.warning("crmax1_linear.: " + str(crmax1_linear))
+            logger.warning("WARNING: Unexpected crmax1_linear > " "expected_wvmax")
+
+        image1d_sp = sp_median
+        status = "."
+
+    else:
+
+        image1d_sp = None
+        status = "x"
+
+    if debugplot != 0:
+        pause_debugplot(debugplot)
+
+    return slt, image1d_sp, status
+
+
+def _compute_slitlets(
+    list_islitlets,
+    image2d,
+    arc_parameters,
+    debugplot=0,
+    parallel=None,
+    max_workers=None,
+):
+    """Call rectwv_slitlet2darc for each slitlet, serially or in a pool"""
+
+    logger = logging.getLogger(__name__)
+
+    if parallel is None:
+        list_results = [
+            rectwv_slitlet2darc(islitlet, image2d, arc_parameters, debugplot)
+            for islitlet in list_islitlets
+        ]
+    elif parallel == "process":
+        logger.info("Using process pool with max_workers={}".format(max_workers))
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(image2d, arc_parameters),
+        ) as executor:
+            list_results = list(
+                executor.map(_rectwv_slitlet2darc_worker, list_islitlets)
+            )
+    else:
+        raise ValueError("Unexpected parallel value=" + str(parallel))
+    return list_results
+
+
+def _init_worker(image2d, arc_parameters):
+    """Store the data shared by all the slitlets in a worker process"""
+    _worker_state["image2d"] = image2d
+    _worker_state["arc_parameters"] = arc_parameters
+
+
+def _rectwv_slitlet2darc_worker(islitlet):
+    """Call rectwv_slitlet2darc with the data stored in the worker process"""
+    return rectwv_slitlet2darc(
+        islitlet, _worker_state["image2d"], _worker_state["arc_parameters"]
+    )
+
+
 def main(args=None):
 
     # parse command-line options
@@ -738,6 +903,17 @@ def main(args=None):
         help="output PDF file name",
         type=lambda x: arg_file_is_new(parser, x, mode="wb"),
     )
+    parser.add_argument(
+        "--parallel",
+        help="Compute the slitlets in a pool of worker processes",
+        action="store_const",
+        const="process",
+    )
+    parser.add_argument(
+        "--max_workers",
+        help="Maximum number of worker processes (default=number of CPUs)",
+        type=int,
+    )
     parser.add_argument(
         "--debugplot",
         help="Integer indicating plotting & debugging options" " (default=0)",
@@ -806,6 +982,8 @@ def main(args=None):
         args_pdf=pdf,
         args_geometry=geometry,
         debugplot=args.debugplot,
+        parallel=args.parallel,
+        max_workers=args.max_workers,
     )
 
     # save image with collapsed spectra employed to determine the
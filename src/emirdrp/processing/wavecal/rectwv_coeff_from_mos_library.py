@@ -13,9 +13,14 @@ Rectification and wavelength calibration polynomials from empirical library
 
 import argparse
 from astropy.io import fits
+from collections import OrderedDict
+from copy import deepcopy
 from datetime import datetime
+import hashlib
+import json
 import logging
 import numpy as np
+import os
 from scipy.interpolate import interp1d
 import sys
 from uuid import uuid4
@@ -40,6 +45,11 @@ from emirdrp.core import EMIR_NAXIS1
 from emirdrp.core import EMIR_NAXIS2
 from emirdrp.core import EMIR_NBARS
 
+# maximum number of RectWaveCoeff instances kept in memory
+RECTWV_COEFF_CACHE_MAXSIZE = 16
+
+_rectwv_coeff_cache = OrderedDict()
+
 
 def rectwv_coeff_from_mos_library(
     reduced_image, master_rectwv, ignore_dtu_configuration=True, debugplot=0
@@ -420,6 +430,114 @@ def rectwv_coeff_from_mos_library(
     return rectwv_coeff
 
 
+def mos_library_signature(reduced_image, master_rectwv, ignore_dtu_configuration=True):
+    """Signature of the RectWaveCoeff synthesized for a particular image.
+
+    The coefficients computed by rectwv_coeff_from_mos_library only
+    depend on the MasterRectWave instance, the CSU and DTU
+    configurations, and the filter and grism of the image.
+
+    Parameters
+    ----------
+    reduced_image : HDUList object
+        Image with preliminary basic reduction: bpm, bias, dark and
+        flatfield.
+    master_rectwv : MasterRectWave instance
+        Rectification and Wavelength Calibrartion Library product.
+    ignore_dtu_configuration : bool
+        If True, ignore differences in DTU configuration.
+
+    Returns
+    -------
+    signature : str
+        Hash of the relevant configuration.
+
+    """
+
+    header = reduced_image[0].header
+    mecs_header = datamodel.get_mecs_header(reduced_image)
+    csu_conf = CsuConfiguration.define_from_header(mecs_header)
+    dtu_conf = DtuConf.from_img(reduced_image)
+
+    state = {
+        "master_rectwv": master_rectwv.uuid,
+        "csu_bar_left": [csu_conf.csu_bar_left(i) for i in range(1, EMIR_NBARS + 1)],
+        "csu_bar_right": [csu_conf.csu_bar_right(i) for i in range(1, EMIR_NBARS + 1)],
+        "dtu_configuration": dtu_conf.outdict(),
+        "filter": header["filter"],
+        "grism": header["grism"],
+        "ignore_dtu_configuration": ignore_dtu_configuration,
+    }
+    return hashlib.md5(json.dumps(state, sort_keys=True).encode()).hexdigest()
+
+
+def get_rectwv_coeff_from_mos_library(
+    reduced_image, master_rectwv, ignore_dtu_configuration=True, cache_dir=None
+):
+    """Return (cached) rect.+wavecal. coefficients from MOS library
+
+    Images obtained with the same CSU and DTU configurations share the
+    same rectification and wavelength calibration coefficients. The
+    RectWaveCoeff instances computed with rectwv_coeff_from_mos_library
+    are stored in memory (and optionally on disk) using the signature
+    returned by mos_library_signature as key.
+
+    Parameters
+    ----------
+    reduced_image : HDUList object
+        Image with preliminary basic reduction: bpm, bias, dark and
+        flatfield.
+    master_rectwv : MasterRectWave instance
+        Rectification and Wavelength Calibrartion Library product.
+    ignore_dtu_configuration : bool
+        If True, ignore differences in DTU configuration.
+    cache_dir : str or None
+        If not None, directory where the RectWaveCoeff instances are
+        stored as JSON files, to be reused in subsequent runs.
+
+    Returns
+    -------
+    rectwv_coeff : RectWaveCoeff instance
+        Rectification and wavelength calibration coefficients for the
+        particular CSU configuration. A new copy is returned in each
+        call, so it can be safely modified by the caller. All the
+        copies share the same uuid.
+
+    """
+
+    logger = logging.getLogger(__name__)
+
+    signature = mos_library_signature(
+        reduced_image, master_rectwv, ignore_dtu_configuration
+    )
+    if signature in _rectwv_coeff_cache:
+        logger.info("Using cached RectWaveCoeff for signature " + signature)
+        _rectwv_coeff_cache.move_to_end(signature)
+        return deepcopy(_rectwv_coeff_cache[signature])
+
+    rectwv_coeff = None
+    filename = None
+    if cache_dir is not None:
+        filename = os.path.join(cache_dir, "rectwv_coeff_{}.json".format(signature))
+        if os.path.isfile(filename):
+            logger.info("Reading RectWaveCoeff from " + filename)
+            rectwv_coeff = RectWaveCoeff._datatype_load(filename)
+
+    if rectwv_coeff is None:
+        rectwv_coeff = rectwv_coeff_from_mos_library(
+            reduced_image, master_rectwv, ignore_dtu_configuration
+        )
+        if filename is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            rectwv_coeff.writeto(filename)
+
+    _rectwv_coeff_cache[signature] = rectwv_coeff
+    while len(_rectwv_coeff_cache) > RECTWV_COEFF_CACHE_MAXSIZE:
+        _rectwv_coeff_cache.popitem(last=False)
+
+    return deepcopy(rectwv_coeff)
+
+
 def main(args=None):
     # parse command-line options
     parser = argparse.ArgumentParser(
@@ -463,6 +581,12 @@ def main(args=None):
         help="Ignore DTU configurations differences between " "model and input image",
         action="store_true",
     )
+    parser.add_argument(
+        "--cache_dir",
+        help="Directory to store (and reuse) the coefficients computed "
+        "for each CSU configuration",
+        type=str,
+    )
     parser.add_argument(
         "--debugplot",
         help="Integer indicating plotting & debugging options" " (default=0)",
@@ -485,12 +609,20 @@ def main(args=None):
     master_rectwv = MasterRectWave._datatype_load(args.rect_wpoly_MOSlibrary.name)
 
     # compute rectification and wavelength calibration coefficients
-    rectwv_coeff = rectwv_coeff_from_mos_library(
-        hdulist,
-        master_rectwv,
-        ignore_dtu_configuration=args.ignore_dtu_configuration,
-        debugplot=args.debugplot,
-    )
+    if args.cache_dir is None:
+        rectwv_coeff = rectwv_coeff_from_mos_library(
+            hdulist,
+            master_rectwv,
+            ignore_dtu_configuration=args.ignore_dtu_configuration,
+            debugplot=args.debugplot,
+        )
+    else:
+        rectwv_coeff = get_rectwv_coeff_from_mos_library(
+            hdulist,
+            master_rectwv,
+            ignore_dtu_configuration=args.ignore_dtu_configuration,
+            cache_dir=args.cache_dir,
+        )
 
     # set global offsets
     rectwv_coeff.global_integer_offset_x_pix = args.global_integer_offset_x_pix
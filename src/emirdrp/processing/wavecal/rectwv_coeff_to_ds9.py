@@ -11,11 +11,12 @@
 import argparse
 import numpy as np
 from numpy.polynomial import Polynomial
-import pkgutil
-from io import StringIO
 import sys
 
+from emirdrp.processing.wavecal.retrieve_catlines import retrieve_catlines
 from emirdrp.processing.wavecal.set_wv_parameters import set_wv_parameters
+from emirdrp.processing.wavecal.slitlet_geometry import ds9_polylines
+from emirdrp.processing.wavecal.slitlet_geometry import eval_polynomials
 from emirdrp.products import RectWaveCoeff
 
 from numina.array.distortion import fmap
@@ -122,92 +123,103 @@ def rectwv_coeff_to_ds9(rectwv_coeff, limits=None, rectified=False, numpix=100):
     ds9_output += "# grism...............: {0}\n".format(rectwv_coeff.tags["grism"])
     ds9_output += "# filter..............: {0}\n".format(rectwv_coeff.tags["filter"])
 
-    for islitlet in range(1, EMIR_NBARS + 1):
-        if islitlet not in rectwv_coeff.missing_slitlets:
-            dumdict = rectwv_coeff.contents[islitlet - 1]
-            if islitlet % 2 == 0:
-                if limits == "frontiers":
-                    colorbox = "#0000ff"  # '#ff77ff'
-                else:
-                    colorbox = "#ff00ff"  # '#ff77ff'
+    list_islitlet = [
+        islitlet
+        for islitlet in range(1, EMIR_NBARS + 1)
+        if islitlet not in rectwv_coeff.missing_slitlets
+    ]
+
+    list_colorbox = []
+    for islitlet in list_islitlet:
+        if islitlet % 2 == 0:
+            if limits == "frontiers":
+                colorbox = "#0000ff"  # '#ff77ff'
             else:
-                if limits == "frontiers":
-                    colorbox = "#0000ff"  # '#4444ff'
-                else:
-                    colorbox = "#00ffff"  # '#4444ff'
+                colorbox = "#ff00ff"  # '#ff77ff'
+        else:
+            if limits == "frontiers":
+                colorbox = "#0000ff"  # '#4444ff'
+            else:
+                colorbox = "#00ffff"  # '#4444ff'
+        list_colorbox.append(colorbox)
 
-            ds9_output += "#\n# islitlet...........: {0}\n".format(islitlet)
-            ds9_output += "# csu_bar_slit_center: {0}\n".format(
-                dumdict["csu_bar_slit_center"]
-            )
-            if rectified:
-                crpix1_linear = 1.0
-                crval1_linear = dumdict["crval1_linear"]
-                cdelt1_linear = dumdict["cdelt1_linear"]
-                if limits == "frontiers":
-                    ydum_lower = dumdict["y0_frontier_lower_expected"]
-                    ydum_upper = dumdict["y0_frontier_upper_expected"]
-                else:
-                    ydum_lower = dumdict["y0_reference_lower_expected"]
-                    ydum_upper = dumdict["y0_reference_upper_expected"]
-                wave_ini = crval1_linear + (0.5 - crpix1_linear) * cdelt1_linear
-                xdum_ini = (wave_ini - crval1_enlarged) / cdelt1_enlarged
-                xdum_ini += crpix1_enlarged
-                wave_end = (
-                    crval1_linear + (EMIR_NAXIS1 + 0.5 - crpix1_linear) * cdelt1_linear
-                )
-                xdum_end = (wave_end - crval1_enlarged) / cdelt1_enlarged
-                xdum_end += crpix1_enlarged
-                for ydum in [ydum_lower, ydum_upper]:
-                    ds9_output += "line {0} {1} {2} {3}".format(
-                        xdum_ini, ydum, xdum_end, ydum
-                    )
-                    ds9_output += " # color={0}\n".format(colorbox)
-                # slitlet label
-                ydum_label = (ydum_lower + ydum_upper) / 2.0
-                xdum_label = EMIR_NAXIS1 / 2 + 0.5
-                wave_center = (
-                    crval1_linear + (xdum_label - crpix1_linear) * cdelt1_linear
-                )
-                xdum_label = (wave_center - crval1_enlarged) / cdelt1_enlarged
-                xdum_label += crpix1_enlarged
-                ds9_output += (
-                    "text {0} {1} {{{2}}} # color={3} "
-                    'font="helvetica 10 bold '
-                    'roman"\n'.format(xdum_label, ydum_label, islitlet, colorbox)
-                )
+    if not rectified:
+        # evaluate the lower and upper limits of all the slitlets at once
+        if limits == "frontiers":
+            key = "frontier"
+        else:
+            key = "spectrail"
+        list_pol_lower = []
+        list_pol_upper = []
+        for islitlet in list_islitlet:
+            dumdict = rectwv_coeff.contents[islitlet - 1]
+            list_pol_lower.append(dumdict[key]["poly_coef_lower"])
+            list_pol_upper.append(dumdict[key]["poly_coef_upper"])
+        xdum = np.linspace(1, EMIR_NAXIS1, num=numpix)
+        yoffset = float(rectwv_coeff.global_integer_offset_y_pix)
+        list_ds9_lower = ds9_polylines(
+            xdum, eval_polynomials(list_pol_lower, xdum) - yoffset, list_colorbox
+        )
+        list_ds9_upper = ds9_polylines(
+            xdum, eval_polynomials(list_pol_upper, xdum) - yoffset, list_colorbox
+        )
+        xdum_label = EMIR_NAXIS1 / 2 + 0.5
+        ydum_label = (
+            eval_polynomials(list_pol_lower, xdum_label)
+            + eval_polynomials(list_pol_upper, xdum_label)
+        ) / 2.0
+
+    for k, islitlet in enumerate(list_islitlet):
+        dumdict = rectwv_coeff.contents[islitlet - 1]
+        colorbox = list_colorbox[k]
+
+        ds9_output += "#\n# islitlet...........: {0}\n".format(islitlet)
+        ds9_output += "# csu_bar_slit_center: {0}\n".format(
+            dumdict["csu_bar_slit_center"]
+        )
+        if rectified:
+            crpix1_linear = 1.0
+            crval1_linear = dumdict["crval1_linear"]
+            cdelt1_linear = dumdict["cdelt1_linear"]
+            if limits == "frontiers":
+                ydum_lower = dumdict["y0_frontier_lower_expected"]
+                ydum_upper = dumdict["y0_frontier_upper_expected"]
             else:
-                if limits == "frontiers":
-                    pol_lower = Polynomial(dumdict["frontier"]["poly_coef_lower"])
-                    pol_upper = Polynomial(dumdict["frontier"]["poly_coef_upper"])
-                else:
-                    pol_lower = Polynomial(dumdict["spectrail"]["poly_coef_lower"])
-                    pol_upper = Polynomial(dumdict["spectrail"]["poly_coef_upper"])
-                xdum = np.linspace(1, EMIR_NAXIS1, num=numpix)
-                ydum = pol_lower(xdum)
-                ydum -= float(rectwv_coeff.global_integer_offset_y_pix)
-                for i in range(len(xdum) - 1):
-                    ds9_output += "line {0} {1} {2} {3}".format(
-                        xdum[i], ydum[i], xdum[i + 1], ydum[i + 1]
-                    )
-                    ds9_output += " # color={0}\n".format(colorbox)
-                ydum = pol_upper(xdum)
-                ydum -= float(rectwv_coeff.global_integer_offset_y_pix)
-                for i in range(len(xdum) - 1):
-                    ds9_output += "line {0} {1} {2} {3}".format(
-                        xdum[i], ydum[i], xdum[i + 1], ydum[i + 1]
-                    )
-                    ds9_output += " # color={0}\n".format(colorbox)
-                # slitlet label
-                xdum_label = EMIR_NAXIS1 / 2 + 0.5
-                ydum_lower = pol_lower(xdum_label)
-                ydum_upper = pol_upper(xdum_label)
-                ydum_label = (ydum_lower + ydum_upper) / 2.0
-                ds9_output += (
-                    "text {0} {1} {{{2}}} # color={3} "
-                    'font="helvetica 10 bold '
-                    'roman"\n'.format(xdum_label, ydum_label, islitlet, colorbox)
+                ydum_lower = dumdict["y0_reference_lower_expected"]
+                ydum_upper = dumdict["y0_reference_upper_expected"]
+            wave_ini = crval1_linear + (0.5 - crpix1_linear) * cdelt1_linear
+            xdum_ini = (wave_ini - crval1_enlarged) / cdelt1_enlarged
+            xdum_ini += crpix1_enlarged
+            wave_end = (
+                crval1_linear + (EMIR_NAXIS1 + 0.5 - crpix1_linear) * cdelt1_linear
+            )
+            xdum_end = (wave_end - crval1_enlarged) / cdelt1_enlarged
+            xdum_end += crpix1_enlarged
+            for ydum in [ydum_lower, ydum_upper]:
+                ds9_output += "line {0} {1} {2} {3}".format(
+                    xdum_ini, ydum, xdum_end, ydum
                 )
+                ds9_output += " # color={0}\n".format(colorbox)
+            # slitlet label
+            ydum_label = (ydum_lower + ydum_upper) / 2.0
+            xdum_label = EMIR_NAXIS1 / 2 + 0.5
+            wave_center = crval1_linear + (xdum_label - crpix1_linear) * cdelt1_linear
+            xdum_label = (wave_center - crval1_enlarged) / cdelt1_enlarged
+            xdum_label += crpix1_enlarged
+            ds9_output += (
+                "text {0} {1} {{{2}}} # color={3} "
+                'font="helvetica 10 bold '
+                'roman"\n'.format(xdum_label, ydum_label, islitlet, colorbox)
+            )
+        else:
+            ds9_output += list_ds9_lower[k]
+            ds9_output += list_ds9_upper[k]
+            # slitlet label
+            ds9_output += (
+                "text {0} {1} {{{2}}} # color={3} "
+                'font="helvetica 10 bold '
+                'roman"\n'.format(xdum_label, ydum_label[k], islitlet, colorbox)
+            )
 
     return ds9_output
 
@@ -269,23 +281,9 @@ def spectral_lines_to_ds9(rectwv_coeff, spectral_lines=None, rectified=False):
 
     if spectral_lines == "arc":
         grism_name = rectwv_coeff.tags["grism"]
-        if grism_name == "LR":
-            catlines_file = "lines_argon_neon_xenon_empirical_LR.dat"
-        else:
-            catlines_file = "lines_argon_neon_xenon_empirical.dat"
-        dumdata = pkgutil.get_data("emirdrp.instrument.configs", catlines_file)
-        arc_lines_tmpfile = StringIO(dumdata.decode("utf8"))
-        catlines = np.genfromtxt(arc_lines_tmpfile)
-        # define wavelength and flux as separate arrays
-        catlines_all_wave = catlines[:, 0]
-        # catlines_all_flux = catlines[:, 1]
+        catlines_all_wave, _ = retrieve_catlines(1, grism_name)
     elif spectral_lines == "oh":
-        dumdata = pkgutil.get_data("emirdrp.instrument.configs", "Oliva_etal_2013.dat")
-        oh_lines_tmpfile = StringIO(dumdata.decode("utf8"))
-        catlines = np.genfromtxt(oh_lines_tmpfile)
-        # define wavelength and flux as separate arrays
-        catlines_all_wave = np.concatenate((catlines[:, 1], catlines[:, 0]))
-        # catlines_all_flux = np.concatenate((catlines[:, 2], catlines[:, 2]))
+        catlines_all_wave, _ = retrieve_catlines(11, None)
     else:
         raise ValueError("This should not happen!")
 
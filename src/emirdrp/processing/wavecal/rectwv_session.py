@@ -0,0 +1,227 @@
+#
+# Copyright 2024 Universidad Complutense de Madrid
+#
+# This file is part of PyEmir
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+# License-Filename: LICENSE.txt
+#
+
+"""Rectification products shared by the recipes of a reduction session"""
+
+from collections import OrderedDict, namedtuple
+from copy import deepcopy
+import logging
+
+from .apply_rectwv_coeff import apply_rectwv_coeff
+from .rectification_operator import get_rectification_operator
+from .rectification_operator import rectification_signature
+from .rectwv_coeff_from_mos_library import get_rectwv_coeff_from_mos_library
+from .rectwv_coeff_from_mos_library import mos_library_signature
+
+# maximum number of configurations kept by a session
+SESSION_MAXSIZE = 16
+# maximum number of rectification operators kept by a session (each
+# operator of a full image takes a few hundred MB)
+SESSION_OPERATOR_MAXSIZE = 2
+
+SessionInfo = namedtuple(
+    "SessionInfo",
+    ["coeff_hits", "coeff_misses", "operator_hits", "operator_misses", "currsize"],
+)
+
+_session = None
+
+
+class RectWaveSession:
+    """Rectification products shared across the recipe runs of a session.
+
+    The rectification and wavelength calibration coefficients
+    synthesized from the MOS library are kept using as key the
+    signature of the configuration of the image (see
+    mos_library_signature), and the rectification operators using as
+    key the signature of the coefficients (see
+    rectification_signature) and the resampling. In this way, the
+    recipes run in the same numina invocation (for example, the sky
+    and science frames obtained with the same CSU configuration)
+    compute them only once.
+
+    Parameters
+    ----------
+    cache_dir : str or None
+        If not None, directory where the coefficients and operators
+        are also stored, to be reused in subsequent sessions.
+    use_rectification_operator : bool
+        If True, the images are rectified with the sparse matrices of
+        the rectification operators. Computing an operator is much
+        slower than rectifying a single image, so that this is only
+        worth it when many images share the same coefficients. The
+        result agrees with the direct rectification to float32
+        precision (not bitwise).
+    maxsize : int
+        Maximum number of coefficients kept.
+    operator_maxsize : int
+        Maximum number of rectification operators kept.
+
+    """
+
+    def __init__(
+        self,
+        cache_dir=None,
+        use_rectification_operator=False,
+        maxsize=SESSION_MAXSIZE,
+        operator_maxsize=SESSION_OPERATOR_MAXSIZE,
+    ):
+        self.cache_dir = cache_dir
+        self.use_rectification_operator = use_rectification_operator
+        self.maxsize = maxsize
+        self.operator_maxsize = operator_maxsize
+        self._coefficients = OrderedDict()
+        self._operators = OrderedDict()
+        self._stats = {
+            "coeff_hits": 0,
+            "coeff_misses": 0,
+            "operator_hits": 0,
+            "operator_misses": 0,
+        }
+
+    @staticmethod
+    def _store(cache, key, value, maxsize):
+        cache[key] = value
+        while len(cache) > maxsize:
+            cache.popitem(last=False)
+
+    def rectwv_coeff_from_mos_library(
+        self, reduced_image, master_rectwv, ignore_dtu_configuration=True
+    ):
+        """Rect.+wavecal. coefficients synthesized from the MOS library.
+
+        Parameters
+        ----------
+        reduced_image : HDUList object
+            Image with preliminary basic reduction: bpm, bias, dark and
+            flatfield.
+        master_rectwv : MasterRectWave instance
+            Rectification and Wavelength Calibrartion Library product.
+        ignore_dtu_configuration : bool
+            If True, ignore differences in DTU configuration.
+
+        Returns
+        -------
+        rectwv_coeff : RectWaveCoeff instance
+            Rectification and wavelength calibration coefficients for
+            the configuration of the image. A new copy is returned in
+            each call, all the copies share the same uuid.
+
+        """
+
+        logger = logging.getLogger(__name__)
+
+        signature = mos_library_signature(
+            reduced_image, master_rectwv, ignore_dtu_configuration
+        )
+        if signature in self._coefficients:
+            self._stats["coeff_hits"] += 1
+            self._coefficients.move_to_end(signature)
+            logger.info("Using RectWaveCoeff of the session for %s", signature)
+        else:
+            self._stats["coeff_misses"] += 1
+            rectwv_coeff = get_rectwv_coeff_from_mos_library(
+                reduced_image,
+                master_rectwv,
+                ignore_dtu_configuration,
+                cache_dir=self.cache_dir,
+            )
+            self._store(self._coefficients, signature, rectwv_coeff, self.maxsize)
+        return deepcopy(self._coefficients[signature])
+
+    def rectification_operator(self, rectwv_coeff, resampling):
+        """RectificationOperator of a RectWaveCoeff and resampling"""
+        key = (rectification_signature(rectwv_coeff), resampling)
+        if key in self._operators:
+            self._stats["operator_hits"] += 1
+            self._operators.move_to_end(key)
+        else:
+            self._stats["operator_misses"] += 1
+            operator = get_rectification_operator(
+                rectwv_coeff, resampling, cache_dir=self.cache_dir
+            )
+            self._store(self._operators, key, operator, self.operator_maxsize)
+        return self._operators[key]
+
+    def apply_rectwv_coeff(self, reduced_image, rectwv_coeff, args_resampling=2):
+        """Rectify and wavelength calibrate an image.
+
+        Equivalent to apply_rectwv_coeff (the result is identical by
+        default), employing the rectification operator of the session
+        when use_rectification_operator is True.
+
+        """
+        if self.use_rectification_operator:
+            rect_operator = self.rectification_operator(rectwv_coeff, args_resampling)
+        else:
+            rect_operator = None
+        return apply_rectwv_coeff(
+            reduced_image,
+            rectwv_coeff,
+            args_resampling=args_resampling,
+            rect_operator=rect_operator,
+        )
+
+    def info(self):
+        """Hits, misses and number of configurations of the session"""
+        return SessionInfo(
+            self._stats["coeff_hits"],
+            self._stats["coeff_misses"],
+            self._stats["operator_hits"],
+            self._stats["operator_misses"],
+            len(self._coefficients),
+        )
+
+    def clear(self):
+        """Remove the coefficients and operators and reset the counters"""
+        self._coefficients.clear()
+        self._operators.clear()
+        for key in self._stats:
+            self._stats[key] = 0
+
+
+def get_rectwv_session():
+    """Session shared by all the recipes run in this process"""
+    global _session
+    if _session is None:
+        _session = RectWaveSession()
+    return _session
+
+
+def configure_rectwv_session(use_rectification_operator=False, cache_dir=None):
+    """Session shared by the recipes, configured for the current run.
+
+    The coefficients and operators already kept by the session are
+    preserved.
+
+    Parameters
+    ----------
+    use_rectification_operator : bool
+        If True, the images are rectified with the rectification
+        operators of the session.
+    cache_dir : str or None
+        If not None, directory where the coefficients and operators
+        are also stored, to be reused in subsequent sessions.
+
+    Returns
+    -------
+    session : RectWaveSession instance
+        Session shared by all the recipes run in this process.
+
+    """
+    session = get_rectwv_session()
+    session.use_rectification_operator = use_rectification_operator
+    session.cache_dir = cache_dir
+    return session
+
+
+def set_rectwv_session(session):
+    """Replace the session shared by the recipes (None to reset it)"""
+    global _session
+    _session = session
@@ -0,0 +1,388 @@
+#
+# Copyright 2024 Universidad Complutense de Madrid
+#
+# This file is part of PyEmir
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+# License-Filename: LICENSE.txt
+#
+
+"""Binary storage of RectWaveCoeff and MasterRectWave instances
+
+The coefficients are stored in an uncompressed npz file. The numerical
+entries of the slitlet dictionaries (scalars or lists of numbers) are
+stored as contiguous arrays indexed by slitlet, whereas the remaining
+information is kept in a small JSON header. The arrays are only read
+when they are requested.
+"""
+
+import argparse
+import json
+import os.path
+import sys
+
+import numpy as np
+
+from numina.util.jsonencoder import ExtEncoder
+from numina.util.objimport import import_object
+
+from emirdrp.products import MasterRectWave
+from emirdrp.products import RectWaveCoeff
+
+STORAGE_VERSION = 1
+
+# separator of the keys of nested dictionaries in the stored paths
+PATH_SEPARATOR = "/"
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _flatten(content, prefix=""):
+    """Ordered list of (path, value) of the leaves of a dictionary"""
+    leaves = []
+    for key, value in content.items():
+        path = prefix + key
+        if isinstance(value, dict) and value and PATH_SEPARATOR not in key:
+            leaves += _flatten(value, path + PATH_SEPARATOR)
+        else:
+            leaves.append((path, value))
+    return leaves
+
+
+def _unflatten(leaves):
+    """Rebuild a nested dictionary from an ordered list of leaves"""
+    content = {}
+    for path, value in leaves:
+        keys = path.split(PATH_SEPARATOR)
+        subdict = content
+        for key in keys[:-1]:
+            subdict = subdict.setdefault(key, {})
+        subdict[keys[-1]] = value
+    return content
+
+
+def _array_kind(values):
+    """Determine whether a set of values can be stored as an array.
+
+    Returns
+    -------
+    kind : str or None
+        'scalar' or 'list' when all the values are numbers or lists of
+        numbers, respectively; None otherwise.
+    dtype : str or None
+        'int' or 'float', when all the numbers have the same type.
+
+    """
+    if all(_is_number(value) for value in values):
+        kind, numbers = "scalar", values
+    elif all(isinstance(value, list) for value in values):
+        kind, numbers = "list", [item for value in values for item in value]
+        if not all(_is_number(item) for item in numbers):
+            return None, None
+    else:
+        return None, None
+
+    if all(isinstance(item, int) for item in numbers):
+        dtype = "int" if numbers else "float"
+    elif all(isinstance(item, float) for item in numbers):
+        dtype = "float"
+    else:
+        return None, None
+    return kind, dtype
+
+
+def save_rectwv_npz(obj, filename):
+    """Save a RectWaveCoeff or MasterRectWave instance in npz format.
+
+    Parameters
+    ----------
+    obj : RectWaveCoeff or MasterRectWave instance
+        Object to be saved.
+    filename : str
+        Output file name.
+
+    """
+
+    # normalize the state as it would be stored in JSON format
+    state = json.loads(json.dumps(obj.__getstate__(), cls=ExtEncoder))
+    contents = state.pop("contents")
+    nslitlets = len(contents)
+
+    list_leaves = [_flatten(content) for content in contents]
+    paths = []
+    for leaves in list_leaves:
+        for path, _ in leaves:
+            if path not in paths:
+                paths.append(path)
+
+    # slitlet dictionaries sharing the same key ordering
+    layouts = []
+    slitlet_layout = []
+    for leaves in list_leaves:
+        layout = [path for path, _ in leaves]
+        if layout not in layouts:
+            layouts.append(layout)
+        slitlet_layout.append(layouts.index(layout))
+
+    list_dict_leaves = [dict(leaves) for leaves in list_leaves]
+    arrays = {}
+    header_arrays = {}
+    residual = [{} for _ in range(nslitlets)]
+    for ipath, path in enumerate(paths):
+        values = {
+            i: leaves[path]
+            for i, leaves in enumerate(list_dict_leaves)
+            if path in leaves
+        }
+        kind, dtype = _array_kind(list(values.values()))
+        if kind is None:
+            for i, value in values.items():
+                residual[i][path] = value
+            continue
+        name = "a{}".format(ipath)
+        header_arrays[name] = {"path": path, "kind": kind, "dtype": dtype}
+        present = np.zeros(nslitlets, dtype=bool)
+        present[list(values)] = True
+        if kind == "scalar":
+            data = np.zeros(nslitlets, dtype=dtype)
+            for i, value in values.items():
+                data[i] = value
+        else:
+            length = np.zeros(nslitlets, dtype=int)
+            for i, value in values.items():
+                length[i] = len(value)
+            data = np.zeros((nslitlets, length.max(initial=0)), dtype=dtype)
+            for i, value in values.items():
+                data[i, : length[i]] = value
+            arrays[name + "_length"] = length
+        arrays[name + "_present"] = present
+        arrays[name + "_data"] = data
+
+    header = {
+        "storage_version": STORAGE_VERSION,
+        "state": state,
+        "nslitlets": nslitlets,
+        "arrays": header_arrays,
+        "layouts": layouts,
+        "slitlet_layout": slitlet_layout,
+        "residual": residual,
+    }
+    header_bytes = json.dumps(header, cls=ExtEncoder).encode("utf8")
+    with open(filename, "wb") as fd:
+        np.savez(fd, header=np.frombuffer(header_bytes, dtype=np.uint8), **arrays)
+
+
+class RectWaveStorage:
+    """Lazy access to a RectWaveCoeff or MasterRectWave stored in npz format.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the npz file.
+
+    Attributes
+    ----------
+    state : dict
+        State of the stored object, excluding the slitlet contents.
+    nslitlets : int
+        Number of slitlets.
+
+    """
+
+    def __init__(self, filename):
+        self._npz = np.load(filename)
+        header = json.loads(self._npz["header"].tobytes().decode("utf8"))
+        if header["storage_version"] != STORAGE_VERSION:
+            raise ValueError(
+                "Unexpected storage version: {}".format(header["storage_version"])
+            )
+        self._header = header
+        self.state = header["state"]
+        self.nslitlets = header["nslitlets"]
+        self._paths = {value["path"]: name for name, value in header["arrays"].items()}
+        self._loaded = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._npz.close()
+
+    def _member(self, name):
+        if name not in self._loaded:
+            array = self._npz[name]
+            array.flags.writeable = False
+            self._loaded[name] = array
+        return self._loaded[name]
+
+    def paths(self):
+        """Paths of the entries stored as arrays"""
+        return list(self._paths)
+
+    def array(self, path):
+        """Coefficients of a particular entry for all the slitlets.
+
+        Parameters
+        ----------
+        path : str
+            Key of the entry in the slitlet dictionary. The keys of
+            nested dictionaries are separated by '/' (for example,
+            'spectrail/poly_coef_lower').
+
+        Returns
+        -------
+        data : numpy array
+            Read-only array with one row per slitlet. For entries
+            containing lists, the rows are padded with zeros.
+        present : numpy array
+            Boolean array indicating the slitlets containing the
+            entry.
+        length : numpy array or None
+            Number of elements of the list of each slitlet (None for
+            scalar entries).
+
+        """
+        name = self._paths[path]
+        kind = self._header["arrays"][name]["kind"]
+        data = self._member(name + "_data")
+        present = self._member(name + "_present")
+        if kind == "list":
+            length = self._member(name + "_length")
+        else:
+            length = None
+        return data, present, length
+
+    def slitlet(self, islitlet):
+        """Contents of a particular slitlet.
+
+        Parameters
+        ----------
+        islitlet : int
+            Slitlet number (from 1 to nslitlets).
+
+        Returns
+        -------
+        content : dict
+            Slitlet dictionary, as it is stored in the 'contents'
+            attribute of the object.
+
+        """
+        if not 1 <= islitlet <= self.nslitlets:
+            raise ValueError("Invalid islitlet={}".format(islitlet))
+        i = islitlet - 1
+        residual = self._header["residual"][i]
+        layout = self._header["layouts"][self._header["slitlet_layout"][i]]
+        leaves = []
+        for path in layout:
+            if path in residual:
+                value = residual[path]
+            else:
+                data, present, length = self.array(path)
+                if length is None:
+                    value = data[i].item()
+                else:
+                    value = data[i, : length[i]].tolist()
+            leaves.append((path, value))
+        return _unflatten(leaves)
+
+    def contents(self):
+        """Contents of all the slitlets"""
+        return [self.slitlet(i + 1) for i in range(self.nslitlets)]
+
+    def to_object(self):
+        """Full RectWaveCoeff or MasterRectWave instance"""
+        state = dict(self.state)
+        state["contents"] = self.contents()
+        cls = import_object(state["type_fqn"])
+        result = cls.__new__(cls)
+        result.__setstate__(state=state)
+        return result
+
+
+def load_rectwv_npz(filename):
+    """Load a RectWaveCoeff or MasterRectWave instance from a npz file.
+
+    Parameters
+    ----------
+    filename : str
+        Input file name.
+
+    Returns
+    -------
+    obj : RectWaveCoeff or MasterRectWave instance
+        Loaded object.
+
+    """
+
+    with RectWaveStorage(filename) as storage:
+        return storage.to_object()
+
+
+def convert_rectwv_storage(infile, outfile):
+    """Convert RectWaveCoeff and MasterRectWave files between formats.
+
+    The format (JSON or npz) is determined from the file extensions.
+
+    Parameters
+    ----------
+    infile : str
+        Input file name.
+    outfile : str
+        Output file name.
+
+    """
+
+    ext_in = os.path.splitext(infile)[1].lower()
+    ext_out = os.path.splitext(outfile)[1].lower()
+
+    if ext_in == ".json":
+        with open(infile) as fd:
+            type_fqn = json.load(fd)["type_fqn"]
+        cls = import_object(type_fqn)
+        if cls not in [RectWaveCoeff, MasterRectWave]:
+            raise ValueError("Unexpected object type: {}".format(type_fqn))
+        obj = cls._datatype_load(infile)
+    elif ext_in == ".npz":
+        obj = load_rectwv_npz(infile)
+    else:
+        raise ValueError("Unexpected input file extension: {}".format(ext_in))
+
+    if ext_out == ".json":
+        obj.writeto(outfile)
+    elif ext_out == ".npz":
+        save_rectwv_npz(obj, outfile)
+    else:
+        raise ValueError("Unexpected output file extension: {}".format(ext_out))
+
+
+def main(args=None):
+
+    # parse command-line options
+    parser = argparse.ArgumentParser(
+        description="description: convert RectWaveCoeff and MasterRectWave "
+        "files between JSON and npz formats"
+    )
+
+    # positional arguments
+    parser.add_argument("infile", help="Input file name (.json or .npz)", type=str)
+    parser.add_argument("outfile", help="Output file name (.json or .npz)", type=str)
+
+    # optional arguments
+    parser.add_argument("--echo", help="Display full command line", action="store_true")
+
+    args = parser.parse_args(args=args)
+
+    if args.echo:
+        print("\033[1m\033[31mExecuting: " + " ".join(sys.argv) + "\033[0m\n")
+
+    convert_rectwv_storage(args.infile, args.outfile)
+
+
+if __name__ == "__main__":
+
+    main()
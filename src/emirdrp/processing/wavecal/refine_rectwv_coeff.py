@@ -17,16 +17,17 @@ from numina.array.display.matplotlib_qt import plt
 from numina.array.display.matplotlib_qt import set_window_geometry
 from numina.array.stats import summary
 from numina.array.wavecalib.check_wlcalib import check_wlcalib_sp
-from numina.array.wavecalib.crosscorrelation import convolve_comb_lines
 from numina.array.wavecalib.crosscorrelation import periodic_corr1d
-from numina.array.wavecalib.fix_pix_borders import find_pix_borders
 from numina.frame.utils import copy_img
 
 import emirdrp.datamodel as datamodel
 from emirdrp.instrument.csu_configuration import CsuConfiguration
+from emirdrp.processing.wavecal.crosscorrelation import cached_convolve_comb_lines
+from emirdrp.processing.wavecal.crosscorrelation import periodic_corr1d_batch
 from emirdrp.processing.wavecal.median_slitlets_rectified import (
     median_slitlets_rectified,
 )
+from emirdrp.processing.wavecal.pix_borders import find_pix_borders_2d
 from emirdrp.processing.wavecal.set_wv_parameters import set_wv_parameters
 
 from emirdrp.core import EMIR_NAXIS1
@@ -105,14 +106,18 @@ def refine_rectwv_coeff(
     refined_rectwv_coeff = deepcopy(rectwv_coeff)
 
     logger.info("Computing median spectrum")
-    # compute median spectrum and normalize it
+    # compute median spectrum (using only the useful region of each
+    # slitlet) and normalize it
     sp_median = median_slitlets_rectified(
-        input_image, mode=2, list_useful_slitlets=list_useful_slitlets
+        input_image,
+        mode=2,
+        list_useful_slitlets=list_useful_slitlets,
+        useful_rows=True,
     )[0].data
     sp_median /= sp_median.max()
 
     # determine minimum and maximum useful wavelength
-    jmin, jmax = find_pix_borders(sp_median, 0)
+    jmin, jmax = find_pix_borders_2d(sp_median, 0)
     naxis1 = main_header["naxis1"]
     naxis2 = main_header["naxis2"]
     crpix1 = main_header["crpix1"]
@@ -158,7 +163,7 @@ def refine_rectwv_coeff(
     sigma_broadening = cdelt1 * widths_summary["median"]
 
     # convolve location of catalogue lines to generate expected spectrum
-    xwave_reference, sp_reference = convolve_comb_lines(
+    xwave_reference, sp_reference = cached_convolve_comb_lines(
         catlines_reference_wave,
         catlines_reference_flux,
         sigma_broadening,
@@ -251,8 +256,28 @@ def refine_rectwv_coeff(
     elif refine_wavecalib_mode in [2, 12]:
         # compute individual offset for each slitlet
         logger.info("Computing individual offsets")
-        median_55sp = median_slitlets_rectified(input_image, mode=1)
+        median_55sp = median_slitlets_rectified(input_image, mode=1, useful_rows=True)
         offset_array = np.zeros(EMIR_NBARS)
+        # subtract baseline and normalize each useful spectrum
+        has_signal = np.zeros(EMIR_NBARS, dtype=bool)
+        for islitlet in list_useful_slitlets:
+            i = islitlet - 1
+            sp_median = median_55sp[0].data[i, :]
+            lok = np.where(sp_median > 0)
+            if np.any(lok):
+                baseline = np.percentile(sp_median[lok], q=10)
+                sp_median[lok] -= baseline
+                sp_median /= sp_median.max()
+                has_signal[i] = True
+        # cross-correlation of all the spectra at once (the individual
+        # cross-correlation is only computed when plots are requested)
+        plot_corr1d = (abs(debugplot) % 10 != 0) or (pdf is not None)
+        if not plot_corr1d:
+            offset_array[has_signal], fpeak = periodic_corr1d_batch(
+                sp_reference=sp_reference,
+                sp_offset=median_55sp[0].data[has_signal],
+                naround_zero=50,
+            )
         xplot = []
         yplot = []
         xplot_skipped = []
@@ -261,12 +286,7 @@ def refine_rectwv_coeff(
         for islitlet in range(1, EMIR_NBARS + 1):
             if islitlet in list_useful_slitlets:
                 i = islitlet - 1
-                sp_median = median_55sp[0].data[i, :]
-                lok = np.where(sp_median > 0)
-                if np.any(lok):
-                    baseline = np.percentile(sp_median[lok], q=10)
-                    sp_median[lok] -= baseline
-                    sp_median /= sp_median.max()
+                if plot_corr1d and has_signal[i]:
                     offset_array[i], fpeak = periodic_corr1d(
                         sp_reference=sp_reference,
                         sp_offset=median_55sp[0].data[i, :],
@@ -276,8 +296,6 @@ def refine_rectwv_coeff(
                         pdf=pdf,
                         debugplot=debugplot,
                     )
-                else:
-                    offset_array[i] = 0.0
                 dumdict = refined_rectwv_coeff.contents[i]
                 dumdict["wpoly_coeff"][0] -= offset_array[i] * cdelt1
                 xplot.append(islitlet)
@@ -10,30 +10,61 @@
 
 import numpy as np
 import pkgutil
+from io import BytesIO
 from io import StringIO
 
+CATLINES_PACKAGE = "emirdrp.instrument.configs"
 
-def retrieve_catlines(mode, grism_name):
-    """Retrieve arc/OH lines
+# line catalogues already parsed in this process
+_catalogue_registry = {}
+
+# wavelength/flux arrays (unsorted and sorted) for each kind of lines
+_catlines_registry = {}
+
+
+def _readonly(array):
+    """Return a contiguous read-only copy of an array"""
+    array = np.ascontiguousarray(array, dtype=float).copy()
+    array.flags.writeable = False
+    return array
+
+
+def load_catalogue(catlines_file):
+    """Load a line catalogue from the package configuration files.
+
+    Each catalogue is parsed only once per process. When a binary
+    version of the catalogue (with the same name and extension .npy)
+    is found next to the text file, it is employed instead of parsing
+    the text file.
 
     Parameters
     ----------
-    mode : int
-        Integer, indicating the type of lines:
-        1 or 2 : arc lines
-        11 or 12 : OH lines
-    grism_name : string
-        Grism name.
+    catlines_file : str
+        Name of the text file containing the catalogue.
 
     Returns
     -------
-    catlines_all_wave : numpy array
-        Array with wavelengths
-    catlines_all_flux : numpy array
-        Array with fluxes.
+    catlines : numpy array
+        Read-only 2D array with the contents of the catalogue.
 
     """
 
+    if catlines_file not in _catalogue_registry:
+        npy_file = catlines_file.rsplit(".", 1)[0] + ".npy"
+        try:
+            dumdata = pkgutil.get_data(CATLINES_PACKAGE, npy_file)
+            catlines = np.load(BytesIO(dumdata))
+        except OSError:
+            dumdata = pkgutil.get_data(CATLINES_PACKAGE, catlines_file)
+            catlines = np.genfromtxt(StringIO(dumdata.decode("utf8")))
+        _catalogue_registry[catlines_file] = _readonly(catlines)
+
+    return _catalogue_registry[catlines_file]
+
+
+def _catlines_entry(mode, grism_name):
+    """Wavelength and flux arrays (unsorted and sorted) for each mode"""
+
     # protections
     if mode not in [1, 2, 11, 12]:
         raise ValueError("Invalid mode={}".format(mode))
@@ -44,20 +75,81 @@ def retrieve_catlines(mode, grism_name):
             catlines_file = "lines_argon_neon_xenon_empirical_LR.dat"
         else:
             catlines_file = "lines_argon_neon_xenon_empirical.dat"
-        dumdata = pkgutil.get_data("emirdrp.instrument.configs", catlines_file)
-        arc_lines_tmpfile = StringIO(dumdata.decode("utf8"))
-        catlines = np.genfromtxt(arc_lines_tmpfile)
-        # define wavelength and flux as separate arrays
-        catlines_all_wave = catlines[:, 0]
-        catlines_all_flux = catlines[:, 1]
-    elif mode in [11, 12]:  # OH lines
-        dumdata = pkgutil.get_data("emirdrp.instrument.configs", "Oliva_etal_2013.dat")
-        oh_lines_tmpfile = StringIO(dumdata.decode("utf8"))
-        catlines = np.genfromtxt(oh_lines_tmpfile)
+    else:  # OH lines
+        catlines_file = "Oliva_etal_2013.dat"
+
+    if catlines_file not in _catlines_registry:
+        catlines = load_catalogue(catlines_file)
         # define wavelength and flux as separate arrays
-        catlines_all_wave = np.concatenate((catlines[:, 1], catlines[:, 0]))
-        catlines_all_flux = np.concatenate((catlines[:, 2], catlines[:, 2]))
-    else:
-        raise ValueError("Unexpected mode={}".format(mode))
+        if mode in [1, 2]:
+            catlines_all_wave = catlines[:, 0]
+            catlines_all_flux = catlines[:, 1]
+        else:
+            catlines_all_wave = np.concatenate((catlines[:, 1], catlines[:, 0]))
+            catlines_all_flux = np.concatenate((catlines[:, 2], catlines[:, 2]))
+        isort = np.argsort(catlines_all_wave, kind="stable")
+        _catlines_registry[catlines_file] = (
+            _readonly(catlines_all_wave),
+            _readonly(catlines_all_flux),
+            _readonly(catlines_all_wave[isort]),
+            _readonly(catlines_all_flux[isort]),
+        )
+
+    return _catlines_registry[catlines_file]
 
+
+def retrieve_catlines(mode, grism_name):
+    """Retrieve arc/OH lines
+
+    Parameters
+    ----------
+    mode : int
+        Integer, indicating the type of lines:
+        1 or 2 : arc lines
+        11 or 12 : OH lines
+    grism_name : string
+        Grism name.
+
+    Returns
+    -------
+    catlines_all_wave : numpy array
+        Array with wavelengths (read-only).
+    catlines_all_flux : numpy array
+        Array with fluxes (read-only).
+
+    """
+
+    catlines_all_wave, catlines_all_flux, _, _ = _catlines_entry(mode, grism_name)
     return catlines_all_wave, catlines_all_flux
+
+
+def retrieve_catlines_range(mode, grism_name, wave_min, wave_max):
+    """Retrieve arc/OH lines within a wavelength interval
+
+    Parameters
+    ----------
+    mode : int
+        Integer, indicating the type of lines:
+        1 or 2 : arc lines
+        11 or 12 : OH lines
+    grism_name : string
+        Grism name.
+    wave_min : float
+        Minimum wavelength.
+    wave_max : float
+        Maximum wavelength.
+
+    Returns
+    -------
+    catlines_wave : numpy array
+        Array with wavelengths in the interval [wave_min, wave_max],
+        sorted in ascending order (read-only view).
+    catlines_flux : numpy array
+        Array with the corresponding fluxes (read-only view).
+
+    """
+
+    _, _, sorted_wave, sorted_flux = _catlines_entry(mode, grism_name)
+    i1 = np.searchsorted(sorted_wave, wave_min, side="left")
+    i2 = np.searchsorted(sorted_wave, wave_max, side="right")
+    return sorted_wave[i1:i2], sorted_flux[i1:i2]
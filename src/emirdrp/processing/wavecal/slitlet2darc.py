@@ -37,6 +37,86 @@ from emirdrp.core import EMIR_NAXIS2
 from emirdrp.core import EMIR_NPIXPERSLIT_RECTIFIED
 
 
+def fit_arc_lines(labels2d, list_labels, weights2d, bbox, first_pixel):
+    """Fit straight lines (X vs Y) to a set of labelled objects.
+
+    All the objects are fitted at once, solving the weighted least
+    squares problem of each object from the weighted sums computed
+    with np.bincount. The result is equivalent to calling
+    ArcLine.fit(x, y, deg=1, w=w, y_vs_x=False) for each object.
+
+    Parameters
+    ----------
+    labels2d : numpy array
+        Image with labelled objects, as returned by ndimage.label.
+    list_labels : list of int
+        Labels of the objects to be fitted.
+    weights2d : numpy array
+        Weights of each pixel.
+    bbox : numpy array
+        Bounding box of each object to be fitted, with shape
+        (len(list_labels), 4). Each row contains the start and stop
+        values of the slices returned by ndimage.find_objects,
+        [ystart, ystop, xstart, xstop], in np.array coordinates.
+    first_pixel : tuple of int
+        Image coordinates (x, y) of the first pixel of labels2d.
+
+    Returns
+    -------
+    list_arc_lines : list of ArcLine instances
+        Fitted arc lines. A None value is returned for the objects
+        that do not allow a linear fit.
+
+    """
+
+    nlines = len(list_labels)
+    if nlines == 0:
+        return []
+
+    # index of each pixel in list_labels (-1 for the remaining pixels)
+    lut = np.full(labels2d.max() + 1, -1, dtype=int)
+    lut[list_labels] = np.arange(nlines)
+    iline2d = lut[labels2d]
+    ii, jj = np.nonzero(iline2d >= 0)
+    iline = iline2d[ii, jj]
+    x = jj + first_pixel[0]  # use image coordinates
+    y = ii + first_pixel[1]  # use image coordinates
+    # note that the weights multiply the residuals of the fit
+    w2 = weights2d[ii, jj].astype(float) ** 2
+
+    # weighted sums (centering Y coordinates in each line)
+    s0 = np.bincount(iline, weights=w2, minlength=nlines)
+    ymean = np.bincount(iline, weights=w2 * y, minlength=nlines) / s0
+    xmean = np.bincount(iline, weights=w2 * x, minlength=nlines) / s0
+    yc = y - ymean[iline]
+    syy = np.bincount(iline, weights=w2 * yc * yc, minlength=nlines)
+    sxy = np.bincount(iline, weights=w2 * yc * x, minlength=nlines)
+    valid = syy > 0
+    slope = np.zeros(nlines)
+    slope[valid] = sxy[valid] / syy[valid]
+    intercept = xmean - slope * ymean
+
+    list_arc_lines = []
+    for k in range(nlines):
+        if not valid[k]:
+            list_arc_lines.append(None)
+            continue
+        arc_line = ArcLine()
+        arc_line.bb_nc1_orig = bbox[k, 2] + first_pixel[0]
+        arc_line.bb_nc2_orig = bbox[k, 3] - 1 + first_pixel[0]
+        arc_line.bb_ns1_orig = bbox[k, 0] + first_pixel[1]
+        arc_line.bb_ns2_orig = bbox[k, 1] - 1 + first_pixel[1]
+        arc_line.poly_funct = np.polynomial.Polynomial([intercept[k], slope[k]])
+        arc_line.ylower_line = arc_line.bb_ns1_orig
+        arc_line.xlower_line = arc_line.poly_funct(arc_line.ylower_line)
+        arc_line.yupper_line = arc_line.bb_ns2_orig
+        arc_line.xupper_line = arc_line.poly_funct(arc_line.yupper_line)
+        arc_line.available = True
+        list_arc_lines.append(arc_line)
+
+    return list_arc_lines
+
+
 def expected_y0_lower_frontier(islitlet):
     """Expected ordinate of lower frontier in rectified image.
 
@@ -657,7 +737,7 @@ class Slitlet2dArc:
         # smooth denoising of slitlet2d
         slitlet2d_rs, coef_rs = rescale_array_to_z1z2(slitlet2d, z1z2=(-1, 1))
         slitlet2d_dn = restoration.denoise_nl_means(
-            slitlet2d_rs, patch_size=3, patch_distance=2, multichannel=False
+            slitlet2d_rs, patch_size=3, patch_distance=2, channel_axis=None
         )
         slitlet2d_dn = rescale_array_from_z1z2(slitlet2d_dn, coef_rs)
 
@@ -740,48 +820,47 @@ class Slitlet2dArc:
         # dimensions of the detected objects and the intersection with
         # the middle spectrum trail
         slices_possible_arc_lines = ndimage.find_objects(labels2d_objects)
-        slices_ok = np.repeat([False], no_objects)  # flag
-        for i in range(no_objects):
-            if abs(self.debugplot) >= 10:
+        if abs(self.debugplot) >= 10:
+            for i in range(no_objects):
                 print(
                     "object",
                     i + 1,
                     "[in np.array coordinates]:",
                     slices_possible_arc_lines[i],
                 )
-            slice_x = slices_possible_arc_lines[i][1]
-            slice_y = slices_possible_arc_lines[i][0]
-            # note that the width computation doesn't require to
-            # add +1 since slice_x.stop (and slice_y.stop) is
-            # already the upper limit +1 (in np.array coordinates)
-            delta_x = slice_x.stop - slice_x.start
-            delta_y = slice_y.stop - slice_y.start
-            # dimensions criterion
-            if delta_x <= delta_x_max and delta_y >= delta_y_min:
-                # intersection with middle spectrum trail criterion;
-                # note that slice_x and slice_y are given in np.array
-                # coordinates and are transformed into image coordinates;
-                # in addition, -0.5 shift the origin to the lower left
-                # corner of the pixel
-                xini_slice = slice_x.start + self.bb_nc1_orig - 0.5
-                xmiddle_slice = xini_slice + delta_x / 2
-                polydum = self.list_spectrails[self.i_middle_spectrail].poly_funct
-                ymiddle_slice = polydum(xmiddle_slice)
-                yini_slice = slice_y.start + self.bb_ns1_orig - 0.5
-                yend_slice = yini_slice + delta_y
-                if (
-                    yini_slice + min_dist_from_middle
-                    <= ymiddle_slice
-                    <= yend_slice - min_dist_from_middle
-                ):
-                    slices_ok[i] = True
+        # bounding boxes of all the objects (in np.array coordinates);
+        # note that the width computation doesn't require to add +1
+        # since slice_x.stop (and slice_y.stop) is already the upper
+        # limit +1 (in np.array coordinates)
+        bbox = np.array(
+            [
+                [slc[0].start, slc[0].stop, slc[1].start, slc[1].stop]
+                for slc in slices_possible_arc_lines
+            ],
+            dtype=int,
+        ).reshape(no_objects, 4)
+        delta_x = bbox[:, 3] - bbox[:, 2]
+        delta_y = bbox[:, 1] - bbox[:, 0]
+        # intersection with middle spectrum trail criterion; note that
+        # the slices are given in np.array coordinates and are
+        # transformed into image coordinates; in addition, -0.5 shift the
+        # origin to the lower left corner of the pixel
+        xini_slice = bbox[:, 2] + self.bb_nc1_orig - 0.5
+        xmiddle_slice = xini_slice + delta_x / 2
+        polydum = self.list_spectrails[self.i_middle_spectrail].poly_funct
+        ymiddle_slice = polydum(xmiddle_slice)
+        yini_slice = bbox[:, 0] + self.bb_ns1_orig - 0.5
+        yend_slice = yini_slice + delta_y
+        slices_ok = (
+            (delta_x <= delta_x_max)
+            & (delta_y >= delta_y_min)
+            & (yini_slice + min_dist_from_middle <= ymiddle_slice)
+            & (ymiddle_slice <= yend_slice - min_dist_from_middle)
+        )
 
         # generate list with ID of arc lines (note that first object is
         # number 0 and not 1)
-        list_slices_ok = []
-        for i in range(no_objects):
-            if slices_ok[i]:
-                list_slices_ok.append(i + 1)
+        list_slices_ok = (np.flatnonzero(slices_ok) + 1).tolist()
         number_arc_lines = len(list_slices_ok)
         if abs(self.debugplot) >= 10:
             print("\nNumber of arc lines initially identified is:", number_arc_lines)
@@ -835,32 +914,31 @@ class Slitlet2dArc:
             pause_debugplot(self.debugplot, pltshow=True)
 
         # adjust individual arc lines passing the initial selection
-        self.list_arc_lines = []  # list of ArcLines
-        for k in range(number_arc_lines):  # fit each arc line
-            # select points to be fitted for a particular arc line
-            xy_tmp = np.where(labels2d_objects == list_slices_ok[k])
-            x_tmp = xy_tmp[1] + self.bb_nc1_orig  # use image coordinates
-            y_tmp = xy_tmp[0] + self.bb_ns1_orig  # use image coordinates
-            w_tmp = slitlet2d_dn[xy_tmp]
-            # declare new ArcLine instance
-            arc_line = ArcLine()
-            # define new ArcLine using a weighted fit
-            # (note that it must be X vs Y)
-            arc_line.fit(x=x_tmp, y=y_tmp, deg=1, w=w_tmp, y_vs_x=False)
-            if len(arc_line.poly_funct.coef) == 2:
-                # update list with identified ArcLines
-                self.list_arc_lines.append(arc_line)
-            else:
-                # ignore (sometimes the arc_line.fit returns a constant!)
-                pass
+        # (all the lines are fitted at once)
+        list_arc_lines = fit_arc_lines(
+            labels2d=labels2d_objects,
+            list_labels=list_slices_ok,
+            weights2d=slitlet2d_dn,
+            bbox=bbox[np.array(list_slices_ok) - 1],
+            first_pixel=(self.bb_nc1_orig, self.bb_ns1_orig),
+        )
+        # ignore arc lines without a valid fit
+        list_slices_ok = [
+            islice
+            for islice, arc_line in zip(list_slices_ok, list_arc_lines)
+            if arc_line is not None
+        ]
+        self.list_arc_lines = [
+            arc_line for arc_line in list_arc_lines if arc_line is not None
+        ]
 
         # recompute number_arc_lines just in case in the previous fits
-        # some lines have just given a zero degree polynomial
+        # some lines have not been fitted
         number_arc_lines = len(self.list_arc_lines)
 
         # remove arc lines with unexpected slopes
         yfit = np.array(
-            [self.list_arc_lines[k].poly_funct.coef[1] for k in range(number_arc_lines)]
+            [arc_line.poly_funct.coef[1] for arc_line in self.list_arc_lines]
         )
         xfit = np.zeros(number_arc_lines)
         # intersection between middle spectrum trail and arc line
@@ -913,9 +991,9 @@ class Slitlet2dArc:
         # display results
         if abs(self.debugplot) in [21, 22]:
             # generate mask with all the arc-line points passing the selection
-            mask_arc_lines = np.zeros_like(slitlet2d_dn)
-            for k in list_slices_ok:
-                mask_arc_lines[labels2d_objects == k] = 1
+            mask_arc_lines = np.isin(labels2d_objects, list_slices_ok).astype(
+                slitlet2d_dn.dtype
+            )
             # compute image with only the arc lines passing the selection
             labels2d_arc_lines = labels2d_objects * mask_arc_lines
             # display background image with filtered arc lines
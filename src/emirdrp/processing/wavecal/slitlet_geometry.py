@@ -0,0 +1,128 @@
+#
+# Copyright 2024 Universidad Complutense de Madrid
+#
+# This file is part of PyEmir
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+# License-Filename: LICENSE.txt
+#
+
+"""Vectorized evaluation and export of slitlet boundaries and frontiers"""
+
+import numpy as np
+from numpy.polynomial import Polynomial
+from numpy.polynomial.polynomial import polyval
+
+
+def polynomial_coefficients(list_poly):
+    """Store the coefficients of a set of polynomials in a 2D array.
+
+    Parameters
+    ----------
+    list_poly : list
+        List of polynomials, given either as Polynomial instances or
+        as sequences of coefficients (in increasing order).
+
+    Returns
+    -------
+    coeff : numpy array
+        2D array with the coefficients of each polynomial in a
+        different row. Polynomials of lower degree are padded with
+        zeros.
+
+    """
+
+    list_coeff = []
+    for poly in list_poly:
+        if isinstance(poly, Polynomial):
+            if not np.array_equal(poly.domain, poly.window):
+                poly = poly.convert()
+            poly = poly.coef
+        list_coeff.append(np.atleast_1d(np.asarray(poly, dtype=float)))
+
+    ncoeff = max([len(coeff) for coeff in list_coeff], default=1)
+    coeff = np.zeros((len(list_coeff), ncoeff))
+    for i, poly_coeff in enumerate(list_coeff):
+        coeff[i, : len(poly_coeff)] = poly_coeff
+    return coeff
+
+
+def eval_polynomials(list_poly, x):
+    """Evaluate a set of polynomials at the same points.
+
+    Parameters
+    ----------
+    list_poly : list
+        List of polynomials, given either as Polynomial instances or
+        as sequences of coefficients (in increasing order).
+    x : float or numpy array
+        Points where the polynomials are evaluated.
+
+    Returns
+    -------
+    y : numpy array
+        Array of shape (len(list_poly),) + np.shape(x) with the
+        values of each polynomial.
+
+    """
+
+    coeff = polynomial_coefficients(list_poly)
+    return polyval(x, coeff.T)
+
+
+def ds9_polylines(x, y, colors):
+    """Generate ds9 line segments joining consecutive points.
+
+    Parameters
+    ----------
+    x : numpy array
+        X coordinates. It can be a 1D array, shared by all the
+        polylines, or a 2D array with the same shape as 'y'.
+    y : numpy array
+        2D array with the Y coordinates of each polyline in a
+        different row.
+    colors : str or list of str
+        Color of all the polylines or of each one.
+
+    Returns
+    -------
+    list_output : list of str
+        ds9 region output corresponding to each polyline.
+
+    """
+
+    y = np.atleast_2d(y)
+    x = np.broadcast_to(x, y.shape)
+    if isinstance(colors, str):
+        colors = [colors] * y.shape[0]
+    segments = np.stack((x[:, :-1], y[:, :-1], x[:, 1:], y[:, 1:]), axis=-1)
+
+    list_output = []
+    for row, color in zip(segments.tolist(), colors):
+        template = "line {0} {1} {2} {3} # color=" + color.replace("{", "{{") + "\n"
+        list_output.append("".join([template.format(*segment) for segment in row]))
+    return list_output
+
+
+def plot_polylines(ax, x, y, colors, linetype):
+    """Plot a set of polylines with a single call per color.
+
+    Parameters
+    ----------
+    ax : matplotlib axes
+        Current plot axes.
+    x : numpy array
+        1D array with the X coordinates shared by all the polylines.
+    y : numpy array
+        2D array with the Y coordinates of each polyline in a
+        different row.
+    colors : list of str
+        Color of each polyline.
+    linetype : str
+        Line type.
+
+    """
+
+    colors = np.asarray(colors)
+    for color in np.unique(colors):
+        ax.plot(x, y[colors == color].T, color + linetype)
@@ -0,0 +1,161 @@
+#
+# Copyright 2024 Universidad Complutense de Madrid
+#
+# This file is part of PyEmir
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+# License-Filename: LICENSE.txt
+#
+
+"""Vectorized normalization and insertion of slitlets in flat-field computations"""
+
+import numpy as np
+
+from emirdrp.core import EMIR_NAXIS1
+from emirdrp.tools.nscan_minmax_frontiers import nscan_minmax_frontiers_array
+
+
+def normalize_slitlet(slitlet2d, denominator, default=1.0):
+    """Divide a slitlet image avoiding division by zero.
+
+    Parameters
+    ----------
+    slitlet2d : numpy array
+        Slitlet image to be normalized.
+    denominator : numpy array
+        Array (with the same shape as 'slitlet2d') employed to
+        normalize the slitlet image.
+    default : float
+        Value assigned to the pixels where 'denominator' is zero.
+
+    Returns
+    -------
+    slitlet2d_norm : numpy array
+        Normalized slitlet image, with the same dtype as 'slitlet2d'.
+
+    """
+
+    slitlet2d = np.asarray(slitlet2d)
+    denominator = np.asarray(denominator)
+    if slitlet2d.shape != denominator.shape:
+        raise ValueError("Incompatible array shapes")
+
+    slitlet2d_norm = np.full_like(slitlet2d, default)
+    np.divide(slitlet2d, denominator, out=slitlet2d_norm, where=denominator != 0)
+    return slitlet2d_norm
+
+
+def scale_rows(image2d, factors, out=None):
+    """Multiply each row of an image by a different factor.
+
+    Parameters
+    ----------
+    image2d : numpy array
+        Input 2D array (or 1D array, to be replicated for each factor).
+    factors : numpy array
+        Factor applied to each row.
+    out : numpy array or None
+        If not None, the result is stored in this array (which can be
+        'image2d' itself).
+
+    Returns
+    -------
+    result : numpy array
+        Scaled image.
+
+    """
+
+    factors = np.asarray(factors)[:, np.newaxis]
+    return np.multiply(image2d, factors, out=out)
+
+
+def frontier_scan_limits(list_frontiers, naxis1=EMIR_NAXIS1):
+    """Useful scan range of a slitlet for every channel.
+
+    Parameters
+    ----------
+    list_frontiers : list
+        Lower and upper frontier polynomials of the slitlet (as in
+        the attribute 'list_frontiers' of Slitlet2D instances).
+    naxis1 : int
+        Number of channels.
+
+    Returns
+    -------
+    nscan_min, nscan_max : numpy arrays (integers)
+        Minimum and maximum useful scan (ranging from 1 to NAXIS2)
+        for each channel.
+
+    """
+
+    xchannel = np.arange(1, naxis1 + 1)
+    y0_lower = list_frontiers[0](xchannel)
+    y0_upper = list_frontiers[1](xchannel)
+    return nscan_minmax_frontiers_array(
+        y0_frontier_lower=y0_lower, y0_frontier_upper=y0_upper, resize=True
+    )
+
+
+def insert_slitlet(
+    image2d,
+    slitlet2d,
+    bb_ns1_orig,
+    nscan_min,
+    nscan_max,
+    force_lower=True,
+    force_upper=True,
+    force_value=1,
+):
+    """Insert a slitlet image within the frontiers of the full frame.
+
+    For each channel, the scans between nscan_min and nscan_max are
+    copied from the slitlet image into the full frame. Optionally,
+    the regions around the frontiers are set to a fixed value (three
+    scans above the lower frontier and five scans below the upper
+    frontier).
+
+    Parameters
+    ----------
+    image2d : numpy array
+        Full frame, modified in place.
+    slitlet2d : numpy array
+        Slitlet image, spanning all the channels of 'image2d' and
+        starting at scan 'bb_ns1_orig'.
+    bb_ns1_orig : int
+        Scan (ranging from 1 to NAXIS2) of the first row of the
+        slitlet image.
+    nscan_min, nscan_max : numpy arrays (integers)
+        Useful scan range for each channel, as returned by
+        frontier_scan_limits.
+    force_lower : bool
+        If True, set to 'force_value' the region close to the lower
+        frontier.
+    force_upper : bool
+        If True, set to 'force_value' the region close to the upper
+        frontier.
+    force_value : float
+        Value employed around the frontiers.
+
+    """
+
+    naxis2 = image2d.shape[0]
+    n1 = np.asarray(nscan_min)
+    n2 = np.asarray(nscan_max)
+
+    # rows of the full frame affected by the insertion
+    rmin = max(min(n1.min() - 1, n2.min() - 5), 0)
+    rmax = min(max(n2.max(), n1.max() + 2), naxis2)
+    if rmax <= rmin:
+        return
+    rows = np.arange(rmin, rmax)[:, np.newaxis]
+    block = image2d[rmin:rmax]
+
+    mask = (rows >= n1 - 1) & (rows < n2)
+    srows = np.clip(rows[:, 0] - bb_ns1_orig + 1, 0, slitlet2d.shape[0] - 1)
+    block[mask] = slitlet2d[srows][mask]
+
+    # force value in the region around frontiers
+    if force_lower:
+        block[(rows >= n1 - 1) & (rows < n1 + 2)] = force_value
+    if force_upper:
+        block[(rows >= n2 - 5) & (rows < n2)] = force_value
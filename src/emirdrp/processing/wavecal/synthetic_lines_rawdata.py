@@ -17,6 +17,9 @@ from emirdrp.core import EMIR_NAXIS1
 from emirdrp.core import EMIR_NAXIS2
 from emirdrp.core import EMIR_NBARS
 
+# Newton iterations refining the inverse of the wavelength calibration
+NEWTON_ITERATIONS = 3
+
 
 def synthetic_lines_rawdata(
     catlines_all_wave,
@@ -58,6 +61,9 @@ def synthetic_lines_rawdata(
 
     simulated_image = np.zeros((EMIR_NAXIS2, EMIR_NAXIS1))
 
+    catlines_all_wave = np.asarray(catlines_all_wave, dtype=float)
+    catlines_all_flux = np.asarray(catlines_all_flux, dtype=float)
+
     global_integer_offset_x_pix = rectwv_coeff.global_integer_offset_x_pix
     global_integer_offset_y_pix = rectwv_coeff.global_integer_offset_y_pix
 
@@ -100,74 +106,42 @@ def synthetic_lines_rawdata(
             min_row_rectified = float(dumdict["min_row_rectified"])
             max_row_rectified = float(dumdict["max_row_rectified"])
             wpoly_coeff = dumdict["wpoly_coeff"]
-            # store coordinates for each line
-            x1 = []
-            y1 = []
-            x2 = []
-            y2 = []
-            flist = []
-            for wave, flux in zip(catlines_all_wave, catlines_all_flux):
-                if crval1_linear <= wave <= crvaln_linear:
-                    tmp_coeff = np.copy(wpoly_coeff)
-                    tmp_coeff[0] -= wave
-                    tmp_xroots = np.polynomial.Polynomial(tmp_coeff).roots()
-                    for dum in tmp_xroots:
-                        if np.isreal(dum):
-                            dum = dum.real
-                            if 1 <= dum <= EMIR_NAXIS1:
-                                x1.append(dum)
-                                y1.append(min_row_rectified)
-                                x2.append(dum)
-                                y2.append(max_row_rectified)
-                                flist.append(flux)
-            xx1, yy1 = fmap(ttd_order, aij, bij, np.array(x1), np.array(y1))
-            xx1 -= global_integer_offset_x_pix
-            yy1 += bb_ns1_orig - global_integer_offset_y_pix
+            # pixel coordinates (in the rectified image) of each line
+            ok = (crval1_linear <= catlines_all_wave) & (
+                catlines_all_wave <= crvaln_linear
+            )
+            xroots, iline = wpoly_roots(wpoly_coeff, catlines_all_wave[ok])
+            nlines = len(xroots)
+            flist = catlines_all_flux[ok][iline]
+            # map both ends of all the lines with a single call
+            xx, yy = fmap(
+                ttd_order,
+                aij,
+                bij,
+                np.concatenate((xroots, xroots)),
+                np.concatenate(
+                    (
+                        np.full(nlines, min_row_rectified),
+                        np.full(nlines, max_row_rectified),
+                    )
+                ),
+            )
+            xx -= global_integer_offset_x_pix
+            yy += bb_ns1_orig - global_integer_offset_y_pix
             if not connected_prev:
-                yy1 += ycorrection_pix
-            xx2, yy2 = fmap(ttd_order, aij, bij, np.array(x2), np.array(y2))
-            xx2 -= global_integer_offset_x_pix
-            yy2 += bb_ns1_orig - global_integer_offset_y_pix
+                yy[:nlines] += ycorrection_pix
             if not connected_next:
-                yy2 -= ycorrection_pix
-
-            for xx1_, xx2_, yy1_, yy2_, flux in zip(xx1, xx2, yy1, yy2, flist):
-                slope = (xx2_ - xx1_) / (yy2_ - yy1_)
-                iyy1_ = int(yy1_ + 0.5)
-                if yy1_ <= float(iyy1_):
-                    fracpix1 = float(iyy1_) - yy1_
-                    iyy1_ -= 1
-                else:
-                    fracpix1 = 1.0 - (yy1_ - float(iyy1_))
-                iyy2_ = int(yy2_ + 0.5)
-                if yy2_ <= float(iyy2_):
-                    fracpix2 = 1.0 - (float(iyy2_) - yy2_)
-                else:
-                    fracpix2 = yy2_ - float(iyy2_)
-                    iyy2_ += 1
-                for iyy_ in range(iyy1_, iyy2_ + 1):
-                    if iyy_ == iyy1_:
-                        fracpix = fracpix1
-                    elif iyy_ == iyy2_:
-                        fracpix = fracpix2
-                    else:
-                        fracpix = 1.0
-                    icenter = iyy_ - 1
-                    if 0 <= icenter <= EMIR_NAXIS2 - 1:
-                        xx0_ = xx1_ + slope * (iyy_ - yy1_)
-                        xcenter = int(xx0_ + 0.5)
-                        npix = 2 * nside_pix + 1
-                        xpix = xcenter + np.arange(-nside_pix, nside_pix + 1)
-                        left_border = xpix - xx0_ - 0.5
-                        right_border = left_border + 1.0
-                        borders = np.concatenate((left_border, right_border))
-                        area = norm.cdf(borders, scale=sigma_gauss_pix)
-                        for i in range(npix):
-                            xdum = xpix[i]
-                            if 1 <= xdum <= EMIR_NAXIS1:
-                                simulated_image[icenter, xdum - 1] += (
-                                    fracpix * flux * (area[i + npix] - area[i])
-                                )
+                yy[nlines:] -= ycorrection_pix
+            render_lines(
+                simulated_image,
+                xx[:nlines],
+                yy[:nlines],
+                xx[nlines:],
+                yy[nlines:],
+                flist,
+                sigma_gauss_pix,
+                nside_pix,
+            )
         else:
             cout += "i"
 
@@ -178,3 +152,133 @@ def synthetic_lines_rawdata(
         logger.info(cout)
 
     return simulated_image
+
+
+def wpoly_roots(wpoly_coeff, waves):
+    """Pixel coordinates corresponding to a set of wavelengths.
+
+    The wavelength calibration polynomial is inverted for all the
+    wavelengths at once, using a dense grid of pixels (refined with a
+    few Newton iterations). When the polynomial is not monotonic within
+    the detector, the roots are computed individually for each
+    wavelength.
+
+    Parameters
+    ----------
+    wpoly_coeff : array like
+        Coefficients of the wavelength calibration polynomial.
+    waves : numpy array
+        Wavelengths to be located.
+
+    Returns
+    -------
+    xroots : numpy array
+        Pixel coordinates (from 1 to EMIR_NAXIS1) of each wavelength.
+    iline : numpy array
+        Index (in 'waves') of the wavelength corresponding to each
+        root.
+
+    """
+
+    wpoly = np.polynomial.Polynomial(wpoly_coeff)
+    xgrid = np.arange(1, EMIR_NAXIS1 + 1, dtype=float)
+    wgrid = wpoly(xgrid)
+    dwgrid = np.diff(wgrid)
+
+    if np.all(dwgrid > 0) or np.all(dwgrid < 0):
+        isort = np.argsort(wgrid)
+        # lines within the detector (with one pixel margin)
+        wmargin = np.abs(dwgrid).max()
+        iline = np.nonzero(
+            (waves >= wgrid[isort[0]] - wmargin) & (waves <= wgrid[isort[-1]] + wmargin)
+        )[0]
+        xroots = np.interp(waves[iline], wgrid[isort], xgrid[isort])
+        dwpoly = wpoly.deriv()
+        for _ in range(NEWTON_ITERATIONS):
+            xroots -= (wpoly(xroots) - waves[iline]) / dwpoly(xroots)
+        lok = (1 <= xroots) & (xroots <= EMIR_NAXIS1)
+        return xroots[lok], iline[lok]
+
+    xroots = []
+    iline = []
+    for i, wave in enumerate(waves):
+        tmp_coeff = np.copy(wpoly_coeff)
+        tmp_coeff[0] -= wave
+        tmp_xroots = np.polynomial.Polynomial(tmp_coeff).roots()
+        for dum in tmp_xroots:
+            if np.isreal(dum):
+                dum = dum.real
+                if 1 <= dum <= EMIR_NAXIS1:
+                    xroots.append(dum)
+                    iline.append(i)
+    return np.array(xroots, dtype=float), np.array(iline, dtype=int)
+
+
+def render_lines(simulated_image, xx1, yy1, xx2, yy2, flux, sigma_gauss_pix, nside_pix):
+    """Add straight emission lines to an image.
+
+    Each line, defined by its end points (xx1, yy1) and (xx2, yy2), is
+    rendered row by row, with a Gaussian profile in the X direction
+    and with fractional contributions in the end rows. All the lines
+    are accumulated at once.
+
+    Parameters
+    ----------
+    simulated_image : numpy array
+        2D image where the lines are accumulated (modified in place).
+    xx1, yy1 : numpy array
+        Coordinates (in pixels, from 1 to NAXIS) of the initial point
+        of each line.
+    xx2, yy2 : numpy array
+        Coordinates (in pixels, from 1 to NAXIS) of the final point
+        of each line.
+    flux : numpy array
+        Flux (per row) of each line.
+    sigma_gauss_pix : float
+        Sigma of the Gaussians to be employed to reproduce the
+        emission lines.
+    nside_pix : int
+        Number of pixels at each side of the line center where the
+        Gaussian profile is computed.
+
+    """
+
+    naxis2, naxis1 = simulated_image.shape
+
+    slope = (xx2 - xx1) / (yy2 - yy1)
+    iyy1 = (yy1 + 0.5).astype(int)
+    lower = yy1 <= iyy1
+    fracpix1 = np.where(lower, iyy1 - yy1, 1.0 - (yy1 - iyy1))
+    iyy1 = np.where(lower, iyy1 - 1, iyy1)
+    iyy2 = (yy2 + 0.5).astype(int)
+    lower = yy2 <= iyy2
+    fracpix2 = np.where(lower, 1.0 - (iyy2 - yy2), yy2 - iyy2)
+    iyy2 = np.where(lower, iyy2, iyy2 + 1)
+
+    # expand each line into the rows it crosses
+    nrows = np.maximum(iyy2 - iyy1 + 1, 0)
+    iline = np.repeat(np.arange(len(nrows)), nrows)
+    iyy = (
+        iyy1[iline] + np.arange(len(iline)) - np.repeat(np.cumsum(nrows) - nrows, nrows)
+    )
+    fracpix = np.where(
+        iyy == iyy1[iline],
+        fracpix1[iline],
+        np.where(iyy == iyy2[iline], fracpix2[iline], 1.0),
+    )
+    icenter = iyy - 1
+    lok = (0 <= icenter) & (icenter <= naxis2 - 1)
+    iline, iyy, fracpix, icenter = iline[lok], iyy[lok], fracpix[lok], icenter[lok]
+
+    # Gaussian profile in each row
+    xx0 = xx1[iline] + slope[iline] * (iyy - yy1[iline])
+    xcenter = (xx0 + 0.5).astype(int)
+    xpix = xcenter[:, np.newaxis] + np.arange(-nside_pix, nside_pix + 1)
+    left_border = xpix - xx0[:, np.newaxis] - 0.5
+    area = norm.cdf(left_border + 1.0, scale=sigma_gauss_pix) - norm.cdf(
+        left_border, scale=sigma_gauss_pix
+    )
+    weights = (fracpix * flux[iline])[:, np.newaxis] * area
+    icenter = np.broadcast_to(icenter[:, np.newaxis], xpix.shape)
+    lok = (1 <= xpix) & (xpix <= naxis1)
+    np.add.at(simulated_image, (icenter[lok], xpix[lok] - 1), weights[lok])
@@ -9,14 +9,23 @@
 
 """Useful X-axis pixels removing +/- npixaround pixels around each OH line"""
 
+from collections import OrderedDict
+import hashlib
+
 import numpy as np
-import pkgutil
-from io import StringIO
 
 from numina.array.display.ximshow import ximshow
 from numina.array.display.pause_debugplot import pause_debugplot
 
 from emirdrp.processing.wavecal.get_islitlet import get_islitlet
+from emirdrp.processing.wavecal.retrieve_catlines import retrieve_catlines_range
+
+from emirdrp.core import EMIR_NBARS
+
+# maximum number of masks of useful pixels kept in memory
+XPIXELS_CACHE_MAXSIZE = 16
+
+_xpixels_cache = OrderedDict()
 
 
 def useful_mos_xpixels(
@@ -80,11 +89,14 @@ def useful_mos_xpixels(
     # pixels affected by OH lines
     xisok_oh = np.ones(naxis1, dtype="bool")
     if int(npix_removed_near_ohlines) > 0:
-        dumdata = pkgutil.get_data("emirdrp.instrument.configs", "Oliva_etal_2013.dat")
-        oh_lines_tmpfile = StringIO(dumdata.decode("utf8"))
-        catlines = np.genfromtxt(oh_lines_tmpfile)
-        catlines_all_wave = np.concatenate((catlines[:, 1], catlines[:, 0]))
-        for waveline in catlines_all_wave:
+        # only the lines that can affect the pixels of the spectrum
+        npix_margin = int(npix_removed_near_ohlines) + 1
+        wave_lim = crval1 + (np.array([1, naxis1]) - crpix1) * cdelt1
+        wave_lim += np.array([-npix_margin, npix_margin]) * abs(cdelt1)
+        catlines_wave, _ = retrieve_catlines_range(
+            11, None, wave_lim.min(), wave_lim.max()
+        )
+        for waveline in catlines_wave:
             expected_pixel = int((waveline - crval1) / cdelt1 + crpix1 + 0.5)
             minpix = expected_pixel - int(npix_removed_near_ohlines)
             maxpix = expected_pixel + int(npix_removed_near_ohlines)
@@ -136,3 +148,69 @@ def useful_mos_xpixels(
         pause_debugplot(debugplot, pltshow=True)
 
     return xisok
+
+
+def cached_useful_mos_xpixels(
+    base_header,
+    vpix_region,
+    npix_removed_near_ohlines=0,
+    list_valid_wvregions=None,
+):
+    """Cached version of useful_mos_xpixels (without plots).
+
+    The mask only depends on the wavelength calibration and the
+    slitlet limits stored in the image header, and on the remaining
+    arguments, which are employed as key to keep the computed masks
+    in memory.
+
+    Parameters
+    ----------
+    base_header : astropy header
+        Header of the rectified and wavelength calibrated image.
+    vpix_region : tuple of int
+        First and last rows (FITS criterion) of the region.
+    npix_removed_near_ohlines : int
+        Number of pixels removed around each OH line.
+    list_valid_wvregions : list of tuples or None
+        Valid wavelength regions. If None, the whole slitlet is valid.
+
+    Returns
+    -------
+    xisok : numpy array
+        Boolean array with the useful pixels in the X direction. A new
+        copy is returned in each call.
+
+    """
+
+    keywords = ["naxis1", "naxis2", "crpix1", "crval1", "cdelt1"]
+    for islitlet in range(1, EMIR_NBARS + 1):
+        keywords.append("jmnslt{:02d}".format(islitlet))
+        keywords.append("jmxslt{:02d}".format(islitlet))
+    md5 = hashlib.md5()
+    md5.update(repr([base_header.get(keyword) for keyword in keywords]).encode())
+    md5.update(
+        repr(
+            (
+                tuple(vpix_region),
+                npix_removed_near_ohlines,
+                list_valid_wvregions,
+            )
+        ).encode()
+    )
+    key = md5.hexdigest()
+
+    if key in _xpixels_cache:
+        _xpixels_cache.move_to_end(key)
+    else:
+        _xpixels_cache[key] = useful_mos_xpixels(
+            None,
+            base_header,
+            vpix_region=vpix_region,
+            npix_removed_near_ohlines=npix_removed_near_ohlines,
+            list_valid_wvregions=list_valid_wvregions,
+            debugplot=0,
+        )
+        while len(_xpixels_cache) > XPIXELS_CACHE_MAXSIZE:
+            _xpixels_cache.popitem(last=False)
+
+    return _xpixels_cache[key].copy()
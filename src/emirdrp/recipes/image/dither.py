@@ -41,6 +41,8 @@ import emirdrp.products as prods
 from emirdrp.processing.wcs import offsets_from_wcs_imgs
 from emirdrp.processing.corr import offsets_from_crosscor_regions
 from emirdrp.core.recipe import EmirRecipe
+from emirdrp.instrument.detector_layout import DetectorLayout
+from emirdrp.instrument.detector_layout import get_detector_layout
 
 from .naming import name_redimensioned_frames, name_object_mask, name_skybackground
 from .naming import name_skysub_proc, name_skyflat
@@ -227,7 +229,7 @@ class FullDitheredImagesRecipe(EmirRecipe):
         # insconf = rinput.obresult.configuration
         # detector_channels = insconf.get_device("detector").get_property("channels")
         # temporal workaround
-        with obresult.frames[0].open() as hdul:
+        with self.datamodel.open_frame(obresult.frames[0]) as hdul:
             if convert_date(hdul[0].header["DATE-OBS"]) > convert_date(
                 "2023-07-01T12:00:00.0"
             ):
@@ -248,10 +250,14 @@ class FullDitheredImagesRecipe(EmirRecipe):
                 )
             # read channels layout (after astrometric correction) from the first image
             if adhoc_sky_correction_h2rg:
-                with obresult.frames[0].open() as hdul:
+                with self.datamodel.open_frame(obresult.frames[0]) as hdul:
                     if "ICHANNEL" in hdul:
                         self.logger.info("images have ICHANNEL extension")
-                        img_channels_layout = hdul["ICHANNEL"].data
+                        img_channels_layout = DetectorLayout.from_label_image(
+                            "ICHANNEL",
+                            hdul["ICHANNEL"].data,
+                            get_detector_layout(detector_channels).nchannels,
+                        )
                     else:
                         raise ValueError(
                             "Expected image extension 'ICHANNEL' not found!"
@@ -580,7 +586,7 @@ class FullDitheredImagesRecipe(EmirRecipe):
             self.logger.debug(f"using previously computed median sky {sky}")
         else:
 
-            with fits.open(skyframe.lastname, mode="readonly") as hdulist:
+            with self.datamodel.open_image(skyframe.lastname) as hdulist:
                 data = hdulist["primary"].data
                 valid = data[frame.valid_region]
 
@@ -650,14 +656,14 @@ class FullDitheredImagesRecipe(EmirRecipe):
         """Classify input frames,"""
         # lists of targets and sky frames
 
-        with obresult.frames[0].open() as baseimg:
+        with self.datamodel.open_frame(obresult.frames[0]) as baseimg:
             # Initial checks
             has_bpm_ext = "BPM" in baseimg
             self.logger.info("images have BPM extension: %s", has_bpm_ext)
 
         images_info = []
         for f in obresult.frames:
-            with f.open() as img:
+            with self.datamodel.open_frame(f) as img:
                 # Getting some metadata from FITS header
                 hdr = img[0].header
 
@@ -725,7 +731,7 @@ class FullDitheredImagesRecipe(EmirRecipe):
                 self.logger.debug(
                     f"Step {step}, opening resized mask  {img_info.resized_mask}"
                 )
-                with fits.open(img_info.resized_mask, mode="readonly") as hdul:
+                with self.datamodel.open_image(img_info.resized_mask) as hdul:
                     tmp_mask = hdul["primary"].data[img_info.valid_region]
                 scales.append(numpy.median(tmp_data[tmp_mask == 0]))
 
@@ -981,19 +987,18 @@ class FullDitheredImagesRecipe(EmirRecipe):
         self, frames, extinction, out=None, step=0, method=None, method_kwargs=None
     ):
 
-        # define auxiliary function
-        def fits_open(name):
-            """Open FITS with memmap in readonly mode"""
-            return fits.open(name, mode="readonly", memmap=True)
-
         self.logger.debug(f"Step {step}, opening sky-subtracted frames")
         frameslll = [
-            fits_open(frame.lastname) for frame in frames if frame.valid_target
+            self.datamodel.open_image(frame.lastname)
+            for frame in frames
+            if frame.valid_target
         ]
 
         self.logger.debug(f"Step {step}, opening mask frames")
         mskslll = [
-            fits_open(frame.resized_mask) for frame in frames if frame.valid_target
+            self.datamodel.open_image(frame.resized_mask)
+            for frame in frames
+            if frame.valid_target
         ]
 
         self.logger.debug(
@@ -1106,7 +1111,7 @@ class FullDitheredImagesRecipe(EmirRecipe):
 
     def resize_frame_and_mask(self, iinfo, finalshape, window, scale):
         self.logger.debug(f"resizing frame {iinfo.resized_base}")
-        with iinfo.origin.open() as hdul:
+        with self.datamodel.open_frame(iinfo.origin) as hdul:
             baseshape = hdul[0].data.shape
 
             # update CRPIX1 and CRPIX2 in header (to fix the WCS in the resized images)
@@ -1135,7 +1140,7 @@ class FullDitheredImagesRecipe(EmirRecipe):
             iinfo.mask = hdul_dum
         elif isinstance(iinfo.mask, nfcom.Extension):
             ename = iinfo.mask.name
-            with iinfo.origin.open() as hdul:
+            with self.datamodel.open_frame(iinfo.origin) as hdul:
                 iinfo.mask = fits.HDUList(hdul[ename].copy())
 
         # We don't conserve the sum of the values of the frame here, just
@@ -1360,7 +1365,7 @@ class FullDitheredImagesRecipe(EmirRecipe):
         try:
             for i in skyframes:
                 filename = i.flat_corrected
-                hdulist = fits.open(filename, mode="readonly", memmap=True)
+                hdulist = self.datamodel.open_image(filename)
 
                 data.append(hdulist["primary"].data[i.valid_region])
                 desc.append(hdulist)
@@ -1370,7 +1375,7 @@ class FullDitheredImagesRecipe(EmirRecipe):
                     masks.append(msk)
                     self.logger.debug("object mask (including footprint) is shared")
                 elif i.objmask is not None:
-                    hdulistmask = fits.open(i.objmask, mode="readonly", memmap=True)
+                    hdulistmask = self.datamodel.open_image(i.objmask)
                     # note that this image has the correct shape (2048x2048)
                     # and there is no need to use i.valid_region; in addition,
                     # this image also contain the footprint
@@ -1401,7 +1406,7 @@ class FullDitheredImagesRecipe(EmirRecipe):
             # note: this sky is scaled to have a mean value of 1.0 (using the unmasked pixels)
             sky, _, num = method(data, masks, scales=scales, **method_kwargs)
 
-            with fits.open(frame.lastname) as hdulist:
+            with self.datamodel.open_image(frame.lastname) as hdulist:
                 data = hdulist["primary"].data
                 valid = data[frame.valid_region]
 
@@ -1589,13 +1594,12 @@ class FullDitheredImagesRecipe(EmirRecipe):
         elif detector_channels == "H2RG_FULL":  # new H2RG detector
             if img_channels_layout is None:
                 raise ValueError("Expected img_channels_layout is None")
-            for j_channel in range(32):
-                within_channel = img_channels_layout == j_channel + 1
-                objmask_for_channel = objmask[within_channel]
-                if len(arr[within_channel][objmask_for_channel == 0]) > 0:
-                    skyfit[within_channel] = numpy.median(
-                        arr[within_channel][objmask_for_channel == 0]
-                    )
+            # the pixel index of each channel is shared by all the images
+            for j_channel in range(img_channels_layout.nchannels):
+                pixels = img_channels_layout.channel_pixels(j_channel + 1)
+                usefulpix = arr.take(pixels)[objmask.take(pixels) == 0]
+                if usefulpix.size > 0:
+                    skyfit.flat[pixels] = numpy.median(usefulpix)
                 debug = False
                 if debug:
                     import matplotlib.pyplot as plt
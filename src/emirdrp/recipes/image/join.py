@@ -22,13 +22,12 @@ from numina.core import Result, Requirement, Parameter
 from numina.core.requirements import ObservationResultRequirement
 from numina.array import combine
 from numina.array import combine_shape, combine_shapes
-from numina.array import resize_arrays, resize_arrays_alt
+from numina.array import resize_arrays
 from numina.array.combine import flatcombine, median, quantileclip
 from numina.array.utils import coor_to_pix, image_box2d
 import numina.processing as proc
 from numina.core.query import ResultOf
 from numina.array import fixpix2
-from numina.frame.utils import copy_img
 import numpy
 import sep
 
@@ -37,6 +36,11 @@ import emirdrp.products as prods
 import emirdrp.requirements as reqs
 import emirdrp.decorators
 from emirdrp.processing.wcs import offsets_from_wcs_imgs, reference_pix_from_wcs_imgs
+from emirdrp.processing.accumulator import ACCUM_KEYWORD
+from emirdrp.processing.accumulator import dataframe_uuid
+from emirdrp.processing.accumulator import find_accumulator
+from emirdrp.processing.accumulator import register_accumulator
+from emirdrp.processing.accumulator import restore_accumulator
 from emirdrp.processing.corr import offsets_from_crosscor, offsets_from_crosscor_regions
 from emirdrp.core.recipe import EmirRecipe
 from emirdrp.processing.combine import segmentation_combined
@@ -101,7 +105,7 @@ class JoinDitheredImagesRecipe(EmirRecipe):
 
         data_hdul = []
         for f in obresult.frames:
-            img = f.open()
+            img = self.datamodel.open_frame(f)
             data_hdul.append(img)
 
         use_errors = True
@@ -234,7 +238,7 @@ class JoinDitheredImagesRecipe(EmirRecipe):
         baseshape = baseimg[0].shape
         subpixshape = baseshape
         # base_header = baseimg[0].header
-        result = copy_img(baseimg)
+        result = self.datamodel.copy_hdulist(baseimg)
 
         if has_num_ext:
             self.logger.debug("Using NUM extension")
@@ -304,7 +308,7 @@ class JoinDitheredImagesRecipe(EmirRecipe):
         # in processing.combine
         baseimg = data_hdul[0]
         # base_header = baseimg[0].header
-        result = copy_img(baseimg)
+        result = self.datamodel.copy_hdulist(baseimg)
 
         self.logger.info("Combine target images (final)")
         method = combine.median
@@ -520,19 +524,25 @@ class JoinDitheredImagesRecipe(EmirRecipe):
         return sky_result
 
     def aggregate2(self, frame1, frame2, naccum):
-        # FIXME, this is almost identical to run_single
-        frames = [frame1, frame2]
+        """Add a new frame to the accumulated result of previous rounds"""
         use_errors = True
-        # Initial checks
-        fframe = frames[0]
-        img = fframe.open()
-        result = copy_img(img)
-        # base_header = result[0].header
 
-        imgs = []
-        for f in frames:
-            img = f.open()
-            imgs.append(img)
+        # the accumulator is registered again when the result is built
+        accumulator = find_accumulator(dataframe_uuid(frame1), remove=True)
+        if accumulator is None:
+            self.logger.debug("initialize accumulator from accumulated image")
+            accum_img = self.datamodel.open_frame(frame1)
+            accumulator = restore_accumulator(
+                accum_img, naccum, mask=self.accum_mask(accum_img)
+            )
+        else:
+            self.logger.debug("using accumulator of previous round")
+        img = self.datamodel.open_frame(frame2)
+        # the accumulated image, built without copying the accumulated values
+        accum_img = fits.HDUList(
+            [fits.PrimaryHDU(accumulator.mean, header=accumulator.header.copy())]
+        )
+        imgs = [accum_img, img]
 
         self.logger.info("Computing offsets from WCS information")
 
@@ -542,45 +552,18 @@ class JoinDitheredImagesRecipe(EmirRecipe):
 
         self.logger.info("Shape of resized array is %s", finalshape)
         self.logger.debug("partial shapes %s", partial_shapes)
-
-        masks = []
-        self.logger.debug("Obtains masks")
-        for img in imgs:
-            if "NUM" in img:
-                self.logger.debug("Using NUM extension as mask")
-                mask = numpy.where(img["NUM"].data, 0, 1).astype("int16")
-            elif "BPM" in img:
-                self.logger.debug("Using BPM extension as mask")
-                mask = numpy.where(img["BPM"].data, 1, 0).astype("int16")
-            else:
-                self.logger.warning("BPM missing, use zeros instead")
-                mask = numpy.zeros_like(img[0].data)
-            masks.append(mask)
-
-        # Resizing target frames
-        data_arr_r = resize_arrays_alt(
-            [img[0].data for img in imgs], partial_shapes, finalshape, fill=1
-        )
-
-        self.logger.debug("resize bad pixel masks")
-        mask_arr_r = resize_arrays_alt(masks, partial_shapes, finalshape, fill=1)
-
-        self.logger.debug("not computing sky")
-        data_arr_sr = data_arr_r
+        accumulator.expand(finalshape, partial_shapes[0])
 
         self.logger.info("Combine target images (final, aggregate)")
-        self.logger.debug("weights for 'accum' and 'frame'")
-
-        weight_accum = 2 * (1 - 1.0 / naccum)
-        weight_frame = 2.0 / naccum
-        scales = [1.0 / weight_accum, 1.0 / weight_frame]
-        self.logger.debug("weights for 'accum' and 'frame', %s", scales)
-        method = combine.mean
-        out = method(data_arr_sr, masks=mask_arr_r, scales=scales, dtype="float32")
+        accumulator.add(
+            img[0].data, mask=self.accum_mask(img), region=partial_shapes[1]
+        )
 
         self.logger.debug("create result image")
-        hdu = result[0]
-        hdu.data = out[0]
+        hdu = fits.PrimaryHDU(
+            accumulator.mean.astype("float32"), header=accum_img[0].header.copy()
+        )
+        result = fits.HDUList([hdu])
         self.logger.debug("update result header")
         hdr = hdu.header
         self.set_base_headers(hdr)
@@ -590,7 +573,7 @@ class JoinDitheredImagesRecipe(EmirRecipe):
         hdr["OBSMODE"] = "DITHERED_IMAGE"
         hdu.header["history"] = "Combined %d images using '%s'" % (
             len(imgs),
-            method.__name__,
+            "mean",
         )
         hdu.header["history"] = "Combination time {}".format(
             datetime.datetime.now(datetime.UTC).isoformat()
@@ -605,15 +588,37 @@ class JoinDitheredImagesRecipe(EmirRecipe):
         # Update WCS, approximate solution
         hdr["CRPIX1"] += refpix_final_xy[0] - refpix_xy_0[0]
         hdr["CRPIX2"] += refpix_final_xy[1] - refpix_xy_0[1]
+        hdr["UUID"] = str(uuid.uuid1())
 
         #
         if use_errors:
-            varhdu = fits.ImageHDU(out[1], name="VARIANCE")
+            hdr[ACCUM_KEYWORD] = (naccum, "Number of accumulated rounds")
+            varhdu = fits.ImageHDU(
+                accumulator.variance().astype("float32"), name="VARIANCE"
+            )
             result.append(varhdu)
-            num = fits.ImageHDU(out[2].astype("int16"), name="MAP")
+            num = fits.ImageHDU(accumulator.count.astype("int16"), name="MAP")
             result.append(num)
+            # keep the values stored in the result, so that the next round
+            # does not depend on whether this accumulator is still alive
+            accumulator.load(hdu.data, num.data, varhdu.data)
+
+        accumulator.header = hdr.copy()
+        register_accumulator(hdr["UUID"], accumulator)
         return result
 
+    def accum_mask(self, img):
+        """Mask of an image to be accumulated (nonzero values are masked)"""
+        if "NUM" in img:
+            self.logger.debug("Using NUM extension as mask")
+            return numpy.where(img["NUM"].data, 0, 1).astype("int16")
+        elif "BPM" in img:
+            self.logger.debug("Using BPM extension as mask")
+            return numpy.where(img["BPM"].data, 1, 0).astype("int16")
+        else:
+            self.logger.warning("BPM missing, use zeros instead")
+            return None
+
     def compute_regions_from_objs(self, arr, finalshape, box=50, corners=True):
         regions = []
         catalog, mask = self.create_object_catalog(arr, border=300)
@@ -725,7 +730,7 @@ class FullDitheredImagesRecipe(JoinDitheredImagesRecipe):
         img_info = []
         data_hdul = []
         for f in frames:
-            img = f.open()
+            img = self.datamodel.open_frame(f)
             data_hdul.append(img)
             info = {}
             info["tstamp"] = img[0].header["tstamp"]
@@ -27,16 +27,18 @@ from numina.core import Result, Parameter
 from numina.core.query import Ignore
 from numina.core.recipes import timeit
 from numina.processing.combine import basic_processing_with_combination
-from numina.tools.pixel_solid_angle_arcsec2 import pixel_solid_angle_arcsec2
 from numina.util.context import manage_fits
 import numpy as np
-from reproject import reproject_interp, reproject_adaptive, reproject_exact
 
 from emirdrp.core.recipe import EmirRecipe
+from emirdrp.instrument.detector_layout import get_detector_layout
 import emirdrp.core.extra as extra
 import emirdrp.requirements as reqs
 import emirdrp.products as prods
 import emirdrp.processing.combine as comb
+from emirdrp.processing.reprojection import reproject_planes
+from emirdrp.processing.solidangle import cached_pixel_solid_angle_arcsec2
+from emirdrp.processing.solidangle import solid_angle_cache_info
 import emirdrp.decorators
 
 _logger = logging.getLogger(__name__)
@@ -55,6 +57,11 @@ class StareImageRecipe2(EmirRecipe):
         description="Astrometric reprojection method",
         choices=["interp", "adaptive", "exact", "none"],
     )
+    solid_angle_cache_dir = Parameter(
+        "",
+        description="Directory where the pixel solid angle maps are stored "
+        "between runs (if empty, they are only kept in memory)",
+    )
 
     reduced_image = Result(prods.ProcessedImage)
 
@@ -84,7 +91,7 @@ class StareImageRecipe2(EmirRecipe):
 
         if rinput.master_bpm is not None:
             self.logger.debug("using BPM from inputs")
-            hdul_bpm = rinput.master_bpm.open()
+            hdul_bpm = self.datamodel.open_frame(rinput.master_bpm)
             hdu_bpm = extra.generate_bpm_hdu(hdul_bpm[0])
         else:
             self.logger.debug("using empty BPM")
@@ -100,16 +107,6 @@ class StareImageRecipe2(EmirRecipe):
         convert_to_surface_brightness = True
         reprojection_method = rinput.reprojection_method
         if reprojection_method != "none":
-            if reprojection_method == "interp":
-                reproject_function = reproject_interp
-            elif reprojection_method == "adaptive":
-                reproject_function = reproject_adaptive
-            elif reprojection_method == "exact":
-                reproject_function = reproject_exact
-            else:
-                raise ValueError(
-                    f"Unexpected astrometric_reprojection value: {reprojection_method}"
-                )
             # reproject data
             self.logger.debug("starting image reprojection")
             hdr_original = deepcopy(hdr)
@@ -129,44 +126,53 @@ class StareImageRecipe2(EmirRecipe):
                     raise ValueError("Unexpected PVi_j value")
             wcs_final = WCS(hdr)
             naxis2, naxis1 = processed_img[0].data.shape
+            solid_angle_cache_dir = rinput.solid_angle_cache_dir or None
             if convert_to_surface_brightness:
                 # solid angle subtended by every pixel
                 self.logger.debug(
                     "... computing solid angle of every pixel in the original WCS"
                 )
-                pixel_solid_angle_original = pixel_solid_angle_arcsec2(
+                pixel_solid_angle_original = cached_pixel_solid_angle_arcsec2(
                     wcs=wcs_original,
                     naxis1=naxis1,
                     naxis2=naxis2,
-                    method=3,
-                    kernel_size=(11, 11),
+                    cache_dir=solid_angle_cache_dir,
                 )
                 surface_brightness_data = (
                     processed_img[0].data / pixel_solid_angle_original
                 )
             else:
                 surface_brightness_data = processed_img[0].data
-            # reprojection itself
+            # reprojection itself: the surface brightness, the mask and the
+            # image with individual channel distortion (for the H2RG
+            # detector) share the same pixel mapping
+            list_planes = [surface_brightness_data, hdu_bpm.data]
+            if detector_channels == "H2RG_FULL":
+                list_planes.append(get_detector_layout(detector_channels).label_image)
             self.logger.debug(
-                f"... reprojecting surface brightness using reproject_{reprojection_method}"
+                f"... reprojecting surface brightness and mask using reproject_{reprojection_method}"
             )
-            data_final, footprint = reproject_function(
-                input_data=(surface_brightness_data, wcs_original),
-                output_projection=wcs_final,
+            planes_final, footprints = reproject_planes(
+                list_planes,
+                wcs_original,
+                wcs_final,
                 shape_out=processed_img[0].data.shape,
+                method=reprojection_method,
             )
+            data_final = planes_final[0]
+            footprint = footprints[0]
             if convert_to_surface_brightness:
                 self.logger.debug(
                     "... computing solid angle of every pixel in the final WCS"
                 )
-                pixel_solid_angle_final = pixel_solid_angle_arcsec2(
+                pixel_solid_angle_final = cached_pixel_solid_angle_arcsec2(
                     wcs=wcs_final,
                     naxis1=naxis1,
                     naxis2=naxis2,
-                    method=3,
-                    kernel_size=(11, 11),
+                    cache_dir=solid_angle_cache_dir,
                 )
                 data_final *= pixel_solid_angle_final
+                self.logger.debug(f"... solid angle cache: {solid_angle_cache_info()}")
             # avoid undefined values: note that using footprint < 1.0 does not work
             # properly with reproject_exact(), which gives a footprint with values around 1.0
             # but with a non-negligible dispersion below 0.01 (for safety, here we use
@@ -176,32 +182,18 @@ class StareImageRecipe2(EmirRecipe):
             data_final[footprint < minimum_footprint] = 0
             processed_img[0].data = data_final
             mask_footprint = (footprint < minimum_footprint).astype("uint8")
-            # reproject mask
-            self.logger.debug(
-                f"... reprojecting mask using reproject_{reprojection_method}"
-            )
-            mask_reprojected, footprint = reproject_function(
-                input_data=(hdu_bpm.data, wcs_original),
-                output_projection=wcs_final,
-                shape_out=hdu_bpm.data.shape,
-            )
+            # reprojected mask
+            mask_reprojected = planes_final[1]
+            footprint = footprints[1]
             # avoid undefined values
             mask_reprojected[footprint < minimum_footprint] = 0
             self.logger.debug("... merging existing mask with footprint from reproject")
             # there is no need to recompute mask_footprint (is the one computed for data)
             hdu_bpm.data = (mask_reprojected > 0).astype("uint8") + mask_footprint
-            # generate image with individual channel distortion
+            # reprojected image with individual channel distortion
             if detector_channels == "H2RG_FULL":
-                image_channels = np.zeros((2048, 2048))
-                for j_channel in range(32):
-                    j1 = j_channel * 64
-                    j2 = j1 + 64
-                    image_channels[:, j1:j2] = j_channel + 1
-                channels_reprojected, footprint = reproject_function(
-                    input_data=(image_channels, wcs_original),
-                    output_projection=wcs_final,
-                    shape_out=image_channels.shape,
-                )
+                channels_reprojected = planes_final[2]
+                footprint = footprints[2]
                 channels_reprojected[footprint < minimum_footprint] = 0.0
                 channels_reprojected_int = np.round(channels_reprojected).astype(
                     "uint8"
@@ -219,14 +211,10 @@ class StareImageRecipe2(EmirRecipe):
             )
         else:
             if detector_channels == "H2RG_FULL":
-                image_channels = np.zeros((2048, 2048), dtype="uint8")
-                for j_channel in range(32):
-                    j1 = j_channel * 64
-                    j2 = j1 + 64
-                    image_channels[:, j1:j2] = j_channel + 1
+                image_channels = get_detector_layout(detector_channels).label_image
                 header = fits.Header()
                 header["EXTNAME"] = "ICHANNEL"
-                hdu_channels = fits.ImageHDU(image_channels, header=header)
+                hdu_channels = fits.ImageHDU(image_channels.copy(), header=header)
             else:
                 hdu_channels = None
 
@@ -281,7 +269,7 @@ class StareImageBaseRecipe(EmirRecipe):
         self.set_base_headers(hdr)
 
         if rinput.master_bpm:
-            hdul_bpm = rinput.master_bpm.open()
+            hdul_bpm = self.datamodel.open_frame(rinput.master_bpm)
             hdu_bpm = extra.generate_bpm_hdu(hdul_bpm[0])
         else:
             hdu_bpm = extra.generate_empty_bpm_hdu(hdulist[0])
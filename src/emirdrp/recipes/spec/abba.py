@@ -13,11 +13,10 @@ Spectroscopy mode, combine AB or ABBA observations
 
 from astropy import wcs
 from astropy.coordinates import SkyCoord
-import astropy.io.fits as fits
 import contextlib
+import functools
 import logging
 import numpy as np
-from scipy import ndimage
 import uuid
 
 from numina.array.wavecalib.crosscorrelation import periodic_corr1d
@@ -31,17 +30,38 @@ from emirdrp.core.recipe import EmirRecipe
 import emirdrp.datamodel
 import emirdrp.products as prods
 from numina.processing.combine import combine_imgs
-from emirdrp.processing.wavecal.apply_rectwv_coeff import apply_rectwv_coeff
+from emirdrp.processing.framestore import FrameStore
+from emirdrp.processing.pipeline import available_cpus
+from emirdrp.processing.pipeline import imap_ordered
+from emirdrp.processing.shiftcombine import shift_combine_method
+from emirdrp.processing.shiftcombine import shift_rows
+from emirdrp.processing.spatial_profiles import mean_spatial_profiles
+from emirdrp.processing.spatial_profiles import spatial_profile_offsets
+from emirdrp.processing.wavecal.apply_rectwv_coeff import apply_rectwv_coeff_batch
 from emirdrp.processing.wavecal.median_slitlets_rectified import (
     median_slitlets_rectified,
 )
 from emirdrp.processing.wavecal.rectwv_coeff_to_ds9 import save_four_ds9
 from emirdrp.processing.wavecal.rectwv_coeff_to_ds9 import save_spectral_lines_ds9
-from emirdrp.processing.wavecal.useful_mos_xpixels import useful_mos_xpixels
+from emirdrp.processing.wavecal.rectwv_session import configure_rectwv_session
+from emirdrp.processing.wavecal.useful_mos_xpixels import cached_useful_mos_xpixels
 
 from emirdrp.core import EMIR_NAXIS1
 from emirdrp.core import EMIR_NAXIS2
 
+# maximum number of images rectified together by each worker of
+# ABBASpectraRectwv
+RECTIFICATION_BATCH_SIZE = 8
+
+# maximum number of images read and not yet stored by the workers of
+# ABBASpectraRectwv (independent of the number of workers, so that the
+# memory employed does not grow with the length of the sequence)
+MAX_PENDING_IMAGES = 16
+
+# number of rows of the strips employed to shift and combine the
+# individual images in ABBASpectraRectwv
+COMBINATION_NROWS_STRIP = 256
+
 
 def get_isky(i, basic_pattern, repeat):
     """Return index number of image to be employed as sky
@@ -141,6 +161,11 @@ class ABBASpectraRectwv(EmirRecipe):
     refine_target_along_slitlet = Parameter(
         dict(), description="Parameters to refine location of target along the slitlet"
     )
+    nworkers = Parameter(
+        1,
+        description="Number of threads employed to reduce and rectify the "
+        "individual images (0: number of available CPUs)",
+    )
 
     reduced_mos_abba = Result(prods.ProcessedMOS)
     reduced_mos_abba_combined = Result(prods.ProcessedMOS)
@@ -217,7 +242,8 @@ class ABBASpectraRectwv(EmirRecipe):
         # compute offsets from WCS info in image headers
         with contextlib.ExitStack() as stack:
             hduls = [
-                stack.enter_context(fname.open()) for fname in rinput.obresult.frames
+                stack.enter_context(self.datamodel.open_frame(fname))
+                for fname in rinput.obresult.frames
             ]
             sep_arcsec, spatial_scales = compute_wcs_offsets(hduls)
 
@@ -345,267 +371,201 @@ class ABBASpectraRectwv(EmirRecipe):
         # build object to proceed with bpm, bias, dark and flat
         flow = self.init_filters(rinput)
 
-        # basic reduction, rectification and wavelength calibration of all the individual images
-        list_reduced_mos_images = []
-        self.logger.info("starting reduction of individual images")
-        for i, char in enumerate(full_set):
-            frame = rinput.obresult.frames[i]
-            self.logger.info(f"image {char} ({i+1} of {nimages})")
-            self.logger.info(f"image: {frame.filename}")
-            with frame.open() as f:
-                newimg = fits.HDUList([ext.copy() for ext in f])
-            base_header = newimg[0].header
-            grism_name_ = base_header["grism"]
-            if grism_name_ != grism_name:
-                raise ValueError(
-                    "Incompatible grism name in rectwv_coeff.json file and FITS image"
-                )
-            filter_name_ = base_header["filter"]
-            if filter_name_ != filter_name:
-                raise ValueError(
-                    "Incompatible filter name in rectwv_coeff.json file and FITS image"
-                )
-            hdu = newimg[0]
-            hdu.header["UUID"] = str(uuid.uuid1())
-            # basic reduction
-            reduced_image = flow(newimg)
-            hdr = reduced_image[0].header
-            self.set_base_headers(hdr)
-            # rectification and wavelength calibration
-            reduced_mos_image = apply_rectwv_coeff(reduced_image, list_rectwv_coeff[i])
+        # basic reduction, rectification and wavelength calibration of
+        # the individual images, which are kept in a disk-backed store;
+        # consecutive images sharing the same rectwv_coeff are processed
+        # together, and the batches are distributed among the workers
+        nworkers = rinput.nworkers if rinput.nworkers > 0 else available_cpus()
+        batch_size = min(
+            RECTIFICATION_BATCH_SIZE,
+            -(-nimages // nworkers),
+            max(1, MAX_PENDING_IMAGES // nworkers),
+        )
+        list_batches = []
+        for i in range(nimages):
+            if (
+                i > 0
+                and len(list_batches[-1]) < batch_size
+                and list_rectwv_coeff[i].uuid == list_rectwv_coeff[i - 1].uuid
+            ):
+                list_batches[-1].append(i)
+            else:
+                list_batches.append([i])
+        with FrameStore(nimages, directory=self.runinfo.get("work_dir")) as store:
+            self.logger.info("starting reduction of individual images")
+            self.logger.info(f"number of workers: {nworkers}")
+            for list_batch, list_rectwv_images in imap_ordered(
+                functools.partial(self.reduce_rectify_frames, flow, list_rectwv_coeff),
+                self.read_frames(
+                    rinput, list_batches, full_set, grism_name, filter_name
+                ),
+                max_workers=nworkers,
+                max_pending=MAX_PENDING_IMAGES,
+                item_size=lambda batch: len(batch[0]),
+            ):
+                for i, reduced_mos_image in zip(list_batch, list_rectwv_images):
+                    store.put(i, reduced_mos_image)
+
             if save_individual_images != 0:
-                self.save_intermediate_img(
-                    reduced_mos_image,
-                    "reduced_mos_image_" + char + "_" + frame.filename[:10] + ".fits",
-                )
-            list_reduced_mos_images.append(reduced_mos_image)
+                for i, char in enumerate(full_set):
+                    frame = rinput.obresult.frames[i]
+                    self.save_intermediate_img(
+                        store.hdulist(i),
+                        "reduced_mos_image_"
+                        + char
+                        + "_"
+                        + frame.filename[:10]
+                        + ".fits",
+                    )
 
-        # intermediate PDF file with crosscorrelation plots
-        if self.intermediate_results:
-            from matplotlib.backends.backend_pdf import PdfPages
+            # intermediate PDF file with crosscorrelation plots
+            if self.intermediate_results:
+                from matplotlib.backends.backend_pdf import PdfPages
 
-            pdf = PdfPages("crosscorrelation_ab.pdf")
-        else:
-            pdf = None
-
-        # compute offsets between images
-        self.logger.info("computing offsets between individual images")
-        first_a = True
-        first_b = True
-        xisok_a = None
-        xisok_b = None
-        reference_profile_a = None
-        reference_profile_b = None
-        refine_a = vpix_region_a_target is not None
-        refine_b = vpix_region_b_target is not None
-        list_offsets = []
-        for i, char in enumerate(full_set):
-            if char == "A" and refine_a:
-                refine_image = True
-            elif char == "B" and refine_b:
-                refine_image = True
+                pdf = PdfPages("crosscorrelation_ab.pdf")
             else:
-                refine_image = False
-            if refine_image:
-                frame = rinput.obresult.frames[i]
-                isky = get_isky(i, basic_pattern, repeat)
-                frame_sky = rinput.obresult.frames[isky]
-                self.logger.info(f"image {char} ({i+1} of {nimages})")
-                self.logger.info(f"image: {frame.filename}")
-                self.logger.info(f"(sky): {frame_sky.filename}")
-                data = list_reduced_mos_images[i][0].data.copy()
-                data_sky = list_reduced_mos_images[isky][0].data
-                data -= data_sky
-                base_header = list_reduced_mos_images[i][0].header
-
-                # get useful pixels in the wavelength direction
-                if char == "A" and first_a:
-                    xisok_a = useful_mos_xpixels(
-                        data,
-                        base_header,
-                        vpix_region=vpix_region_a_target,
-                        npix_removed_near_ohlines=npix_removed_near_ohlines,
-                        list_valid_wvregions=list_valid_wvregions_a,
-                        debugplot=0,
-                    )
-                elif char == "B" and first_b:
-                    xisok_b = useful_mos_xpixels(
-                        data,
-                        base_header,
-                        vpix_region=vpix_region_b_target,
-                        npix_removed_near_ohlines=npix_removed_near_ohlines,
-                        list_valid_wvregions=list_valid_wvregions_b,
-                        debugplot=0,
+                pdf = None
+
+            # compute offsets between images
+            self.logger.info("computing offsets between individual images")
+            reference_profile_a = None
+            reference_profile_b = None
+            list_offsets = [0.0] * nimages
+            for char, vpix_region, vpix_region_sky, list_valid_wvregions in (
+                ("A", vpix_region_a_target, vpix_region_a_sky, list_valid_wvregions_a),
+                ("B", vpix_region_b_target, vpix_region_b_sky, list_valid_wvregions_b),
+            ):
+                if vpix_region is None:
+                    continue
+                list_indices = [i for i, c in enumerate(full_set) if c == char]
+                list_isky = [get_isky(i, basic_pattern, repeat) for i in list_indices]
+                list_titles = []
+                for i, isky in zip(list_indices, list_isky):
+                    frame = rinput.obresult.frames[i]
+                    frame_sky = rinput.obresult.frames[isky]
+                    self.logger.info(f"image {char} ({i+1} of {nimages})")
+                    self.logger.info(f"image: {frame.filename}")
+                    self.logger.info(f"(sky): {frame_sky.filename}")
+                    list_titles.append(
+                        f"Image #{i+1} (type {char}), {frame.filename[:10]}"
                     )
 
+                # get useful pixels in the wavelength direction (they only
+                # depend on the header, and are computed once per position)
+                xisok = cached_useful_mos_xpixels(
+                    store.header(list_indices[0]),
+                    vpix_region=vpix_region,
+                    npix_removed_near_ohlines=npix_removed_near_ohlines,
+                    list_valid_wvregions=list_valid_wvregions,
+                )
+
+                # spatial profiles of all the images of this position, after
+                # subtracting the corresponding sky images
+                profiles = mean_spatial_profiles(
+                    [store.data(i) for i in list_indices],
+                    [store.data(isky) for isky in list_isky],
+                    vpix_region=vpix_region,
+                    xisok=xisok,
+                    vpix_region_sky=vpix_region_sky,
+                    nwidth_medfilt=nwidth_medfilt,
+                )
+                reference_profile = profiles[0].copy()
                 if char == "A":
-                    nsmin = vpix_region_a_target[0]
-                    nsmax = vpix_region_a_target[1]
-                    xisok = xisok_a
-                    if vpix_region_a_sky is not None:
-                        nsmin_sky = vpix_region_a_sky[0]
-                        nsmax_sky = vpix_region_a_sky[1]
-                        skysubtraction = True
-                    else:
-                        nsmin_sky = None
-                        nsmax_sky = None
-                        skysubtraction = False
-                elif char == "B":
-                    nsmin = vpix_region_b_target[0]
-                    nsmax = vpix_region_b_target[1]
-                    xisok = xisok_b
-                    if vpix_region_b_sky is not None:
-                        nsmin_sky = vpix_region_b_sky[0]
-                        nsmax_sky = vpix_region_b_sky[1]
-                        skysubtraction = True
-                    else:
-                        nsmin_sky = None
-                        nsmax_sky = None
-                        skysubtraction = False
+                    reference_profile_a = reference_profile
                 else:
-                    raise ValueError(f"Unexpected char value: {char}")
-
-                # initial slitlet region
-                slitlet2d = data[(nsmin - 1) : nsmax, :].copy()
-                if skysubtraction:
-                    slitlet2d_sky = data[(nsmin_sky - 1) : nsmax_sky, :].copy()
-                    median_sky = np.median(slitlet2d_sky, axis=0)
-                    slitlet2d -= median_sky
-
-                # selected wavelength regions after blocking OH lines
-                slitlet2d_blocked = slitlet2d[:, xisok]
-
-                # apply median filter in the X direction
-                if nwidth_medfilt > 1:
-                    slitlet2d_blocked_smoothed = ndimage.filters.median_filter(
-                        slitlet2d_blocked, size=(1, nwidth_medfilt)
+                    reference_profile_b = reference_profile
+
+                # crosscorrelation to find offsets
+                offsets, fpeak = spatial_profile_offsets(
+                    reference_profile,
+                    profiles,
+                    naround_zero=(vpix_region[1] - vpix_region[0]) // 3,
+                    plottitles=list_titles,
+                    pdf=pdf,
+                )
+                for i, offset, fpeak_ in zip(list_indices, offsets, fpeak):
+                    list_offsets[i] = float(offset)
+                    self.logger.debug(
+                        f"image #{i+1}: offset={offset}, crosscorrelation peak={fpeak_}"
                     )
+            self.logger.info(f"computed offsets: {list_offsets}")
+
+            self.logger.info("correcting vertical offsets between individual images")
+            list_a = []
+            list_b = []
+            list_pending_offsets = []
+            for i, (char, offset) in enumerate(zip(full_set, list_offsets)):
+                frame = rinput.obresult.frames[i]
+                self.logger.info(f"image {char} ({i+1} of {nimages})")
+                self.logger.info(f"image: {frame.filename}")
+                data = store.data(i)
+                base_header = store.header(i)
+                self.logger.info(f"correcting vertical offset (pixesl): {offset}")
+                base_header["HISTORY"] = f"Applying voffset_pix {offset}"
+                if save_individual_images == 0:
+                    # the offset is applied while combining the images
+                    list_pending_offsets.append(offset)
                 else:
-                    slitlet2d_blocked_smoothed = slitlet2d_blocked
-
-                # ---
-                # convert to 1D series of spatial profiles (note: this
-                # option does not work very well when the signal is low;
-                # a simple mean profile does a better job)
-                # profile = slitlet2d_blocked_smoothed.transpose().ravel()
-                # ---
-                profile = np.mean(slitlet2d_blocked_smoothed, axis=1)
-                if char == "A" and first_a:
-                    reference_profile_a = profile.copy()
-                elif char == "B" and first_b:
-                    reference_profile_b = profile.copy()
-                # ---
-                # # To write pickle file
-                # import pickle
-                # with open(frame.filename[:10] + '_profile.pkl', 'wb') as f:
-                #     pickle.dump(profile, f)
-                # # To read pickle file
-                # with open('test.pkl', 'rb') as f:
-                #     x = pickle.load(f)
-                # ---
-
-                # crosscorrelation to find offset
-                naround_zero = (nsmax - nsmin) // 3
+                    # the shifted image is kept in the store
+                    if offset != 0:
+                        data[:] = shift_rows(data, yoffset=-offset)
+                    list_pending_offsets.append(0.0)
+                    self.save_intermediate_img(
+                        store.hdulist(i),
+                        "reduced_mos_image_refined_"
+                        + char
+                        + "_"
+                        + frame.filename[:10]
+                        + ".fits",
+                    )
+
+                # store index of reduced_mos_image
                 if char == "A":
-                    reference_profile = reference_profile_a
+                    list_a.append(i)
                 elif char == "B":
-                    reference_profile = reference_profile_b
-                else:
-                    raise ValueError(f"Unexpected char value: {char}")
-                offset, fpeak = periodic_corr1d(
-                    sp_reference=reference_profile,
-                    sp_offset=profile,
-                    remove_mean=False,
-                    frac_cosbell=0.10,
-                    zero_padding=11,
-                    fminmax=None,
-                    nfit_peak=5,
-                    naround_zero=naround_zero,
-                    sp_label="spatial profile",
-                    plottitle=f"Image #{i+1} (type {char}), {frame.filename[:10]}",
-                    pdf=pdf,
-                )
-                # round to 4 decimal places
-                if abs(offset) < 1e-4:
-                    offset = 0.0  # avoid -0.0
+                    list_b.append(i)
                 else:
-                    offset = round(offset, 4)
-                list_offsets.append(offset)
-
-                # end of loop
-                if char == "A" and first_a:
-                    first_a = False
-                elif char == "B" and first_b:
-                    first_b = False
-            else:
-                list_offsets.append(0.0)
-        self.logger.info(f"computed offsets: {list_offsets}")
-
-        self.logger.info("correcting vertical offsets between individual images")
-        list_a = []
-        list_b = []
-        for i, (char, offset) in enumerate(zip(full_set, list_offsets)):
-            frame = rinput.obresult.frames[i]
-            self.logger.info(f"image {char} ({i+1} of {nimages})")
-            self.logger.info(f"image: {frame.filename}")
-            reduced_mos_image = list_reduced_mos_images[i]
-            data = reduced_mos_image[0].data
-            base_header = reduced_mos_image[0].header
-            self.logger.info(f"correcting vertical offset (pixesl): {offset}")
-            if offset != 0:
-                reduced_mos_image[0].data = shift_image2d(data, yoffset=-offset).astype(
-                    "float32"
-                )
-            base_header["HISTORY"] = f"Applying voffset_pix {offset}"
-            if save_individual_images != 0:
-                self.save_intermediate_img(
-                    reduced_mos_image,
-                    "reduced_mos_image_refined_"
-                    + char
-                    + "_"
-                    + frame.filename[:10]
-                    + ".fits",
-                )
-
-            # store reduced_mos_image
-            if char == "A":
-                list_a.append(reduced_mos_image)
-            elif char == "B":
-                list_b.append(reduced_mos_image)
-            else:
-                raise ValueError("Unexpected char value: {}".format(char))
-
-        # combination method
-        method = getattr(combine, rinput.method)
-        method_kwargs = rinput.method_kwargs
-
-        # final combination of A images
-        self.logger.info("combining individual A images")
-        reduced_mos_image_a = combine_imgs(
-            list_a,
-            method=method,
-            method_kwargs=method_kwargs,
-            errors=False,
-            prolog=None,
-        )
-        self.save_intermediate_img(reduced_mos_image_a, "reduced_mos_image_a.fits")
-
-        # final combination of B images
-        self.logger.info("combining individual B images")
-        reduced_mos_image_b = combine_imgs(
-            list_b,
-            method=method,
-            method_kwargs=method_kwargs,
-            errors=False,
-            prolog=None,
-        )
-        self.save_intermediate_img(reduced_mos_image_b, "reduced_mos_image_b.fits")
+                    raise ValueError("Unexpected char value: {}".format(char))
+
+            # combination method
+            method = getattr(combine, rinput.method)
+            method_kwargs = rinput.method_kwargs
+
+            # final combination of A images
+            self.logger.info("combining individual A images")
+            reduced_mos_image_a = combine_imgs(
+                [store.hdulist(i) for i in list_a],
+                method=shift_combine_method(
+                    method,
+                    [-list_pending_offsets[i] for i in list_a],
+                    nrows_strip=COMBINATION_NROWS_STRIP,
+                ),
+                method_kwargs=method_kwargs,
+                errors=False,
+                prolog=None,
+            )
+            self.save_intermediate_img(reduced_mos_image_a, "reduced_mos_image_a.fits")
+
+            # final combination of B images
+            self.logger.info("combining individual B images")
+            reduced_mos_image_b = combine_imgs(
+                [store.hdulist(i) for i in list_b],
+                method=shift_combine_method(
+                    method,
+                    [-list_pending_offsets[i] for i in list_b],
+                    nrows_strip=COMBINATION_NROWS_STRIP,
+                ),
+                method_kwargs=method_kwargs,
+                errors=False,
+                prolog=None,
+            )
+            self.save_intermediate_img(reduced_mos_image_b, "reduced_mos_image_b.fits")
 
         self.logger.info("mixing A and B spectra")
         header_a = reduced_mos_image_a[0].header
         header_b = reduced_mos_image_b[0].header
-        data_a = reduced_mos_image_a[0].data.astype("float32")
-        data_b = reduced_mos_image_b[0].data.astype("float32")
+        data_a = reduced_mos_image_a[0].data.astype("float32", copy=False)
+        data_b = reduced_mos_image_b[0].data.astype("float32", copy=False)
 
         reduced_mos_abba_data = data_a - data_b
 
@@ -675,10 +635,9 @@ class ABBASpectraRectwv(EmirRecipe):
 
         if voffset_pix is not None:
             self.logger.info(f"correcting vertical offset (pixesl): {voffset_pix}")
-            shifted_a_minus_b_data = shift_image2d(
-                reduced_mos_abba_data,
-                yoffset=-voffset_pix,
-            ).astype("float32")
+            shifted_a_minus_b_data = shift_rows(
+                reduced_mos_abba_data, yoffset=-voffset_pix, dtype="float32"
+            )
             reduced_mos_abba_combined_data = (
                 reduced_mos_abba_data - shifted_a_minus_b_data
             )
@@ -727,6 +686,90 @@ class ABBASpectraRectwv(EmirRecipe):
         )
         return result
 
+    def read_frames(self, rinput, list_batches, full_set, grism_name, filter_name):
+        """Read the individual images, grouped in batches.
+
+        Parameters
+        ----------
+        rinput : RecipeInput
+            Recipe input.
+        list_batches : list of lists
+            Indices of the images in each batch.
+        full_set : str
+            Full sequence of A and B images.
+        grism_name : str
+            Expected grism name.
+        filter_name : str
+            Expected filter name.
+
+        Yields
+        ------
+        list_batch : list
+            Indices of the images in the batch.
+        list_images : list of HDUList objects
+            Copies of the images, with a new UUID.
+
+        """
+        nimages = len(full_set)
+        for list_batch in list_batches:
+            list_images = []
+            for i in list_batch:
+                frame = rinput.obresult.frames[i]
+                self.logger.info(f"image {full_set[i]} ({i+1} of {nimages})")
+                self.logger.info(f"image: {frame.filename}")
+                newimg = self.datamodel.read_frame(frame)
+                base_header = newimg[0].header
+                grism_name_ = base_header["grism"]
+                if grism_name_ != grism_name:
+                    raise ValueError(
+                        "Incompatible grism name in rectwv_coeff.json file and FITS image"
+                    )
+                filter_name_ = base_header["filter"]
+                if filter_name_ != filter_name:
+                    raise ValueError(
+                        "Incompatible filter name in rectwv_coeff.json file and FITS image"
+                    )
+                hdu = newimg[0]
+                hdu.header["UUID"] = str(uuid.uuid1())
+                list_images.append(newimg)
+            yield list_batch, list_images
+
+    def reduce_rectify_frames(self, flow, list_rectwv_coeff, batch):
+        """Basic reduction, rectification and wavelength calibration.
+
+        Parameters
+        ----------
+        flow : callable
+            Reduction flow (bpm, bias, dark and flat).
+        list_rectwv_coeff : list of RectWaveCoeff instances
+            Rectification and wavelength calibration coefficients of
+            each image.
+        batch : tuple
+            Indices of the images and images, as generated by
+            read_frames. All the images must share the same
+            rectification and wavelength calibration coefficients.
+
+        Returns
+        -------
+        list_batch : list
+            Indices of the images in the batch.
+        list_rectwv_images : list of HDUList objects
+            Reduced, rectified and wavelength calibrated images.
+
+        """
+        list_batch, list_images = batch
+        list_reduced_images = []
+        for newimg in list_images:
+            # basic reduction
+            reduced_image = flow(newimg)
+            hdr = reduced_image[0].header
+            self.set_base_headers(hdr)
+            list_reduced_images.append(reduced_image)
+        list_rectwv_images = apply_rectwv_coeff_batch(
+            list_reduced_images, list_rectwv_coeff[list_batch[0]]
+        )
+        return list_batch, list_rectwv_images
+
     def create_mos_abba_image(
         self,
         rinput,
@@ -742,10 +785,11 @@ class ABBASpectraRectwv(EmirRecipe):
     ):
         with contextlib.ExitStack() as stack:
             hduls = [
-                stack.enter_context(fname.open()) for fname in rinput.obresult.frames
+                stack.enter_context(self.datamodel.open_frame(fname))
+                for fname in rinput.obresult.frames
             ]
-            # Copy the first image
-            result_img = fits.HDUList([ext.copy() for ext in hduls[0]])
+            # Copy the first image (its data are replaced)
+            result_img = self.datamodel.copy_hdulist(hduls[0])
             hdu = result_img[0]
             hdu.data = reduced_mos_abba_data
             self.set_base_headers(hdu.header)
@@ -839,7 +883,7 @@ class ABBASpectraRectwv(EmirRecipe):
         # that are provided as lists
         final_tags = []
         for frame in obsres.frames:
-            ref_img = frame.open()
+            ref_img = self.datamodel.open_frame(frame)
             tag = self.extract_tags_from_ref(ref_img, tag_keys, base=obsres.labels)
             final_tags.append(tag)
         return final_tags
@@ -878,6 +922,8 @@ class ABBASpectraFastRectwv(EmirRecipe):
     voffset_pix = Parameter(
         0.0, description="Shift (pixels) to move A into B", optional=True
     )
+    use_rectification_operator = reqs.UseRectificationOperator_Requirement()
+    rectwv_cache_dir = reqs.RectWaveCacheDir_Requirement()
 
     reduced_mos_abba = Result(prods.ProcessedMOS)
     reduced_mos_abba_combined = Result(prods.ProcessedMOS)
@@ -939,7 +985,10 @@ class ABBASpectraFastRectwv(EmirRecipe):
         ]
         with contextlib.ExitStack() as stack:
             self.logger.info("starting basic reduction of A images")
-            hduls = [stack.enter_context(fname.open()) for fname in list_a]
+            hduls = [
+                stack.enter_context(self.datamodel.open_frame(fname))
+                for fname in list_a
+            ]
             reduced_image_a = combine_imgs(
                 hduls,
                 method=method,
@@ -957,7 +1006,10 @@ class ABBASpectraFastRectwv(EmirRecipe):
         ]
         with contextlib.ExitStack() as stack:
             self.logger.info("starting basic reduction of B images")
-            hduls = [stack.enter_context(fname.open()) for fname in list_b]
+            hduls = [
+                stack.enter_context(self.datamodel.open_frame(fname))
+                for fname in list_b
+            ]
             reduced_image_b = combine_imgs(
                 hduls,
                 method=method,
@@ -976,8 +1028,8 @@ class ABBASpectraFastRectwv(EmirRecipe):
         # computation of A-B
         header_a = reduced_image_a[0].header
         header_b = reduced_image_b[0].header
-        data_a = reduced_image_a[0].data.astype("float32")
-        data_b = reduced_image_b[0].data.astype("float32")
+        data_a = reduced_image_a[0].data.astype("float32", copy=False)
+        data_b = reduced_image_b[0].data.astype("float32", copy=False)
         reduced_data = data_a - data_b
 
         # update reduced image header
@@ -998,7 +1050,12 @@ class ABBASpectraFastRectwv(EmirRecipe):
 
         # apply rectification and wavelength calibration
         self.logger.info("begin rect.+wavecal. reduction of ABBA spectra")
-        reduced_mos_abba = apply_rectwv_coeff(reduced_image, rectwv_coeff)
+        session = configure_rectwv_session(
+            use_rectification_operator=rinput.use_rectification_operator,
+            cache_dir=rinput.rectwv_cache_dir or None,
+        )
+        reduced_mos_abba = session.apply_rectwv_coeff(reduced_image, rectwv_coeff)
+        self.logger.debug(f"rect.+wavecal. session: {session.info()}")
         header_mos_abba = reduced_mos_abba[0].header
 
         # combine A and B data by shifting B on top of A
@@ -1074,11 +1131,12 @@ class ABBASpectraFastRectwv(EmirRecipe):
     ):
         with contextlib.ExitStack() as stack:
             hduls = [
-                stack.enter_context(fname.open()) for fname in rinput.obresult.frames
+                stack.enter_context(self.datamodel.open_frame(fname))
+                for fname in rinput.obresult.frames
             ]
 
-            # Copy the first image
-            result_img = fits.HDUList([ext.copy() for ext in hduls[0]])
+            # Copy the first image (its data are replaced)
+            result_img = self.datamodel.copy_hdulist(hduls[0])
             hdu = result_img[0]
             hdu.data = reduced_data
             self.set_base_headers(hdu.header)
@@ -1163,7 +1221,7 @@ class ABBASpectraFastRectwv(EmirRecipe):
         # that are provided as lists
         final_tags = []
         for frame in obsres.frames:
-            ref_img = frame.open()
+            ref_img = self.datamodel.open_frame(frame)
             tag = self.extract_tags_from_ref(ref_img, tag_keys, base=obsres.labels)
             final_tags.append(tag)
         return final_tags
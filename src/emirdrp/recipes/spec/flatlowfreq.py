@@ -20,7 +20,6 @@ import uuid
 import numina.array.combine as combine
 from numina.array.display.ximplotxy import ximplotxy
 from numina.array.display.pause_debugplot import pause_debugplot
-from numina.array.wavecalib.fix_pix_borders import fix_pix_borders
 from numina.array.wavecalib.apply_integer_offsets import apply_integer_offsets
 from numina.core import Parameter
 from numina.core import Result
@@ -31,14 +30,17 @@ from emirdrp.core.recipe import EmirRecipe
 import emirdrp.datamodel
 from emirdrp.instrument.csu_configuration import CsuConfiguration
 from emirdrp.processing.wavecal.rectwv_coeff_from_mos_library import (
-    rectwv_coeff_from_mos_library,
+    get_rectwv_coeff_from_mos_library,
 )
 from emirdrp.processing.wavecal.rectwv_coeff_to_ds9 import save_four_ds9
 from emirdrp.processing.wavecal.rectwv_coeff_to_ds9 import save_spectral_lines_ds9
 from emirdrp.processing.wavecal.slitlet2d import Slitlet2D
+from emirdrp.processing.wavecal.pix_borders import fix_pix_borders_2d
+from emirdrp.processing.wavecal.slitlet_normalization import frontier_scan_limits
+from emirdrp.processing.wavecal.slitlet_normalization import insert_slitlet
+from emirdrp.processing.wavecal.slitlet_normalization import normalize_slitlet
 import emirdrp.products as prods
 import emirdrp.requirements as reqs
-from emirdrp.tools.nscan_minmax_frontiers import nscan_minmax_frontiers
 
 from emirdrp.core import EMIR_NAXIS1
 from emirdrp.core import EMIR_NAXIS2
@@ -296,7 +298,7 @@ class SpecFlatLowFreq(EmirRecipe):
 
         # define rectification and wavelength calibration coefficients
         if rinput.rectwv_coeff is None:
-            rectwv_coeff = rectwv_coeff_from_mos_library(
+            rectwv_coeff = get_rectwv_coeff_from_mos_library(
                 reduced_image, rinput.master_rectwv
             )
             # set global offsets
@@ -441,25 +443,20 @@ class SpecFlatLowFreq(EmirRecipe):
                     subtitle="unrectified, filled with median spectrum " "(clipped)",
                 )
                 # normalize initial slitlet image (avoid division by zero)
-                slitlet2d_norm_clipped = np.zeros_like(slitlet2d)
-                for j in range(naxis1_slitlet2d):
-                    for i in range(naxis2_slitlet2d):
-                        den = slitlet2d_unrect_clipped[i, j]
-                        if den == 0:
-                            slitlet2d_norm_clipped[i, j] = 1.0
-                        else:
-                            slitlet2d_norm_clipped[i, j] = slitlet2d[i, j] / den
+                slitlet2d_norm_clipped = normalize_slitlet(
+                    slitlet2d, slitlet2d_unrect_clipped, default=1.0
+                )
                 # set to 1.0 one additional pixel at each side (since
                 # 'den' above is small at the borders and generates wrong
                 # bright pixels)
-                slitlet2d_norm_clipped = fix_pix_borders(
+                slitlet2d_norm_clipped = fix_pix_borders_2d(
                     image2d=slitlet2d_norm_clipped,
                     nreplace=1,
                     sought_value=1.0,
                     replacement_value=1.0,
                 )
                 slitlet2d_norm_clipped = slitlet2d_norm_clipped.transpose()
-                slitlet2d_norm_clipped = fix_pix_borders(
+                slitlet2d_norm_clipped = fix_pix_borders_2d(
                     image2d=slitlet2d_norm_clipped,
                     nreplace=1,
                     sought_value=1.0,
@@ -496,27 +493,19 @@ class SpecFlatLowFreq(EmirRecipe):
                 else:
                     same_slitlet_above = False
 
-                for j in range(EMIR_NAXIS1):
-                    xchannel = j + 1
-                    y0_lower = slt.list_frontiers[0](xchannel)
-                    y0_upper = slt.list_frontiers[1](xchannel)
-                    n1, n2 = nscan_minmax_frontiers(
-                        y0_frontier_lower=y0_lower,
-                        y0_frontier_upper=y0_upper,
-                        resize=True,
-                    )
-                    # note that n1 and n2 are scans (ranging from 1 to NAXIS2)
-                    nn1 = n1 - slt.bb_ns1_orig + 1
-                    nn2 = n2 - slt.bb_ns1_orig + 1
-                    image2d_flatfielded[(n1 - 1) : n2, j] = slitlet2d_norm_smooth[
-                        (nn1 - 1) : nn2, j
-                    ]
-
+                # note that n1 and n2 are scans (ranging from 1 to NAXIS2)
+                n1, n2 = frontier_scan_limits(slt.list_frontiers)
+                insert_slitlet(
+                    image2d_flatfielded,
+                    slitlet2d_norm_smooth,
+                    slt.bb_ns1_orig,
+                    n1,
+                    n2,
                     # force to 1.0 region around frontiers
-                    if not same_slitlet_below:
-                        image2d_flatfielded[(n1 - 1) : (n1 + 2), j] = 1
-                    if not same_slitlet_above:
-                        image2d_flatfielded[(n2 - 5) : n2, j] = 1
+                    force_lower=not same_slitlet_below,
+                    force_upper=not same_slitlet_above,
+                    force_value=1,
+                )
                 cout += "."
             else:
                 cout += "i"
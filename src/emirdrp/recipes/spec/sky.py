@@ -12,7 +12,6 @@
 Spectroscopy mode, Stare Spectra
 """
 
-
 from numina.core import Result
 from numina.array.combine import median
 from numina.processing.combine import basic_processing_with_combination
@@ -20,10 +19,7 @@ from numina.processing.combine import basic_processing_with_combination
 from emirdrp.core.recipe import EmirRecipe
 import emirdrp.requirements as reqs
 import emirdrp.products as prods
-from emirdrp.processing.wavecal.apply_rectwv_coeff import apply_rectwv_coeff
-from emirdrp.processing.wavecal.rectwv_coeff_from_mos_library import (
-    rectwv_coeff_from_mos_library,
-)
+from emirdrp.processing.wavecal.rectwv_session import configure_rectwv_session
 from emirdrp.processing.wavecal.rectwv_coeff_to_ds9 import save_four_ds9
 
 
@@ -36,6 +32,8 @@ class SkySpecRecipe(EmirRecipe):
     master_dark = reqs.MasterDarkRequirement()
     master_flat = reqs.MasterSpectralFlatFieldRequirement()
     master_rectwv = reqs.MasterRectWaveRequirement()
+    use_rectification_operator = reqs.UseRectificationOperator_Requirement()
+    rectwv_cache_dir = reqs.RectWaveCacheDir_Requirement()
     skyspec = Result(prods.SkySpectrum)
     reduced_image = Result(prods.ProcessedMOS)
 
@@ -56,7 +54,13 @@ class SkySpecRecipe(EmirRecipe):
 
         # RectWaveCoeff object with rectification and wavelength calibration
         # coefficients for the particular CSU configuration
-        rectwv_coeff = rectwv_coeff_from_mos_library(
+        # coefficients shared with the other
+        # recipes of the session using the same configuration
+        session = configure_rectwv_session(
+            use_rectification_operator=rinput.use_rectification_operator,
+            cache_dir=rinput.rectwv_cache_dir or None,
+        )
+        rectwv_coeff = session.rectwv_coeff_from_mos_library(
             reduced_image, rinput.master_rectwv
         )
         # save as JSON file in work directory
@@ -67,7 +71,8 @@ class SkySpecRecipe(EmirRecipe):
             save_four_ds9(rectwv_coeff)
 
         # apply rectification and wavelength calibration
-        skyspec = apply_rectwv_coeff(reduced_image, rectwv_coeff)
+        skyspec = session.apply_rectwv_coeff(reduced_image, rectwv_coeff)
+        self.logger.debug(f"rect.+wavecal. session: {session.info()}")
 
         self.logger.info("end sky spectral reduction")
 
@@ -34,8 +34,9 @@ from emirdrp.processing.wavecal.median_slitlets_rectified import (
     median_slitlets_rectified,
 )
 from emirdrp.processing.wavecal.rectwv_coeff_from_mos_library import (
-    rectwv_coeff_from_mos_library,
+    get_rectwv_coeff_from_mos_library,
 )
+from emirdrp.processing.wavecal.rectwv_session import configure_rectwv_session
 from emirdrp.processing.wavecal.retrieve_catlines import retrieve_catlines
 from emirdrp.processing.wavecal.synthetic_lines_rawdata import synthetic_lines_rawdata
 from emirdrp.processing.wavecal.rectwv_coeff_to_ds9 import save_four_ds9
@@ -124,7 +125,7 @@ class StareSpectraWaveRecipe(EmirRecipe):
         if rinput.master_rectwv:
             # RectWaveCoeff object with rectification and wavelength
             # calibration coefficients for the particular CSU configuration
-            rectwv_coeff = rectwv_coeff_from_mos_library(
+            rectwv_coeff = get_rectwv_coeff_from_mos_library(
                 reduced_image, rinput.master_rectwv
             )
 
@@ -301,7 +302,7 @@ class GenerateRectwvCoeff(EmirRecipe):
 
         # RectWaveCoeff object with rectification and wavelength
         # calibration coefficients for the particular CSU configuration
-        rectwv_coeff = rectwv_coeff_from_mos_library(
+        rectwv_coeff = get_rectwv_coeff_from_mos_library(
             reduced_image, rinput.master_rectwv
         )
 
@@ -495,6 +496,8 @@ class StareSpectraRectwv(EmirRecipe):
     master_dark = reqs.MasterDarkRequirement()
     master_flat = reqs.MasterSpectralFlatFieldRequirement()
     rectwv_coeff = reqs.RectWaveCoeffRequirement()
+    use_rectification_operator = reqs.UseRectificationOperator_Requirement()
+    rectwv_cache_dir = reqs.RectWaveCacheDir_Requirement()
 
     reduced_mos = Result(prods.ProcessedMOS)
 
@@ -517,8 +520,14 @@ class StareSpectraRectwv(EmirRecipe):
         # save intermediate image in work directory
         self.save_intermediate_img(reduced_image, "reduced_image.fits")
 
-        # apply rectification and wavelength calibration
-        reduced_mos = apply_rectwv_coeff(reduced_image, rinput.rectwv_coeff)
+        # apply rectification and wavelength calibration (through the
+        # session shared with the other recipes)
+        session = configure_rectwv_session(
+            use_rectification_operator=rinput.use_rectification_operator,
+            cache_dir=rinput.rectwv_cache_dir or None,
+        )
+        reduced_mos = session.apply_rectwv_coeff(reduced_image, rinput.rectwv_coeff)
+        self.logger.debug(f"rect.+wavecal. session: {session.info()}")
 
         # ds9 region files (to be saved in the work directory)
         if self.intermediate_results:
@@ -27,16 +27,19 @@ import numina.core
 import numina.exceptions
 import numina.core.query as qmod
 import numina.ext.gtc
-from numina.array import combine
 from numina.core import Result, Requirement
 from numina.exceptions import RecipeError
 from numina.core.requirements import ObservationResultRequirement
-from numina.frame.utils import copy_img
 
 import emirdrp.datamodel
 import emirdrp.decorators
 import emirdrp.products as prods
 from emirdrp.core.recipe import EmirRecipe
+from emirdrp.processing.accumulator import ACCUM_KEYWORD
+from emirdrp.processing.accumulator import dataframe_uuid
+from emirdrp.processing.accumulator import find_accumulator
+from emirdrp.processing.accumulator import register_accumulator
+from emirdrp.processing.accumulator import restore_accumulator
 from emirdrp.processing.combine import basic_processing
 
 
@@ -153,11 +156,11 @@ class BaseABBARecipe(EmirRecipe):
     def process_abba(self, images):
         """Process four images in ABBA mode"""
         # FIXME: Duplicated in processing
-        dataA0 = images[0][0].data.astype("float32")
-        dataB0 = images[1][0].data.astype("float32")
+        dataA0 = images[0][0].data.astype("float32", copy=False)
+        dataB0 = images[1][0].data.astype("float32", copy=False)
 
-        dataB1 = images[2][0].data.astype("float32")
-        dataA1 = images[3][0].data.astype("float32")
+        dataB1 = images[2][0].data.astype("float32", copy=False)
+        dataA1 = images[3][0].data.astype("float32", copy=False)
 
         dataAB0 = dataA0 - dataB0
         dataAB1 = dataA1 - dataB1
@@ -179,7 +182,7 @@ class BaseABBARecipe(EmirRecipe):
 
     def create_proc_hdulist(self, cdata, data_array):
         # Copy header of first image
-        result = copy_img(cdata[0])
+        result = self.datamodel.copy_hdulist(cdata[0])
 
         hdu = result[0]
         hdu.data = data_array
@@ -195,7 +198,7 @@ class BaseABBARecipe(EmirRecipe):
         self, cdata, data_array_n, method_name="unkwnow", use_errors=False
     ):
         # FIXME: duplicated
-        result = copy_img(cdata[0])
+        result = self.datamodel.copy_hdulist(cdata[0])
         hdu = result[0]
         hdu.data = data_array_n[0]
         hdr = hdu.header
@@ -256,50 +259,51 @@ class BaseABBARecipe(EmirRecipe):
         return self.aggregate2(accum, frame, naccum)
 
     def aggregate2(self, img1, img2, naccum):
-
-        frames = [img1, img2]
-        # use_errors = True
-        # Initial checks
-        fframe = frames[0]
-        # Ref image
-        img = fframe.open()
-        has_num_ext = "NUM" in img
-        has_bpm_ext = "BPM" in img
-        # base_header = img[0].header
-        baseshape = img[0].shape
-
-        data_hdul = []
-        for f in frames:
-            img = f.open()
-            data_hdul.append(img)
-
-        if has_num_ext:
-            self.logger.debug("Using NUM extension")
-            masks = [
-                numpy.where(m["NUM"].data, 0, 1).astype("uint8") for m in data_hdul
-            ]
-        elif has_bpm_ext:
-            self.logger.debug("Using BPM extension")
-            masks = [m["BPM"].data for m in data_hdul]
+        """Add a new frame to the accumulated result of previous rounds"""
+
+        # the accumulator is registered again when the result is built
+        accumulator = find_accumulator(dataframe_uuid(img1), remove=True)
+        if accumulator is None:
+            self.logger.debug("initialize accumulator from accumulated image")
+            accum_hdul = self.datamodel.open_frame(img1)
+            accumulator = restore_accumulator(
+                accum_hdul, naccum, mask=self.accum_mask(accum_hdul)
+            )
         else:
-            self.logger.warning("BPM missing, use zeros instead")
-            false_mask = numpy.zeros(baseshape, dtype="int16")
-            masks = [false_mask for _ in data_hdul]
+            self.logger.debug("using accumulator of previous round")
 
+        frame_hdul = self.datamodel.open_frame(img2)
         self.logger.info("Combine target images (final, aggregate)")
-
-        weight_accum = 2 * (1 - 1.0 / naccum)
-        weight_frame = 2.0 / naccum
-        self.logger.debug(
-            "weights for 'accum' and 'frame', %s", [weight_accum, weight_frame]
-        )
-        scales = [1.0 / weight_accum, 1.0 / weight_frame]
-        method = combine.mean
-        data_arr = [hdul[0].data for hdul in data_hdul]
-        out = method(data_arr, masks=masks, scales=scales, dtype="float32")
+        accumulator.add(frame_hdul[0].data, mask=self.accum_mask(frame_hdul))
 
         self.logger.debug("create result image")
-
-        return self.create_accum_hdulist(
-            data_hdul, out, method_name=method.__name__, use_errors=False
+        accum_hdul = fits.HDUList([fits.PrimaryHDU(header=accumulator.header)])
+        result = self.create_accum_hdulist(
+            [accum_hdul, frame_hdul],
+            [
+                accumulator.mean.astype("float32"),
+                accumulator.variance().astype("float32"),
+                accumulator.count.astype("int16"),
+            ],
+            method_name="mean",
+            use_errors=True,
         )
+        result[0].header[ACCUM_KEYWORD] = (naccum, "Number of accumulated rounds")
+        # keep the values stored in the result, so that the next round
+        # does not depend on whether this accumulator is still alive
+        accumulator.load(result[0].data, result["MAP"].data, result["VARIANCE"].data)
+        accumulator.header = result[0].header.copy()
+        register_accumulator(result[0].header["UUID"], accumulator)
+        return result
+
+    def accum_mask(self, hdul):
+        """Mask of an image to be accumulated (nonzero values are masked)"""
+        if "NUM" in hdul:
+            self.logger.debug("Using NUM extension")
+            return numpy.where(hdul["NUM"].data, 0, 1).astype("uint8")
+        elif "BPM" in hdul:
+            self.logger.debug("Using BPM extension")
+            return hdul["BPM"].data
+        else:
+            self.logger.warning("BPM missing, use zeros instead")
+            return None
@@ -129,6 +129,26 @@ class SkyImageSepTime_Requirement(Parameter):
         )
 
 
+class UseRectificationOperator_Requirement(Parameter):
+    def __init__(self):
+        super(UseRectificationOperator_Requirement, self).__init__(
+            False,
+            "Rectify with the sparse rectification operators kept by the "
+            "rect.+wavecal. session (worth it when many frames share the "
+            "same configuration)",
+        )
+
+
+class RectWaveCacheDir_Requirement(Parameter):
+    def __init__(self):
+        super(RectWaveCacheDir_Requirement, self).__init__(
+            "",
+            "Directory where the rect.+wavecal. coefficients and "
+            "rectification operators are stored between runs (if empty, "
+            "they are only kept in memory)",
+        )
+
+
 class Catalog_Requirement(Parameter):
     def __init__(self, optional=True):
         super(Catalog_Requirement, self).__init__(
@@ -0,0 +1,128 @@
+#
+# Copyright 2024 Universidad Complutense de Madrid
+#
+# This file is part of PyEmir
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+# License-Filename: LICENSE.txt
+#
+
+"""Synthetic rectification and wavelength calibration coefficients"""
+
+import astropy.io.fits as fits
+import numpy
+
+import emirdrp.products as prods
+from emirdrp.core import EMIR_NAXIS1
+from emirdrp.core import EMIR_NAXIS2
+from emirdrp.core import EMIR_NBARS
+from emirdrp.core import EMIR_NPIXPERSLIT_RECTIFIED
+from emirdrp.instrument.components.dtu import DtuConf
+from emirdrp.processing.wavecal.set_wv_parameters import set_wv_parameters
+from emirdrp.testing.create_headers import create_dtu_header_example
+
+
+def create_rectwv_coeff(
+    filter_name="H",
+    grism_name="H",
+    missing_slitlets=None,
+    offx=0.1,
+    offy=0.3,
+    nc2=EMIR_NAXIS1,
+):
+    """Create a RectWaveCoeff with a simple shift-like distortion.
+
+    Each slitlet occupies a band of rows of the detector. The rectification
+    transformation is a constant fractional shift (offx, offy) and the
+    wavelength calibration polynomial is linear, with the nominal
+    parameters of the grism + filter combination.
+    """
+    if missing_slitlets is None:
+        missing_slitlets = []
+
+    wv_parameters = set_wv_parameters(filter_name, grism_name)
+    dtu_conf = DtuConf.from_header(create_dtu_header_example())
+
+    rectwv_coeff = prods.RectWaveCoeff(instrument="EMIR")
+    rectwv_coeff.tags["grism"] = grism_name
+    rectwv_coeff.tags["filter"] = filter_name
+    rectwv_coeff.meta_info["origin"]["bound_param"] = (
+        "uuid" + "a5e2f6b4-2d63-11ef-9c28-3c7c3f1b4ad0"
+    )
+    rectwv_coeff.meta_info["dtu_configuration"] = dtu_conf.outdict()
+    rectwv_coeff.total_slitlets = EMIR_NBARS
+    rectwv_coeff.missing_slitlets = list(missing_slitlets)
+
+    npix = EMIR_NPIXPERSLIT_RECTIFIED - 1
+    for islitlet in range(1, EMIR_NBARS + 1):
+        bb_ns1_orig = max(1, (islitlet - 1) * npix - 1)
+        bb_ns2_orig = min(EMIR_NAXIS2, bb_ns1_orig + npix + 4)
+        y0_lower = bb_ns1_orig + 2.0
+        y0_upper = y0_lower + npix
+        crval1_linear = wv_parameters["poly_crval1_linear"](islitlet)
+        cdelt1_linear = wv_parameters["poly_cdelt1_linear"](islitlet)
+        content = {
+            "islitlet": islitlet,
+            "csu_bar_left": 150.0,
+            "csu_bar_right": 151.0,
+            "csu_bar_slit_center": 150.5,
+            "csu_bar_slit_width": 1.0,
+            "bb_nc1_orig": 1,
+            "bb_nc2_orig": nc2,
+            "bb_ns1_orig": bb_ns1_orig,
+            "bb_ns2_orig": bb_ns2_orig,
+            "x0_reference": float(EMIR_NAXIS1) / 2.0 + 0.5,
+            "spectrail": {
+                "poly_coef_lower": [y0_lower],
+                "poly_coef_middle": [(y0_lower + y0_upper) / 2],
+                "poly_coef_upper": [y0_upper],
+            },
+            "frontier": {
+                "poly_coef_lower": [y0_lower - 0.5],
+                "poly_coef_upper": [y0_upper + 0.5],
+            },
+            "y0_reference_lower": y0_lower,
+            "y0_reference_middle": (y0_lower + y0_upper) / 2,
+            "y0_reference_upper": y0_upper,
+            "y0_frontier_lower": y0_lower - 0.5,
+            "y0_frontier_upper": y0_upper + 0.5,
+            "y0_frontier_lower_expected": y0_lower - 0.5,
+            "y0_frontier_upper_expected": y0_upper + 0.5,
+            "corr_yrect_a": 0.0,
+            "corr_yrect_b": 1.0,
+            "min_row_rectified": 1,
+            "max_row_rectified": 1 + npix,
+            "ttd_order": 1,
+            "ttd_aij": [offx, 1.0, 0.0],
+            "ttd_bij": [offy, 0.0, 1.0],
+            "tti_aij": [-offx, 1.0, 0.0],
+            "tti_bij": [-offy, 0.0, 1.0],
+            "wpoly_coeff": [crval1_linear - cdelt1_linear, cdelt1_linear],
+            "crval1_linear": crval1_linear,
+            "cdelt1_linear": cdelt1_linear,
+        }
+        if islitlet in missing_slitlets:
+            content = {
+                "islitlet": islitlet,
+                "csu_bar_left": 150.0,
+                "csu_bar_right": 151.0,
+                "csu_bar_slit_center": 150.5,
+                "csu_bar_slit_width": 1.0,
+            }
+        rectwv_coeff.contents.append(content)
+
+    return rectwv_coeff
+
+
+def create_mos_image(filter_name="H", grism_name="H", seed=291):
+    """Create a raw-like MOS image with the header keywords expected"""
+    rng = numpy.random.default_rng(seed)
+    data = rng.normal(100.0, 5.0, size=(EMIR_NAXIS2, EMIR_NAXIS1))
+    # a few bright spectra along the rows
+    data[::37, :] += 1000.0
+    hdu = fits.PrimaryHDU(data.astype("float32"))
+    hdu.header["FILTER"] = filter_name
+    hdu.header["GRISM"] = grism_name
+    for key, value in create_dtu_header_example().items():
+        hdu.header[key] = value
+    return fits.HDUList([hdu])
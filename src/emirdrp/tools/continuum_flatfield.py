@@ -22,6 +22,10 @@ from numina.tools.arg_file_is_new import arg_file_is_new
 
 from emirdrp.processing.wavecal.slitlet2d import Slitlet2D
 from emirdrp.processing.wavecal.set_wv_parameters import set_wv_parameters
+from emirdrp.processing.wavecal.slitlet_normalization import frontier_scan_limits
+from emirdrp.processing.wavecal.slitlet_normalization import insert_slitlet
+from emirdrp.processing.wavecal.slitlet_normalization import normalize_slitlet
+from emirdrp.processing.wavecal.slitlet_normalization import scale_rows
 from emirdrp.instrument.components.dtu import DtuConf
 from emirdrp.instrument.csu_configuration import CsuConfiguration
 from emirdrp.tools.nscan_minmax_frontiers import nscan_minmax_frontiers
@@ -421,11 +425,9 @@ def main(args=None):
             sp_median_longslit = np.median(
                 image2d_sp_median_eq[(imin - 1) : imax, :], axis=0
             )
-            for i in range(imin, imax + 1):
-                print("----> i: ", i)
-                image2d_sp_median_longslit[(i - 1), :] = (
-                    sp_median_longslit * ycut_median[i - 1]
-                )
+            image2d_sp_median_longslit[(imin - 1) : imax, :] = scale_rows(
+                sp_median_longslit, ycut_median[(imin - 1) : imax]
+            )
             islitlet = imax
         else:
             print("--> ignoring: ", islitlet)
@@ -481,14 +483,9 @@ def main(args=None):
             )
 
             # normalize initial slitlet image (avoid division by zero)
-            slitlet2d_norm = np.zeros_like(slitlet2d)
-            for j in range(naxis1_slitlet2d):
-                for i in range(naxis2_slitlet2d):
-                    den = slitlet2d_unrect_spmedian[i, j]
-                    if den == 0:
-                        slitlet2d_norm[i, j] = 1.0
-                    else:
-                        slitlet2d_norm[i, j] = slitlet2d[i, j] / den
+            slitlet2d_norm = normalize_slitlet(
+                slitlet2d, slitlet2d_unrect_spmedian, default=1.0
+            )
 
             if abs(args.debugplot) > 10:
                 slt.ximshow_unrectified(
@@ -535,25 +532,19 @@ def main(args=None):
             else:
                 same_slitlet_above = False
 
-            for j in range(EMIR_NAXIS1):
-                xchannel = j + 1
-                y0_lower = slt.list_frontiers[0](xchannel)
-                y0_upper = slt.list_frontiers[1](xchannel)
-                n1, n2 = nscan_minmax_frontiers(
-                    y0_frontier_lower=y0_lower, y0_frontier_upper=y0_upper, resize=True
-                )
-                # note that n1 and n2 are scans (ranging from 1 to NAXIS2)
-                nn1 = n1 - slt.bb_ns1_orig + 1
-                nn2 = n2 - slt.bb_ns1_orig + 1
-                image2d_flatfielded[(n1 - 1) : n2, j] = slitlet2d_norm[
-                    (nn1 - 1) : nn2, j
-                ]
-
+            # note that n1 and n2 are scans (ranging from 1 to NAXIS2)
+            n1, n2 = frontier_scan_limits(slt.list_frontiers)
+            insert_slitlet(
+                image2d_flatfielded,
+                slitlet2d_norm,
+                slt.bb_ns1_orig,
+                n1,
+                n2,
                 # force to 1.0 region around frontiers
-                if not same_slitlet_below:
-                    image2d_flatfielded[(n1 - 1) : (n1 + 2), j] = 1
-                if not same_slitlet_above:
-                    image2d_flatfielded[(n2 - 5) : n2, j] = 1
+                force_lower=not same_slitlet_below,
+                force_upper=not same_slitlet_above,
+                force_value=1,
+            )
         else:
             if args.debugplot == 0:
                 islitlet_progress(islitlet, EMIR_NBARS, ignore=True)
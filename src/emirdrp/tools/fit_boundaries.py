@@ -25,6 +25,9 @@ from numina.array.display.pause_debugplot import pause_debugplot
 from numina.array.display.ximshow import ximshow
 
 import emirdrp.instrument.components.dtu
+from emirdrp.processing.wavecal.slitlet_geometry import ds9_polylines
+from emirdrp.processing.wavecal.slitlet_geometry import eval_polynomials
+from emirdrp.processing.wavecal.slitlet_geometry import plot_polylines
 from emirdrp.core import EMIR_NBARS
 
 from emirdrp.core import EMIR_NAXIS1
@@ -583,6 +586,70 @@ def expected_distorted_frontiers(
     return list_frontiers
 
 
+def expected_limits_polynomials(
+    params, parmodel, list_islitlet, list_csu_bar_slit_center, limits
+):
+    """Return the expected lower and upper limits of a set of slitlets.
+
+    Parameters
+    ----------
+    params : :class:`~lmfit.parameter.Parameters`
+        Parameters to be employed in the prediction of the distorted
+        boundaries.
+    parmodel : str
+        Model to be assumed. Allowed values are 'longslit' and
+        'multislit'.
+    list_islitlet : list of integers
+        Slitlet numbers to be considered.
+    list_csu_bar_slit_center : list of floats
+        CSU bar slit centers of the considered slitlets.
+    limits : str
+        Limits to be computed: 'boundaries' or 'frontiers'.
+
+    Returns
+    -------
+    list_pol_lower : python list
+        List of numpy.polynomial.Polynomial instances with the lower
+        limits of the requested slitlets.
+    list_pol_upper : python list
+        List of numpy.polynomial.Polynomial instances with the upper
+        limits of the requested slitlets.
+
+    """
+
+    if limits not in ["boundaries", "frontiers"]:
+        raise ValueError("Unexpected limits=" + str(limits))
+
+    list_pol_lower = []
+    list_pol_upper = []
+    for islitlet, csu_bar_slit_center in zip(list_islitlet, list_csu_bar_slit_center):
+        if limits == "boundaries":
+            list_spectrails = expected_distorted_boundaries(
+                islitlet,
+                csu_bar_slit_center,
+                [0, 1],
+                params,
+                parmodel,
+                numpts=101,
+                deg=5,
+                debugplot=0,
+            )
+        else:
+            list_spectrails = expected_distorted_frontiers(
+                islitlet,
+                csu_bar_slit_center,
+                params,
+                parmodel,
+                numpts=101,
+                deg=5,
+                debugplot=0,
+            )
+        list_pol_lower.append(list_spectrails[0].poly_funct)
+        list_pol_upper.append(list_spectrails[1].poly_funct)
+
+    return list_pol_lower, list_pol_upper
+
+
 def fun_residuals(
     params,
     parmodel,
@@ -799,55 +866,37 @@ def overplot_boundaries_from_params(
     xoff = float(global_offset_x_pix)
     yoff = float(global_offset_y_pix)
 
-    list_pol_lower_boundaries = []
-    list_pol_upper_boundaries = []
-    for islitlet, csu_bar_slit_center in zip(list_islitlet, list_csu_bar_slit_center):
-        tmpcolor = micolors[islitlet % 2]
-        pol_lower_expected = expected_distorted_boundaries(
-            islitlet,
-            csu_bar_slit_center,
-            [0],
-            params,
-            parmodel,
-            numpts=101,
-            deg=5,
-            debugplot=0,
-        )[0].poly_funct
-        list_pol_lower_boundaries.append(pol_lower_expected)
-        pol_upper_expected = expected_distorted_boundaries(
-            islitlet,
-            csu_bar_slit_center,
-            [1],
-            params,
-            parmodel,
-            numpts=101,
-            deg=5,
-            debugplot=0,
-        )[0].poly_funct
-        list_pol_upper_boundaries.append(pol_upper_expected)
-
-        if ax is not None:
-            xdum = np.linspace(1, EMIR_NAXIS1, num=EMIR_NAXIS1)
-            ydum1 = pol_lower_expected(xdum)
-            ax.plot(xdum + xoff, ydum1 + yoff, tmpcolor + linetype)
-            ydum2 = pol_upper_expected(xdum)
-            ax.plot(xdum + xoff, ydum2 + yoff, tmpcolor + linetype)
+    list_pol_lower_boundaries, list_pol_upper_boundaries = expected_limits_polynomials(
+        params, parmodel, list_islitlet, list_csu_bar_slit_center, "boundaries"
+    )
+
+    if ax is not None:
+        list_tmpcolor = [micolors[islitlet % 2] for islitlet in list_islitlet]
+        xdum = np.linspace(1, EMIR_NAXIS1, num=EMIR_NAXIS1)
+        ydum1 = eval_polynomials(list_pol_lower_boundaries, xdum)
+        plot_polylines(ax, xdum + xoff, ydum1 + yoff, list_tmpcolor, linetype)
+        ydum2 = eval_polynomials(list_pol_upper_boundaries, xdum)
+        plot_polylines(ax, xdum + xoff, ydum2 + yoff, list_tmpcolor, linetype)
+        # slitlet labels
+        yc_lower = eval_polynomials(list_pol_lower_boundaries, EMIR_NAXIS1 / 2 + 0.5)
+        yc_upper = eval_polynomials(list_pol_upper_boundaries, EMIR_NAXIS1 / 2 + 0.5)
+        for k, (islitlet, csu_bar_slit_center) in enumerate(
+            zip(list_islitlet, list_csu_bar_slit_center)
+        ):
+            tmpcolor = list_tmpcolor[k]
             if alpha_fill is not None:
                 ax.fill_between(
                     xdum + xoff,
-                    ydum1 + yoff,
-                    ydum2 + yoff,
+                    ydum1[k] + yoff,
+                    ydum2[k] + yoff,
                     facecolor=tmpcolor,
                     alpha=alpha_fill,
                 )
             if labels:
-                # slitlet label
-                yc_lower = pol_lower_expected(EMIR_NAXIS1 / 2 + 0.5)
-                yc_upper = pol_upper_expected(EMIR_NAXIS1 / 2 + 0.5)
                 xcsu = EMIR_NAXIS1 * csu_bar_slit_center / fov
                 ax.text(
                     xcsu + xoff,
-                    (yc_lower + yc_upper) / 2 + yoff,
+                    (yc_lower[k] + yc_upper[k]) / 2 + yoff,
                     str(islitlet),
                     fontsize=10,
                     va="center",
@@ -927,45 +976,37 @@ def overplot_frontiers_from_params(
     xoff = float(global_offset_x_pix)
     yoff = float(global_offset_y_pix)
 
-    list_pol_lower_frontiers = []
-    list_pol_upper_frontiers = []
-    for islitlet, csu_bar_slit_center in zip(list_islitlet, list_csu_bar_slit_center):
-        tmpcolor = micolors[islitlet % 2]
-        list_expected_frontiers = expected_distorted_frontiers(
-            islitlet,
-            csu_bar_slit_center,
-            params,
-            parmodel,
-            numpts=101,
-            deg=5,
-            debugplot=0,
-        )
-        pol_lower_expected = list_expected_frontiers[0].poly_funct
-        list_pol_lower_frontiers.append(pol_lower_expected)
-        pol_upper_expected = list_expected_frontiers[1].poly_funct
-        list_pol_upper_frontiers.append(pol_upper_expected)
-        if ax is not None:
-            xdum = np.linspace(1, EMIR_NAXIS1, num=EMIR_NAXIS1)
-            ydum1 = pol_lower_expected(xdum)
-            ax.plot(xdum + xoff, ydum1 + yoff, tmpcolor + linetype)
-            ydum2 = pol_upper_expected(xdum)
-            ax.plot(xdum + xoff, ydum2 + yoff, tmpcolor + linetype)
+    list_pol_lower_frontiers, list_pol_upper_frontiers = expected_limits_polynomials(
+        params, parmodel, list_islitlet, list_csu_bar_slit_center, "frontiers"
+    )
+
+    if ax is not None:
+        list_tmpcolor = [micolors[islitlet % 2] for islitlet in list_islitlet]
+        xdum = np.linspace(1, EMIR_NAXIS1, num=EMIR_NAXIS1)
+        ydum1 = eval_polynomials(list_pol_lower_frontiers, xdum)
+        plot_polylines(ax, xdum + xoff, ydum1 + yoff, list_tmpcolor, linetype)
+        ydum2 = eval_polynomials(list_pol_upper_frontiers, xdum)
+        plot_polylines(ax, xdum + xoff, ydum2 + yoff, list_tmpcolor, linetype)
+        # slitlet labels
+        yc_lower = eval_polynomials(list_pol_lower_frontiers, EMIR_NAXIS1 / 2 + 0.5)
+        yc_upper = eval_polynomials(list_pol_upper_frontiers, EMIR_NAXIS1 / 2 + 0.5)
+        for k, (islitlet, csu_bar_slit_center) in enumerate(
+            zip(list_islitlet, list_csu_bar_slit_center)
+        ):
+            tmpcolor = list_tmpcolor[k]
             if alpha_fill is not None:
                 ax.fill_between(
                     xdum + xoff,
-                    ydum1 + yoff,
-                    ydum2 + yoff,
+                    ydum1[k] + yoff,
+                    ydum2[k] + yoff,
                     facecolor=tmpcolor,
                     alpha=alpha_fill,
                 )
             if labels:
-                # slitlet label
-                yc_lower = pol_lower_expected(EMIR_NAXIS1 / 2 + 0.5)
-                yc_upper = pol_upper_expected(EMIR_NAXIS1 / 2 + 0.5)
                 xcsu = EMIR_NAXIS1 * csu_bar_slit_center / fov
                 ax.text(
                     xcsu + xoff,
-                    (yc_lower + yc_upper) / 2 + yoff,
+                    (yc_lower[k] + yc_upper[k]) / 2 + yoff,
                     str(islitlet),
                     fontsize=10,
                     va="center",
@@ -1153,66 +1194,44 @@ def save_boundaries_from_params_ds9(
             parvalue = params[dumpar].value
             ds9_file.write("# {0}: {1}\n".format(dumpar, parvalue))
 
-    for islitlet, csu_bar_slit_center in zip(list_islitlet, list_csu_bar_slit_center):
+    list_pol_lower, list_pol_upper = expected_limits_polynomials(
+        params, parmodel, list_islitlet, list_csu_bar_slit_center, "boundaries"
+    )
+
+    list_colorbox = []
+    for islitlet in list_islitlet:
         if islitlet % 2 == 0:
             colorbox = "#ff00ff"  # '#ff77ff'
         else:
             colorbox = "#00ffff"  # '#4444ff'
+        list_colorbox.append(colorbox)
 
+    # evaluate the limits of all the slitlets at once
+    xdum = np.linspace(1, EMIR_NAXIS1, num=numpix)
+    list_ds9_lower = ds9_polylines(
+        xdum + xoff, eval_polynomials(list_pol_lower, xdum) + yoff, list_colorbox
+    )
+    list_ds9_upper = ds9_polylines(
+        xdum + xoff, eval_polynomials(list_pol_upper, xdum) + yoff, list_colorbox
+    )
+    yc_lower = eval_polynomials(list_pol_lower, EMIR_NAXIS1 / 2 + 0.5)
+    yc_upper = eval_polynomials(list_pol_upper, EMIR_NAXIS1 / 2 + 0.5)
+
+    for k, (islitlet, csu_bar_slit_center) in enumerate(
+        zip(list_islitlet, list_csu_bar_slit_center)
+    ):
+        colorbox = list_colorbox[k]
         ds9_file.write("#\n# islitlet...........: {0}\n".format(islitlet))
         ds9_file.write("# csu_bar_slit_center: {0}\n".format(csu_bar_slit_center))
-        pol_lower_expected = expected_distorted_boundaries(
-            islitlet,
-            csu_bar_slit_center,
-            [0],
-            params,
-            parmodel,
-            numpts=101,
-            deg=5,
-            debugplot=0,
-        )[0].poly_funct
-        pol_upper_expected = expected_distorted_boundaries(
-            islitlet,
-            csu_bar_slit_center,
-            [1],
-            params,
-            parmodel,
-            numpts=101,
-            deg=5,
-            debugplot=0,
-        )[0].poly_funct
-        xdum = np.linspace(1, EMIR_NAXIS1, num=numpix)
-        ydum = pol_lower_expected(xdum)
-        for i in range(len(xdum) - 1):
-            ds9_file.write(
-                "line {0} {1} {2} {3}".format(
-                    xdum[i] + xoff,
-                    ydum[i] + yoff,
-                    xdum[i + 1] + xoff,
-                    ydum[i + 1] + yoff,
-                )
-            )
-            ds9_file.write(" # color={0}\n".format(colorbox))
-        ydum = pol_upper_expected(xdum)
-        for i in range(len(xdum) - 1):
-            ds9_file.write(
-                "line {0} {1} {2} {3}".format(
-                    xdum[i] + xoff,
-                    ydum[i] + yoff,
-                    xdum[i + 1] + xoff,
-                    ydum[i + 1] + yoff,
-                )
-            )
-            ds9_file.write(" # color={0}\n".format(colorbox))
+        ds9_file.write(list_ds9_lower[k])
+        ds9_file.write(list_ds9_upper[k])
         # slitlet label
-        yc_lower = pol_lower_expected(EMIR_NAXIS1 / 2 + 0.5)
-        yc_upper = pol_upper_expected(EMIR_NAXIS1 / 2 + 0.5)
         ds9_file.write(
             "text {0} {1} {{{2}}} # color={3} "
             'font="helvetica 10 bold '
             'roman"\n'.format(
                 EMIR_NAXIS1 / 2 + 0.5 + xoff,
-                (yc_lower + yc_upper) / 2 + yoff,
+                (yc_lower[k] + yc_upper[k]) / 2 + yoff,
                 islitlet,
                 colorbox,
             )
@@ -1300,57 +1319,44 @@ def save_frontiers_from_params_ds9(
             parvalue = params[dumpar].value
             ds9_file.write("# {0}: {1}\n".format(dumpar, parvalue))
 
-    for islitlet, csu_bar_slit_center in zip(list_islitlet, list_csu_bar_slit_center):
+    list_pol_lower, list_pol_upper = expected_limits_polynomials(
+        params, parmodel, list_islitlet, list_csu_bar_slit_center, "frontiers"
+    )
+
+    list_colorbox = []
+    for islitlet in list_islitlet:
         if islitlet % 2 == 0:
             colorbox = "#0000ff"  # '#ff77ff'
         else:
             colorbox = "#0000ff"  # '#4444ff'
+        list_colorbox.append(colorbox)
+
+    # evaluate the limits of all the slitlets at once
+    xdum = np.linspace(1, EMIR_NAXIS1, num=numpix)
+    list_ds9_lower = ds9_polylines(
+        xdum + xoff, eval_polynomials(list_pol_lower, xdum) + yoff, list_colorbox
+    )
+    list_ds9_upper = ds9_polylines(
+        xdum + xoff, eval_polynomials(list_pol_upper, xdum) + yoff, list_colorbox
+    )
+    yc_lower = eval_polynomials(list_pol_lower, EMIR_NAXIS1 / 2 + 0.5)
+    yc_upper = eval_polynomials(list_pol_upper, EMIR_NAXIS1 / 2 + 0.5)
 
+    for k, (islitlet, csu_bar_slit_center) in enumerate(
+        zip(list_islitlet, list_csu_bar_slit_center)
+    ):
+        colorbox = list_colorbox[k]
         ds9_file.write("#\n# islitlet...........: {0}\n".format(islitlet))
         ds9_file.write("# csu_bar_slit_center: {0}\n".format(csu_bar_slit_center))
-        list_expected_frontiers = expected_distorted_frontiers(
-            islitlet,
-            csu_bar_slit_center,
-            params,
-            parmodel,
-            numpts=101,
-            deg=5,
-            debugplot=0,
-        )
-        pol_lower_expected = list_expected_frontiers[0].poly_funct
-        pol_upper_expected = list_expected_frontiers[1].poly_funct
-        xdum = np.linspace(1, EMIR_NAXIS1, num=numpix)
-        ydum = pol_lower_expected(xdum)
-        for i in range(len(xdum) - 1):
-            ds9_file.write(
-                "line {0} {1} {2} {3}".format(
-                    xdum[i] + xoff,
-                    ydum[i] + yoff,
-                    xdum[i + 1] + xoff,
-                    ydum[i + 1] + yoff,
-                )
-            )
-            ds9_file.write(" # color={0}\n".format(colorbox))
-        ydum = pol_upper_expected(xdum)
-        for i in range(len(xdum) - 1):
-            ds9_file.write(
-                "line {0} {1} {2} {3}".format(
-                    xdum[i] + xoff,
-                    ydum[i] + yoff,
-                    xdum[i + 1] + xoff,
-                    ydum[i + 1] + yoff,
-                )
-            )
-            ds9_file.write(" # color={0}\n".format(colorbox))
+        ds9_file.write(list_ds9_lower[k])
+        ds9_file.write(list_ds9_upper[k])
         # slitlet label
-        yc_lower = pol_lower_expected(EMIR_NAXIS1 / 2 + 0.5)
-        yc_upper = pol_upper_expected(EMIR_NAXIS1 / 2 + 0.5)
         ds9_file.write(
             "text {0} {1} {{{2}}} # color={3} "
             'font="helvetica 10 bold '
             'roman"\n'.format(
                 EMIR_NAXIS1 / 2 + 0.5 + xoff,
-                (yc_lower + yc_upper) / 2 + yoff,
+                (yc_lower[k] + yc_upper[k]) / 2 + yoff,
                 islitlet,
                 colorbox,
             )
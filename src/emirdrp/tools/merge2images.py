@@ -13,10 +13,11 @@ from astropy.io import fits
 import numpy as np
 import sys
 
-from numina.array.wavecalib.fix_pix_borders import find_pix_borders
 from numina.frame.utils import copy_img
 from numina.tools.arg_file_is_new import arg_file_is_new
 
+from emirdrp.processing.wavecal.pix_borders import find_pix_borders_2d
+
 from numina.array.display.pause_debugplot import DEBUGPLOT_CODES
 
 
@@ -69,21 +70,19 @@ def merge2images(hdu1, hdu2, debugplot):
     # initialize output array
     image2d_merged = np.zeros((naxis2, naxis1))
 
-    # main loop
-    data1 = hdu1[0].data
-    data2 = hdu2[0].data
-    for i in range(naxis2):
-        sp1 = data1[i, :]
-        sp2 = data2[i, :]
-        jmin1, jmax1 = find_pix_borders(sp1, sought_value=0)
-        jmin2, jmax2 = find_pix_borders(sp2, sought_value=0)
-        image2d_merged[i, :] = sp1 + sp2
-        useful1 = (jmin1 != -1) and (jmax1 != naxis1)
-        useful2 = (jmin2 != -1) and (jmax2 != naxis1)
-        if useful1 and useful2:
-            jmineff = max(jmin1, jmin2)
-            jmaxeff = min(jmax1, jmax2)
-            image2d_merged[i, jmineff : (jmaxeff + 1)] /= 2
+    # useful region of each spectrum
+    data1 = hdu1[0].data.reshape(naxis2, naxis1)
+    data2 = hdu2[0].data.reshape(naxis2, naxis1)
+    jmin1, jmax1 = find_pix_borders_2d(data1, sought_value=0)
+    jmin2, jmax2 = find_pix_borders_2d(data2, sought_value=0)
+    image2d_merged[:, :] = data1 + data2
+    useful1 = (jmin1 != -1) & (jmax1 != naxis1)
+    useful2 = (jmin2 != -1) & (jmax2 != naxis1)
+    jmineff = np.maximum(jmin1, jmin2)[:, np.newaxis]
+    jmaxeff = np.minimum(jmax1, jmax2)[:, np.newaxis]
+    jj = np.arange(naxis1)
+    overlap = (useful1 & useful2)[:, np.newaxis] & (jj >= jmineff) & (jj <= jmaxeff)
+    image2d_merged[overlap] /= 2
 
     # return result
     image_merged[0].data = image2d_merged.astype(np.float32)
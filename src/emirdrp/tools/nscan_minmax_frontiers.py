@@ -7,6 +7,8 @@
 # License-Filename: LICENSE.txt
 #
 
+import numpy as np
+
 from emirdrp.core import EMIR_NAXIS2
 
 
@@ -54,3 +56,56 @@ def nscan_minmax_frontiers(y0_frontier_lower, y0_frontier_upper, resize=False):
             )
 
     return nscan_min, nscan_max
+
+
+def nscan_minmax_frontiers_array(y0_frontier_lower, y0_frontier_upper, resize=False):
+    """Compute valid scan ranges for arrays of y0_frontier values.
+
+    Vectorized version of nscan_minmax_frontiers.
+
+    Parameters
+    ----------
+    y0_frontier_lower : numpy array
+        Ordinates of the lower frontier.
+    y0_frontier_upper : numpy array
+        Ordinates of the upper frontier.
+    resize : bool
+        If True, when the limits are beyond the expected values
+        [1,EMIR_NAXIS2], the values are truncated.
+
+    Returns
+    -------
+    nscan_min : numpy array (integers)
+        Minimum useful scan for each ordinate.
+    nscan_max : numpy array (integers)
+        Maximum useful scan for each ordinate.
+
+    """
+
+    y0_frontier_lower = np.asarray(y0_frontier_lower, dtype=float)
+    y0_frontier_upper = np.asarray(y0_frontier_upper, dtype=float)
+
+    integer_part = np.trunc(y0_frontier_lower)
+    nscan_min = integer_part.astype(int)
+    nscan_min[y0_frontier_lower - integer_part > 0.0] += 1
+    if np.any(nscan_min < 1):
+        if resize:
+            nscan_min = np.maximum(nscan_min, 1)
+        else:
+            raise ValueError("nscan_min=" + str(nscan_min.min()) + " is < 1")
+
+    integer_part = np.trunc(y0_frontier_upper)
+    nscan_max = integer_part.astype(int)
+    nscan_max[y0_frontier_upper - integer_part <= 0.0] -= 1
+    if np.any(nscan_max > EMIR_NAXIS2):
+        if resize:
+            nscan_max = np.minimum(nscan_max, EMIR_NAXIS2)
+        else:
+            raise ValueError(
+                "nscan_max="
+                + str(nscan_max.max())
+                + " is > NAXIS2_EMIR="
+                + str(EMIR_NAXIS2)
+            )
+
+    return nscan_min, nscan_max
@@ -0,0 +1,56 @@
+import numpy
+import pytest
+
+import emirdrp.instrument.channels as channels
+from emirdrp.instrument.detector_layout import DetectorLayout
+from emirdrp.instrument.detector_layout import channel_pixel_index
+from emirdrp.instrument.detector_layout import get_detector_layout
+
+
+@pytest.mark.parametrize("name", ["FULL", "H2RG_FULL"])
+def test_detector_layout(name):
+    layout = get_detector_layout(name)
+    assert get_detector_layout(name) is layout
+    assert layout.nchannels == 32
+    label_image = layout.label_image
+    assert label_image is layout.label_image
+    assert label_image.shape == (2048, 2048)
+    assert not label_image.flags.writeable
+    # channels cover the whole detector without overlapping
+    assert label_image.min() == 1
+    for label, region in enumerate(getattr(channels, name), start=1):
+        assert numpy.all(label_image[region] == label)
+        pixels = layout.channel_pixels(label)
+        expected = numpy.flatnonzero(label_image == label)
+        assert numpy.array_equal(pixels, expected)
+
+
+def test_h2rg_channels():
+    label_image = get_detector_layout("H2RG_FULL").label_image
+    assert numpy.array_equal(label_image[0], numpy.repeat(numpy.arange(1, 33), 64))
+
+
+def test_channel_pixel_index():
+    label_image = numpy.array([[2, 0, 1], [1, 2, 5], [0, 2, 2]])
+    indptr, indices = channel_pixel_index(label_image, 3)
+    assert indptr.tolist() == [0, 2, 6, 6]
+    assert indices.tolist() == [2, 3, 0, 4, 7, 8]
+
+
+def test_layout_from_label_image():
+    label_image = numpy.array([[1, 1, 2], [0, 2, 2]], dtype="uint8")
+    layout = DetectorLayout.from_label_image("ICHANNEL", label_image, 2)
+    assert layout.shape == (2, 3)
+    assert layout.channels is None
+    assert layout.channel_pixels(1).tolist() == [0, 1]
+    assert layout.channel_pixels(2).tolist() == [2, 4, 5]
+    # the original array remains writeable
+    assert label_image.flags.writeable
+    assert not layout.label_image.flags.writeable
+
+
+def test_detector_layout_errors():
+    with pytest.raises(ValueError):
+        get_detector_layout("UNKNOWN")
+    with pytest.raises(ValueError):
+        DetectorLayout("EMPTY", 2)
@@ -0,0 +1,123 @@
+import astropy.io.fits as fits
+import numina.core
+import numpy
+import pytest
+
+import emirdrp.processing.accumulator as acc
+
+
+@pytest.fixture
+def images():
+    rng = numpy.random.default_rng(2024)
+    return [rng.normal(100.0, 5.0, size=(6, 7)) for _ in range(5)]
+
+
+@pytest.mark.parametrize("memmap", [False, True])
+def test_accumulator(images, memmap, tmp_path):
+    accumulator = acc.FrameAccumulator((6, 7), memmap=memmap, directory=tmp_path)
+    masks = [numpy.zeros((6, 7), dtype="uint8") for _ in images]
+    masks[1][2, 3] = 1
+    for data, mask in zip(images, masks):
+        accumulator.add(data, mask=mask)
+    stack = numpy.ma.array(images, mask=masks)
+    assert numpy.allclose(accumulator.mean, stack.mean(axis=0))
+    assert numpy.allclose(accumulator.variance(), stack.var(axis=0, ddof=1))
+    assert accumulator.count[2, 3] == 4
+    assert accumulator.count[0, 0] == 5
+    assert list(tmp_path.iterdir()) == []
+    accumulator.close()
+
+
+def test_accumulator_weights(images):
+    accumulator = acc.FrameAccumulator((6, 7))
+    accumulator.add(images[0], weight=3)
+    accumulator.add(images[1])
+    expected = (3 * images[0] + images[1]) / 4
+    assert numpy.allclose(accumulator.mean, expected)
+    assert numpy.all(accumulator.weight == 4)
+
+
+def test_accumulator_expand(images):
+    accumulator = acc.FrameAccumulator((6, 7))
+    accumulator.add(images[0])
+    accumulator.expand((8, 9), (slice(2, 8), slice(0, 7)))
+    assert accumulator.shape == (8, 9)
+    accumulator.add(images[1], region=(slice(0, 6), slice(2, 9)))
+    assert numpy.array_equal(accumulator.mean[:2, :2], numpy.zeros((2, 2)))
+    assert numpy.allclose(
+        accumulator.mean[2:6, 2:7], (images[0][:4, 2:] + images[1][2:, :5]) / 2
+    )
+    assert accumulator.count.max() == 2
+    with pytest.raises(ValueError):
+        accumulator.add(images[2])
+
+
+def test_accumulator_registry():
+    acc._accumulators.clear()
+    accumulator = acc.FrameAccumulator((2, 2))
+    acc.register_accumulator("a", accumulator)
+    acc.register_accumulator("b", accumulator)
+    assert acc.find_accumulator("a") is None
+    assert acc.find_accumulator("b") is accumulator
+    assert acc.find_accumulator("b", remove=True) is accumulator
+    assert acc.find_accumulator("b") is None
+    acc.register_accumulator("b", accumulator)
+    for key in range(acc.ACCUMULATOR_REGISTRY_MAXSIZE):
+        acc.register_accumulator(key, acc.FrameAccumulator((2, 2)))
+    assert acc.find_accumulator("b") is None
+    hdu = fits.PrimaryHDU()
+    hdu.header["UUID"] = "1234"
+    assert (
+        acc.dataframe_uuid(numina.core.DataFrame(frame=fits.HDUList([hdu]))) == "1234"
+    )
+
+
+def store_result(accumulator, naccum):
+    # values stored in the accumulated result of a round
+    hdu = fits.PrimaryHDU(accumulator.mean.astype("float32"))
+    hdu.header[acc.ACCUM_KEYWORD] = naccum
+    return fits.HDUList(
+        [
+            hdu,
+            fits.ImageHDU(accumulator.variance().astype("float32"), name="VARIANCE"),
+            fits.ImageHDU(accumulator.count.astype("int16"), name="MAP"),
+        ]
+    )
+
+
+def test_restore_accumulator(images):
+    masks = [numpy.zeros((6, 7), dtype="uint8") for _ in images]
+    masks[1][2, 3] = 1
+    masks[3][2, 3] = 1
+    # the first round is not an accumulated result
+    hdul = fits.HDUList([fits.PrimaryHDU(images[0])])
+    warm = acc.restore_accumulator(hdul, 2, mask=masks[0])
+    for naccum, (data, mask) in enumerate(zip(images[1:], masks[1:]), start=2):
+        cold = acc.restore_accumulator(hdul, naccum, mask=masks[0])
+        for accumulator in [warm, cold]:
+            accumulator.add(data, mask=mask)
+        hdul = store_result(warm, naccum)
+        assert all(
+            numpy.array_equal(hdu.data, other.data)
+            for hdu, other in zip(hdul, store_result(cold, naccum))
+        )
+        warm.load(hdul[0].data, hdul["MAP"].data, hdul["VARIANCE"].data)
+    stack = numpy.ma.array(images, mask=masks)
+    assert numpy.allclose(hdul[0].data, stack.mean(axis=0))
+    assert numpy.allclose(hdul["VARIANCE"].data, stack.var(axis=0, ddof=1))
+    assert hdul["MAP"].data[2, 3] == 3
+    assert hdul["MAP"].data[0, 0] == 5
+
+
+def test_restore_accumulator_first_round(images):
+    mask = numpy.zeros((6, 7), dtype="uint8")
+    mask[1, 1] = 1
+    hdul = fits.HDUList([fits.PrimaryHDU(images[0])])
+    accumulator = acc.restore_accumulator(hdul, 3, mask=mask)
+    assert accumulator.count[0, 0] == 2
+    assert accumulator.count[1, 1] == 0
+    accumulator.add(images[1])
+    assert numpy.allclose(accumulator.mean[0, 0], (2 * images[0] + images[1])[0, 0] / 3)
+    assert accumulator.mean[1, 1] == images[1][1, 1]
+    with pytest.raises(ValueError):
+        accumulator.load(images[0], numpy.ones((2, 2)))
@@ -0,0 +1,47 @@
+import astropy.io.fits as fits
+import numpy
+import pytest
+
+from emirdrp.processing.framestore import FrameStore
+
+
+def create_hdulist(value, shape=(4, 5)):
+    hdu = fits.PrimaryHDU(numpy.full(shape, value, dtype="float64"))
+    hdu.header["VALUE"] = value
+    return fits.HDUList([hdu, fits.ImageHDU(numpy.zeros(3), name="EXTRA")])
+
+
+def test_framestore(tmp_path):
+    with FrameStore(3, directory=tmp_path) as store:
+        assert store.shape is None
+        for i in range(3):
+            store.put(i, create_hdulist(i + 0.5))
+        assert len(store) == 3
+        assert store.shape == (4, 5)
+        data = store.data(1)
+        assert isinstance(data, numpy.memmap)
+        assert data.dtype == numpy.float32
+        assert numpy.all(data == 1.5)
+        # modifications of data and headers are kept in the store
+        data[0, 0] = 7.0
+        store.header(1)["HISTORY"] = "modified"
+        hdul = store.hdulist(1)
+        assert hdul[0].data[0, 0] == 7.0
+        assert numpy.shares_memory(hdul[0].data, store.data(1))
+        assert hdul[0].header["VALUE"] == 1.5
+        assert "modified" in str(hdul[0].header["HISTORY"])
+        assert hdul["EXTRA"].data.shape == (3,)
+        # the temporary file is not visible in the directory
+        assert list(tmp_path.iterdir()) == []
+
+
+def test_framestore_errors():
+    store = FrameStore(2)
+    with pytest.raises(KeyError):
+        store.data(0)
+    store.put(0, create_hdulist(1.0))
+    with pytest.raises(KeyError):
+        store.header(1)
+    with pytest.raises(ValueError):
+        store.put(1, create_hdulist(1.0, shape=(5, 4)))
+    store.close()
@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+
+from emirdrp.processing.pipeline import available_cpus
+from emirdrp.processing.pipeline import imap_ordered
+
+
+def slow_square(x):
+    # later items finish first
+    time.sleep(0.002 * max(10 - x, 0))
+    return x * x
+
+
+@pytest.mark.parametrize("max_workers", [0, 1, 3])
+def test_imap_ordered(max_workers):
+    result = list(imap_ordered(slow_square, range(10), max_workers=max_workers))
+    assert result == [x * x for x in range(10)]
+
+
+def test_imap_ordered_bounded():
+    lock = threading.Lock()
+    drawn = []
+
+    def items():
+        for x in range(20):
+            with lock:
+                drawn.append(x)
+            yield x
+
+    gen = imap_ordered(slow_square, items(), max_workers=2, max_pending=3)
+    assert next(gen) == 0
+    # only a few items are read ahead of the consumer
+    assert len(drawn) <= 4
+    assert list(gen) == [x * x for x in range(1, 20)]
+
+
+def test_imap_ordered_errors():
+    def fail(x):
+        if x == 3:
+            raise RuntimeError("failed")
+        return x
+
+    with pytest.raises(RuntimeError):
+        list(imap_ordered(fail, range(6), max_workers=2))
+    with pytest.raises(ValueError):
+        list(imap_ordered(fail, range(6), max_workers=-1))
+    assert available_cpus() >= 1
+
+
+def test_imap_ordered_item_size():
+    lock = threading.Lock()
+    drawn = []
+
+    def items():
+        for x in range(12):
+            with lock:
+                drawn.append(x)
+            yield [x] * 4
+
+    gen = imap_ordered(
+        lambda item: item[0] ** 2, items(), max_workers=4, max_pending=8, item_size=len
+    )
+    assert next(gen) == 0
+    # the limit is applied to the total size of the pending items
+    assert len(drawn) <= 3
+    assert list(gen) == [x * x for x in range(1, 12)]
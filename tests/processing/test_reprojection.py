@@ -0,0 +1,61 @@
+import astropy.io.fits as fits
+from astropy.wcs import WCS
+import numpy
+import pytest
+from reproject import reproject_exact, reproject_interp
+
+import emirdrp.processing.reprojection as reproj
+
+
+@pytest.fixture
+def wcs_pair():
+    header = fits.Header()
+    header["CTYPE1"] = "RA---ZPN"
+    header["CTYPE2"] = "DEC--ZPN"
+    header["CRPIX1"] = 30.3
+    header["CRPIX2"] = 28.7
+    header["CRVAL1"] = 180.0
+    header["CRVAL2"] = 30.0
+    header["CD1_1"] = -5.5e-5
+    header["CD2_2"] = 5.5e-5
+    header["PV2_1"] = 1.0
+    header["PV2_3"] = 3e5
+    wcs_original = WCS(header)
+    del header["PV2_3"]
+    return wcs_original, WCS(header)
+
+
+@pytest.fixture
+def planes():
+    rng = numpy.random.default_rng(11)
+    data = rng.normal(100.0, 5.0, size=(60, 64))
+    bpm = (rng.random((60, 64)) > 0.95).astype("uint8")
+    channels = numpy.repeat(numpy.arange(1.0, 5.0), 16)[numpy.newaxis, :].repeat(60, 0)
+    return [data, bpm, channels]
+
+
+@pytest.mark.parametrize(
+    "method,function", [("interp", reproject_interp), ("exact", reproject_exact)]
+)
+def test_reproject_planes(wcs_pair, planes, method, function):
+    wcs_original, wcs_final = wcs_pair
+    reproj._mapping_cache.clear()
+    result, footprints = reproj.reproject_planes(
+        planes, wcs_original, wcs_final, (60, 64), method=method
+    )
+    assert len(result) == len(footprints) == 3
+    for data, data_out, footprint in zip(planes, result, footprints):
+        expected, expected_footprint = function(
+            input_data=(data, wcs_original),
+            output_projection=wcs_final,
+            shape_out=(60, 64),
+        )
+        assert numpy.allclose(data_out, expected, equal_nan=True)
+        assert numpy.allclose(footprint, expected_footprint)
+    assert reproj.wcs_signature(wcs_original) != reproj.wcs_signature(wcs_final)
+    if method == "interp":
+        assert len(reproj._mapping_cache) == 1
+        reproj.reproject_planes(planes[:1], wcs_original, wcs_final, (60, 64))
+        assert len(reproj._mapping_cache) == 1
+    with pytest.raises(ValueError):
+        reproj.reproject_planes(planes, wcs_original, wcs_final, (60, 64), "none")
@@ -0,0 +1,65 @@
+import numpy
+import pytest
+
+import numina.array.combine as combine
+from numina.array.distortion import shift_image2d
+
+from emirdrp.processing.shiftcombine import shift_combine
+from emirdrp.processing.shiftcombine import shift_combine_method
+from emirdrp.processing.shiftcombine import shift_rows
+
+
+@pytest.fixture
+def images():
+    rng = numpy.random.default_rng(1234)
+    return [rng.normal(100.0, 5.0, size=(60, 12)).astype("float32") for _ in range(5)]
+
+
+@pytest.mark.parametrize("yoffset", [0.0, 0.3, -0.3, 1.0, -2.6, 7.25, 100.0])
+def test_shift_rows(images, yoffset):
+    expected = shift_image2d(images[0], yoffset=yoffset)
+    result = shift_rows(images[0], yoffset)
+    assert numpy.allclose(result, expected, rtol=0, atol=1e-10)
+    strips = [
+        shift_rows(images[0], yoffset, row_range=(i, i + 7)) for i in range(0, 56, 7)
+    ]
+    strips.append(shift_rows(images[0], yoffset, row_range=(56, 60)))
+    assert numpy.array_equal(numpy.concatenate(strips), result)
+    assert shift_rows(images[0], yoffset, dtype="float32").dtype == numpy.float32
+
+
+@pytest.mark.parametrize("method", ["mean", "median", "sigmaclip"])
+@pytest.mark.parametrize("nrows_strip", [None, 8])
+def test_shift_combine(images, method, nrows_strip):
+    yoffsets = [0.0, 0.3, -1.2, 0.0867, 2.5]
+    method = getattr(combine, method)
+    shifted = [
+        shift_image2d(data, yoffset=yoffset).astype("float32")
+        for data, yoffset in zip(images, yoffsets)
+    ]
+    expected = method(shifted, dtype="float32")
+    result = shift_combine(images, yoffsets, method, nrows_strip=nrows_strip)
+    assert len(result) == len(expected)
+    for res, ref in zip(result, expected):
+        assert res.dtype == ref.dtype
+        assert numpy.allclose(res, ref, rtol=1e-6, atol=1e-4)
+    # strip-wise and full-frame results are identical
+    assert all(
+        numpy.array_equal(a, b)
+        for a, b in zip(result, shift_combine(images, yoffsets, method))
+    )
+
+
+def test_shift_combine_method(images):
+    shifted_method = shift_combine_method(combine.median, [0.0] * 5, nrows_strip=16)
+    assert shifted_method.__name__ == "median"
+    result = shifted_method(images, dtype="float32")
+    expected = combine.median(images, dtype="float32")
+    assert numpy.array_equal(result[0], expected[0])
+
+
+def test_shift_combine_errors(images):
+    with pytest.raises(ValueError):
+        shift_combine(images, [0.0], combine.mean)
+    with pytest.raises(ValueError):
+        shift_combine(images, [0.0] * 5, combine.mean, nrows_strip=0)
@@ -0,0 +1,87 @@
+import astropy.io.fits as fits
+from astropy.wcs import WCS
+import numpy
+import pytest
+
+from numina.tools.pixel_solid_angle_arcsec2 import pixel_solid_angle_arcsec2
+
+import emirdrp.processing.solidangle as solidangle
+
+
+def create_wcs(crval1=180.0, crval2=30.0, pv2_3=3e5):
+    header = fits.Header()
+    header["CTYPE1"] = "RA---ZPN"
+    header["CTYPE2"] = "DEC--ZPN"
+    header["CRPIX1"] = 30.3
+    header["CRPIX2"] = 28.7
+    header["CRVAL1"] = crval1
+    header["CRVAL2"] = crval2
+    header["CD1_1"] = -5.5e-5
+    header["CD2_2"] = 5.5e-5
+    header["PV2_1"] = 1.0
+    header["PV2_3"] = pv2_3
+    return WCS(header)
+
+
+@pytest.fixture
+def solid_angle_cache():
+    solidangle.clear_solid_angle_cache()
+    yield
+    solidangle.set_solid_angle_cache_directory(None)
+    solidangle.clear_solid_angle_cache()
+
+
+def test_distortion_signature():
+    signature = solidangle.distortion_signature(create_wcs(), 64, 60)
+    # the sky position of the reference pixel is not relevant
+    assert signature == solidangle.distortion_signature(
+        create_wcs(crval1=20.0, crval2=-60.0), 64, 60
+    )
+    assert signature != solidangle.distortion_signature(create_wcs(pv2_3=0.0), 64, 60)
+    assert signature != solidangle.distortion_signature(create_wcs(), 64, 61)
+
+
+def test_cached_pixel_solid_angle_arcsec2(solid_angle_cache):
+    wcs = create_wcs()
+    area1 = solidangle.cached_pixel_solid_angle_arcsec2(wcs, 64, 60)
+    expected = pixel_solid_angle_arcsec2(
+        wcs=wcs, naxis1=64, naxis2=60, method=3, kernel_size=(11, 11)
+    )
+    assert numpy.array_equal(area1, expected)
+    assert not area1.flags.writeable
+    area2 = solidangle.cached_pixel_solid_angle_arcsec2(create_wcs(crval1=10.0), 64, 60)
+    assert area2 is area1
+    solidangle.cached_pixel_solid_angle_arcsec2(create_wcs(pv2_3=0.0), 64, 60)
+    info = solidangle.solid_angle_cache_info()
+    assert (info.hits, info.disk_hits, info.misses, info.currsize) == (1, 0, 2, 2)
+
+
+def test_solid_angle_disk_store(solid_angle_cache, tmp_path):
+    solidangle.set_solid_angle_cache_directory(tmp_path)
+    wcs = create_wcs()
+    area1 = solidangle.cached_pixel_solid_angle_arcsec2(wcs, 64, 60)
+    assert len(list(tmp_path.glob("solid_angle_*.npy"))) == 1
+    solidangle.clear_solid_angle_cache()
+    area2 = solidangle.cached_pixel_solid_angle_arcsec2(wcs, 64, 60)
+    assert numpy.array_equal(area1, area2)
+    assert solidangle.solid_angle_cache_info().disk_hits == 1
+    assert solidangle.solid_angle_cache_info().misses == 0
+
+
+def test_solid_angle_cache_dir_argument(solid_angle_cache, tmp_path):
+    cache_dir = tmp_path / "solid_angle"
+    wcs = create_wcs()
+    area1 = solidangle.cached_pixel_solid_angle_arcsec2(
+        wcs, 64, 60, cache_dir=str(cache_dir)
+    )
+    assert len(list(cache_dir.glob("solid_angle_*.npy"))) == 1
+    solidangle.clear_solid_angle_cache()
+    # without cache_dir (and no global directory) the map is computed
+    solidangle.cached_pixel_solid_angle_arcsec2(wcs, 64, 60)
+    solidangle.clear_solid_angle_cache()
+    area2 = solidangle.cached_pixel_solid_angle_arcsec2(
+        wcs, 64, 60, cache_dir=str(cache_dir)
+    )
+    assert numpy.array_equal(area1, area2)
+    info = solidangle.solid_angle_cache_info()
+    assert (info.disk_hits, info.misses) == (1, 0)
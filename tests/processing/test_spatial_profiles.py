@@ -0,0 +1,64 @@
+import numpy
+import pytest
+
+from numina.array.wavecalib.crosscorrelation import periodic_corr1d
+from scipy import ndimage
+
+from emirdrp.processing.spatial_profiles import mean_spatial_profiles
+from emirdrp.processing.spatial_profiles import spatial_profile_offsets
+
+
+@pytest.fixture
+def images():
+    rng = numpy.random.default_rng(4321)
+    yy = numpy.arange(80)[:, numpy.newaxis]
+    list_data = []
+    for shift in [0.0, 1.3, -2.1, 0.4]:
+        profile = 50.0 * numpy.exp(-0.5 * ((yy - 30.0 - shift) / 3.0) ** 2)
+        data = profile + rng.normal(10.0, 1.0, size=(80, 64))
+        list_data.append(data.astype("float32"))
+    list_sky = [rng.normal(2.0, 1.0, size=(80, 64)).astype("float32") for _ in range(4)]
+    return list_data, list_sky
+
+
+def test_mean_spatial_profiles(images):
+    list_data, list_sky = images
+    xisok = numpy.ones(64, dtype=bool)
+    xisok[20:25] = False
+    profiles = mean_spatial_profiles(
+        list_data,
+        list_sky,
+        vpix_region=(16, 45),
+        xisok=xisok,
+        vpix_region_sky=(56, 75),
+        nwidth_medfilt=5,
+    )
+    assert profiles.shape == (4, 30)
+    for data, sky, profile in zip(list_data, list_sky, profiles):
+        diff = data - sky
+        slitlet2d = diff[15:45] - numpy.median(diff[55:75], axis=0)
+        slitlet2d = ndimage.median_filter(slitlet2d[:, xisok], size=(1, 5))
+        assert numpy.array_equal(profile, numpy.mean(slitlet2d, axis=1))
+    with pytest.raises(ValueError):
+        mean_spatial_profiles(list_data, list_sky[:2], (16, 45), xisok)
+
+
+def test_spatial_profile_offsets(images):
+    list_data, list_sky = images
+    profiles = mean_spatial_profiles(
+        list_data, None, vpix_region=(16, 45), xisok=numpy.ones(64, dtype=bool)
+    )
+    offsets, fpeak = spatial_profile_offsets(profiles[0], profiles, naround_zero=10)
+    assert offsets[0] == 0.0
+    assert numpy.allclose(offsets, [0.0, 1.3, -2.1, 0.4], atol=0.3)
+    for profile, offset in zip(profiles, offsets):
+        expected = periodic_corr1d(
+            profiles[0],
+            profile,
+            frac_cosbell=0.10,
+            zero_padding=11,
+            fminmax=None,
+            nfit_peak=5,
+            naround_zero=10,
+        )[0]
+        assert offset == pytest.approx(expected, abs=1e-4)
@@ -0,0 +1,62 @@
+import numpy
+import pytest
+
+from emirdrp.processing.wavecal.apply_rectwv_coeff import apply_rectwv_coeff
+from emirdrp.processing.wavecal.apply_rectwv_coeff import apply_rectwv_coeff_batch
+from emirdrp.testing.create_rectwv import create_mos_image
+from emirdrp.testing.create_rectwv import create_rectwv_coeff
+
+
+@pytest.fixture(scope="module")
+def rectwv_coeff():
+    return create_rectwv_coeff(missing_slitlets=[1, 55], nc2=200)
+
+
+@pytest.fixture(scope="module")
+def serial_result(rectwv_coeff):
+    return apply_rectwv_coeff(create_mos_image(), rectwv_coeff)
+
+
+def test_apply_rectwv_coeff_keywords(serial_result):
+    header = serial_result[0].header
+    assert header["imnslt01"] == 0
+    assert header["jmxslt55"] == 0
+    assert header["imnslt02"] == 39
+    assert header["imxslt02"] == 76
+    assert 0 < header["jmnslt02"] < header["jmxslt02"]
+    assert header["ctype1"] == "WAVE"
+
+
+@pytest.mark.parametrize("parallel", ["thread", "process"])
+def test_apply_rectwv_coeff_parallel(rectwv_coeff, serial_result, parallel):
+    result = apply_rectwv_coeff(
+        create_mos_image(), rectwv_coeff, parallel=parallel, max_workers=2
+    )
+    assert numpy.array_equal(result[0].data, serial_result[0].data)
+    for key in serial_result[0].header:
+        if key != "HISTORY":
+            assert result[0].header[key] == serial_result[0].header[key]
+
+
+def test_apply_rectwv_coeff_parallel_raises(rectwv_coeff):
+    with pytest.raises(ValueError):
+        apply_rectwv_coeff(create_mos_image(), rectwv_coeff, parallel="gpu")
+
+
+@pytest.mark.parametrize("use_operator", [False, True])
+def test_apply_rectwv_coeff_batch(rectwv_coeff, serial_result, use_operator):
+    images = [create_mos_image(), create_mos_image(seed=17)]
+    result = apply_rectwv_coeff_batch(
+        images, rectwv_coeff, use_rectification_operator=use_operator
+    )
+    assert len(result) == 2
+    expected = [serial_result, apply_rectwv_coeff(images[1], rectwv_coeff)]
+    for res, ref in zip(result, expected):
+        assert res[0].data.dtype == ref[0].data.dtype
+        if use_operator:
+            assert numpy.allclose(res[0].data, ref[0].data, rtol=1e-5, atol=1e-3)
+        else:
+            assert numpy.array_equal(res[0].data, ref[0].data)
+        for key in ref[0].header:
+            if key != "HISTORY":
+                assert res[0].header[key] == ref[0].header[key]
@@ -0,0 +1,73 @@
+import numpy
+import pytest
+
+from numina.array.wavecalib.crosscorrelation import convolve_comb_lines
+from numina.array.wavecalib.crosscorrelation import periodic_corr1d
+
+import emirdrp.processing.wavecal.crosscorrelation as crosscorr
+
+
+@pytest.fixture
+def spectra():
+    naxis1 = 501
+    lines_wave = numpy.array([30.0, 100.0, 180.0, 260.0, 300.0, 420.0])
+    lines_flux = numpy.array([1.0, 0.3, 0.8, 0.5, 1.0, 0.2])
+    xwave, sp_reference = convolve_comb_lines(
+        lines_wave, lines_flux, 2.0, 1.0, 1.0, 1.0, naxis1
+    )
+    sp_offset = numpy.array(
+        [
+            convolve_comb_lines(
+                lines_wave + shift, lines_flux, 2.0, 1.0, 1.0, 1.0, naxis1
+            )[1]
+            for shift in [-7.3, -0.4, 0.0, 2.6, 12.1]
+        ]
+    )
+    return sp_reference, sp_offset
+
+
+@pytest.mark.parametrize("naround_zero", [None, 50])
+def test_periodic_corr1d_batch(spectra, naround_zero):
+    sp_reference, sp_offset = spectra
+    offset, fpeak = crosscorr.periodic_corr1d_batch(
+        sp_reference, sp_offset, naround_zero=naround_zero
+    )
+    for i in range(sp_offset.shape[0]):
+        expected = periodic_corr1d(
+            sp_reference, sp_offset[i], fminmax=None, naround_zero=naround_zero
+        )
+        assert numpy.isclose(offset[i], expected[0], rtol=0, atol=1e-8)
+        assert numpy.isclose(fpeak[i], expected[1], rtol=1e-10)
+    assert offset[2] == pytest.approx(0, abs=1e-8)
+
+
+def test_periodic_corr1d_batch_taper(spectra):
+    sp_reference, sp_offset = spectra
+    offset, fpeak = crosscorr.periodic_corr1d_batch(
+        sp_reference, sp_offset, frac_cosbell=0.10, zero_padding=11, nfit_peak=5
+    )
+    for i in range(sp_offset.shape[0]):
+        expected = periodic_corr1d(
+            sp_reference,
+            sp_offset[i],
+            frac_cosbell=0.10,
+            zero_padding=11,
+            fminmax=None,
+            nfit_peak=5,
+        )
+        assert numpy.isclose(offset[i], expected[0], rtol=0, atol=1e-8)
+        assert numpy.isclose(fpeak[i], expected[1], rtol=1e-10)
+    with pytest.raises(ValueError):
+        crosscorr.periodic_corr1d_batch(sp_reference, sp_offset, frac_cosbell=0.7)
+
+
+def test_cached_convolve_comb_lines():
+    crosscorr._reference_cache.clear()
+    args = ([10.0, 50.0], [1.0, 2.0], 2.0, 1.0, 1.0, 1.0, 100)
+    xwave, sp1 = crosscorr.cached_convolve_comb_lines(*args)
+    sp1 /= 10
+    xwave, sp2 = crosscorr.cached_convolve_comb_lines(*args)
+    assert len(crosscorr._reference_cache) == 1
+    assert numpy.array_equal(sp2, convolve_comb_lines(*args)[1])
+    crosscorr.cached_convolve_comb_lines(*args[:2], 3.0, *args[3:])
+    assert len(crosscorr._reference_cache) == 2
@@ -0,0 +1,75 @@
+import astropy.io.fits as fits
+import numpy
+import pytest
+
+from emirdrp.core import EMIR_NBARS
+from emirdrp.core import EMIR_NPIXPERSLIT_RECTIFIED
+from emirdrp.processing.wavecal.median_slitlets_rectified import (
+    median_slitlets_rectified,
+)
+
+NAXIS1 = 200
+
+
+@pytest.fixture
+def rectified_image():
+    rng = numpy.random.default_rng(42)
+    naxis2 = EMIR_NBARS * EMIR_NPIXPERSLIT_RECTIFIED
+    data = rng.normal(100.0, 10.0, size=(naxis2, NAXIS1)).astype("float32")
+    data[:, :10] = 0
+    hdu = fits.PrimaryHDU(data)
+    hdu.header["INSTRUME"] = "EMIR"
+    hdu.header["CRPIX1"] = 1.0
+    hdu.header["CRVAL1"] = 15000.0
+    hdu.header["CDELT1"] = 1.0
+    for islitlet in range(1, EMIR_NBARS + 1):
+        ns1 = (islitlet - 1) * EMIR_NPIXPERSLIT_RECTIFIED + 1
+        hdu.header["imnslt{:02d}".format(islitlet)] = ns1 + 3
+        hdu.header["imxslt{:02d}".format(islitlet)] = ns1 + 30
+    return fits.HDUList([hdu])
+
+
+def slitlet_medians(data, offset1=0, offset2=EMIR_NPIXPERSLIT_RECTIFIED):
+    bands = data.reshape(EMIR_NBARS, EMIR_NPIXPERSLIT_RECTIFIED, -1)
+    return numpy.median(bands[:, offset1:offset2], axis=1)
+
+
+@pytest.mark.parametrize("mode", [0, 1])
+def test_median_slitlets_rectified(rectified_image, mode):
+    data = rectified_image[0].data.copy()
+    result = median_slitlets_rectified(rectified_image, mode=mode)
+    expected = slitlet_medians(data)
+    if mode == 0:
+        expected = numpy.repeat(expected, EMIR_NPIXPERSLIT_RECTIFIED, axis=0)
+    assert result[0].data.dtype == numpy.float32
+    assert numpy.array_equal(result[0].data, expected)
+    assert numpy.array_equal(rectified_image[0].data, data)
+    assert result[0].header["CRVAL1"] == 15000.0
+
+
+def test_median_slitlets_rectified_collapsed(rectified_image):
+    useful = [1, 2, 5, 10]
+    result = median_slitlets_rectified(
+        rectified_image, mode=2, list_useful_slitlets=useful
+    )
+    medians = slitlet_medians(rectified_image[0].data)
+    expected = numpy.median(medians[numpy.array(useful) - 1], axis=0)
+    assert result[0].data.shape == (NAXIS1,)
+    # define_mask_borders also masks the first and last useful pixels
+    assert numpy.allclose(result[0].data[11:-1], expected[11:-1])
+
+
+def test_median_slitlets_rectified_useful_rows(rectified_image):
+    result = median_slitlets_rectified(rectified_image, mode=1, useful_rows=True)
+    expected = slitlet_medians(rectified_image[0].data, 3, 31)
+    assert numpy.array_equal(result[0].data, expected)
+
+
+def test_median_slitlets_rectified_memmap(rectified_image, tmp_path):
+    filename = tmp_path / "rectified.fits"
+    rectified_image.writeto(filename)
+    with fits.open(filename, memmap=True) as hdulist:
+        result = median_slitlets_rectified(hdulist, mode=1)
+        assert numpy.array_equal(
+            result[0].data, slitlet_medians(rectified_image[0].data)
+        )
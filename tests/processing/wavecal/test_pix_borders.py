@@ -0,0 +1,47 @@
+import numpy
+import pytest
+
+from numina.array.wavecalib.fix_pix_borders import find_pix_borders
+from numina.array.wavecalib.fix_pix_borders import fix_pix_borders
+
+from emirdrp.processing.wavecal.pix_borders import find_pix_borders_2d
+from emirdrp.processing.wavecal.pix_borders import find_useful_region
+from emirdrp.processing.wavecal.pix_borders import fix_pix_borders_2d
+
+
+@pytest.fixture
+def image2d():
+    rng = numpy.random.default_rng(1234)
+    data = rng.uniform(1.0, 2.0, size=(20, 50))
+    for i, (j1, j2) in enumerate(rng.integers(0, 50, size=(20, 2))):
+        data[i, : min(j1, j2)] = 0
+        data[i, max(j1, j2) :] = 0
+    data[3, :] = 0
+    data[7, 20:30] = 0
+    return data
+
+
+def test_find_pix_borders_2d(image2d):
+    jmin, jmax = find_pix_borders_2d(image2d, sought_value=0)
+    for i in range(image2d.shape[0]):
+        assert (jmin[i], jmax[i]) == find_pix_borders(image2d[i], sought_value=0)
+    assert find_pix_borders_2d(image2d[5], 0) == find_pix_borders(image2d[5], 0)
+
+
+def test_find_useful_region(image2d):
+    jmin, jmax = find_pix_borders_2d(image2d, sought_value=0)
+    valid = jmin != -1
+    result = find_useful_region(image2d[numpy.newaxis], sought_value=0)
+    assert result[0][0] == jmin[valid].min()
+    assert result[1][0] == jmax[valid].max()
+    assert find_useful_region(numpy.zeros((2, 4, 10)), 0)[0].tolist() == [-1, -1]
+
+
+@pytest.mark.parametrize("nreplace", [1, 3])
+def test_fix_pix_borders_2d(image2d, nreplace):
+    expected = fix_pix_borders(image2d.copy(), nreplace, 0, -1)
+    result = fix_pix_borders_2d(image2d.copy(), nreplace, 0, -1)
+    assert numpy.array_equal(result, expected)
+    expected = fix_pix_borders(image2d.T.copy(), nreplace, 0, -1)
+    result = fix_pix_borders_2d(image2d.copy().T, nreplace, 0, -1)
+    assert numpy.array_equal(result, expected)
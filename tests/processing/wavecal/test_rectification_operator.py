@@ -0,0 +1,48 @@
+import numpy
+import pytest
+
+from numina.array.distortion import rectify2d
+
+from emirdrp.processing.wavecal.apply_rectwv_coeff import apply_rectwv_coeff
+import emirdrp.processing.wavecal.rectification_operator as rectop
+from emirdrp.testing.create_rectwv import create_mos_image
+from emirdrp.testing.create_rectwv import create_rectwv_coeff
+
+
+@pytest.mark.parametrize("resampling", [1, 2])
+def test_rectification_matrix(resampling):
+    rng = numpy.random.default_rng(1)
+    naxis2, naxis1 = 42, 120
+    image2d = rng.normal(100.0, 10.0, size=(naxis2, naxis1))
+    aij = [0.3, 1.01, 0.02, 1e-5, 2e-4, -1e-4]
+    bij = [-2.7, 0.003, 0.98, -1e-5, 1e-4, 2e-4]
+    matrix = rectop.rectification_matrix(naxis1, naxis2, aij, bij, resampling)
+    expected = rectify2d(image2d, numpy.array(aij), numpy.array(bij), resampling)
+    computed = (matrix @ image2d.ravel()).reshape(naxis2, naxis1)
+    assert numpy.allclose(computed, expected, rtol=0, atol=1e-10)
+
+
+def test_rectification_operator_cache(tmp_path):
+    rectwv_coeff = create_rectwv_coeff(missing_slitlets=[1, 55], nc2=100)
+    op1 = rectop.get_rectification_operator(rectwv_coeff, 2, cache_dir=tmp_path)
+    op2 = rectop.get_rectification_operator(rectwv_coeff, 2)
+    assert op1 is op2
+    assert len(list(tmp_path.glob("*.npz"))) == 1
+
+    rectop._operator_cache.clear()
+    op3 = rectop.get_rectification_operator(rectwv_coeff, 2, cache_dir=tmp_path)
+    assert op3 is not op1
+    assert op3.signature == op1.signature
+    for islitlet, matrix in op1.matrices.items():
+        assert (matrix != op3.matrices[islitlet]).nnz == 0
+
+
+def test_apply_rectwv_coeff_operator():
+    rectwv_coeff = create_rectwv_coeff(missing_slitlets=[1, 55], nc2=100)
+    expected = apply_rectwv_coeff(create_mos_image(), rectwv_coeff)
+    computed = apply_rectwv_coeff(
+        create_mos_image(), rectwv_coeff, use_rectification_operator=True
+    )
+    assert numpy.allclose(computed[0].data, expected[0].data, rtol=1e-5)
+    for key in ["jmnslt02", "jmxslt02", "imnslt54", "imxslt54"]:
+        assert computed[0].header[key] == expected[0].header[key]
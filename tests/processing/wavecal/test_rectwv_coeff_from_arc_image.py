@@ -0,0 +1,98 @@
+import numpy
+import pytest
+from lmfit import Parameters
+from numina.array.wavecalib.__main__ import read_wv_master_from_array
+
+from emirdrp.instrument.csu_configuration import CsuConfiguration
+import emirdrp.processing.wavecal.rectwv_coeff_from_arc_image as arc_image
+from emirdrp.processing.wavecal.retrieve_catlines import load_catalogue
+from emirdrp.processing.wavecal.set_wv_parameters import set_wv_parameters
+
+
+@pytest.fixture(scope="module")
+def arc_parameters():
+    header = {"CSUP{}".format(ibar): 150.0 for ibar in range(1, 111)}
+    csu_conf = CsuConfiguration.define_from_header(header)
+    # undistorted longslit boundary model
+    params = Parameters()
+    for name, value in [
+        ("c2", 0.0),
+        ("c4", 0.0),
+        ("ff", 1.0),
+        ("slit_gap", 3.0),
+        ("slit_height", 3.4),
+        ("theta0_origin", 0.0),
+        ("theta0_slope", 0.0),
+        ("x0", 1.024),
+        ("y0", 1.024),
+        ("y_baseline", 0.02),
+    ]:
+        params.add(name, value=value, vary=False)
+    lines_catalog = load_catalogue("lines_argon_neon_xenon_empirical.dat")
+    wv_parameters = set_wv_parameters("J", "J")
+    return {
+        "csu_conf": csu_conf,
+        "params": params,
+        "parmodel": "longslit",
+        "wv_master": read_wv_master_from_array(lines_catalog, lines="brightest"),
+        "wv_master_all": read_wv_master_from_array(lines_catalog, lines="all"),
+        "nbrightlines": wv_parameters["nbrightlines"],
+        "poly_crval1_linear": wv_parameters["poly_crval1_linear"],
+        "poly_cdelt1_linear": wv_parameters["poly_cdelt1_linear"],
+        "wvmin_expected": None,
+        "wvmax_expected": None,
+        "wvmin_useful": None,
+        "wvmax_useful": None,
+        "args_ymargin_bb": 2,
+        "args_remove_sp_background": True,
+        "args_times_sigma_threshold": 10,
+        "args_order_fmap": 2,
+        "args_sigma_gaussian_filtering": 2,
+        "args_margin_npix": 50,
+        "args_poldeg_initial": 3,
+        "args_poldeg_refined": 5,
+        "args_interactive": False,
+        "args_threshold_wv": 0,
+        "args_ylogscale": False,
+        "args_pdf": None,
+        "args_geometry": (0, 0, 640, 480),
+    }
+
+
+@pytest.fixture(scope="module")
+def image2d(arc_parameters):
+    # the same arc spectrum in all the rows of the detector
+    csu_bar_slit_center = arc_parameters["csu_conf"].csu_bar_slit_center(10)
+    crval1 = arc_parameters["poly_crval1_linear"](csu_bar_slit_center)
+    cdelt1 = arc_parameters["poly_cdelt1_linear"](csu_bar_slit_center)
+    wave = crval1 + numpy.arange(2048) * cdelt1
+    spectrum = numpy.zeros(2048)
+    lines_catalog = load_catalogue("lines_argon_neon_xenon_empirical.dat")
+    for wv, flux in lines_catalog:
+        spectrum += flux / 1000 * numpy.exp(-0.5 * ((wave - wv) / (2 * cdelt1)) ** 2)
+    return numpy.tile(spectrum, (2048, 1))
+
+
+def test_compute_slitlets_process(image2d, arc_parameters):
+    list_islitlets = [9, 10]
+    expected = arc_image._compute_slitlets(list_islitlets, image2d, arc_parameters)
+    computed = arc_image._compute_slitlets(
+        list_islitlets, image2d, arc_parameters, parallel="process", max_workers=2
+    )
+    assert [status for _, _, status in expected] == [".", "."]
+    for (slt1, sp1, status1), (slt2, sp2, status2) in zip(expected, computed):
+        assert status2 == status1
+        assert numpy.array_equal(sp2, sp1)
+        assert slt2.islitlet == slt1.islitlet
+        assert numpy.array_equal(slt2.wpoly.coef, slt1.wpoly.coef)
+        for attr in ["ttd_aij", "ttd_bij", "tti_aij", "tti_bij"]:
+            assert numpy.array_equal(getattr(slt2, attr), getattr(slt1, attr))
+        assert slt2.crval1_linear == slt1.crval1_linear
+        assert slt2.cdelt1_linear == slt1.cdelt1_linear
+    # the data shared with the workers is not kept in this process
+    assert arc_image._worker_state == {}
+
+
+def test_compute_slitlets_raises(image2d, arc_parameters):
+    with pytest.raises(ValueError):
+        arc_image._compute_slitlets([9], image2d, arc_parameters, parallel="gpu")
@@ -0,0 +1,72 @@
+import pytest
+
+import emirdrp.processing.wavecal.rectwv_coeff_from_mos_library as mos_library
+from emirdrp.products import MasterRectWave
+from emirdrp.testing.create_rectwv import create_mos_image
+from emirdrp.testing.create_rectwv import create_rectwv_coeff
+
+
+def create_csu_image(seed=291, offset=0.0):
+    img = create_mos_image(seed=seed)
+    for ibar in range(1, 111):
+        img[0].header["CSUP{}".format(ibar)] = 150.0 + offset
+    return img
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    mos_library._rectwv_coeff_cache.clear()
+    calls = []
+
+    def fake_rectwv_coeff_from_mos_library(reduced_image, master_rectwv, *args):
+        calls.append(reduced_image)
+        return create_rectwv_coeff(nc2=200)
+
+    monkeypatch.setattr(
+        mos_library, "rectwv_coeff_from_mos_library", fake_rectwv_coeff_from_mos_library
+    )
+    yield calls
+    mos_library._rectwv_coeff_cache.clear()
+
+
+def test_mos_library_signature():
+    master_rectwv = MasterRectWave(instrument="EMIR")
+    signature = mos_library.mos_library_signature(create_csu_image(), master_rectwv)
+    # the signature does not depend on the image data
+    assert signature == mos_library.mos_library_signature(
+        create_csu_image(seed=1), master_rectwv
+    )
+    assert signature != mos_library.mos_library_signature(
+        create_csu_image(offset=1.0), master_rectwv
+    )
+    assert signature != mos_library.mos_library_signature(
+        create_csu_image(), MasterRectWave(instrument="EMIR")
+    )
+
+
+def test_get_rectwv_coeff_from_mos_library(calls, tmp_path):
+    master_rectwv = MasterRectWave(instrument="EMIR")
+    rectwv_coeff1 = mos_library.get_rectwv_coeff_from_mos_library(
+        create_csu_image(), master_rectwv, cache_dir=str(tmp_path)
+    )
+    rectwv_coeff1.global_integer_offset_x_pix = 3
+    rectwv_coeff2 = mos_library.get_rectwv_coeff_from_mos_library(
+        create_csu_image(seed=1), master_rectwv
+    )
+    assert len(calls) == 1
+    assert rectwv_coeff2 is not rectwv_coeff1
+    assert rectwv_coeff2.uuid == rectwv_coeff1.uuid
+    assert rectwv_coeff2.global_integer_offset_x_pix == 0
+    mos_library.get_rectwv_coeff_from_mos_library(
+        create_csu_image(offset=1.0), master_rectwv
+    )
+    assert len(calls) == 2
+
+    # read from disk in a new session
+    mos_library._rectwv_coeff_cache.clear()
+    rectwv_coeff3 = mos_library.get_rectwv_coeff_from_mos_library(
+        create_csu_image(), master_rectwv, cache_dir=str(tmp_path)
+    )
+    assert len(calls) == 2
+    assert rectwv_coeff3.uuid == rectwv_coeff1.uuid
+    assert rectwv_coeff3.contents[1]["ttd_aij"] == rectwv_coeff2.contents[1]["ttd_aij"]
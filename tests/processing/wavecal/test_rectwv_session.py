@@ -0,0 +1,117 @@
+import numpy
+import pytest
+
+from emirdrp.processing.wavecal.apply_rectwv_coeff import apply_rectwv_coeff
+import emirdrp.processing.wavecal.rectification_operator as rectop
+import emirdrp.processing.wavecal.rectwv_coeff_from_mos_library as mos_library
+import emirdrp.processing.wavecal.rectwv_session as rectwv_session
+from emirdrp.products import MasterRectWave
+from emirdrp.recipes.spec.abba import ABBASpectraFastRectwv
+from emirdrp.recipes.spec.sky import SkySpecRecipe
+from emirdrp.recipes.spec.stare import StareSpectraRectwv
+from emirdrp.testing.create_rectwv import create_mos_image
+from emirdrp.testing.create_rectwv import create_rectwv_coeff
+
+
+def create_csu_image(seed=291):
+    img = create_mos_image(seed=seed)
+    for ibar in range(1, 111):
+        img[0].header["CSUP{}".format(ibar)] = 150.0
+    return img
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    mos_library._rectwv_coeff_cache.clear()
+    calls = []
+
+    def fake_rectwv_coeff_from_mos_library(reduced_image, master_rectwv, *args):
+        calls.append(reduced_image)
+        return create_rectwv_coeff(missing_slitlets=[1, 55], nc2=100)
+
+    monkeypatch.setattr(
+        mos_library, "rectwv_coeff_from_mos_library", fake_rectwv_coeff_from_mos_library
+    )
+    yield calls
+    mos_library._rectwv_coeff_cache.clear()
+
+
+def test_session_rectwv_coeff(calls):
+    session = rectwv_session.RectWaveSession()
+    master_rectwv = MasterRectWave(instrument="EMIR")
+    rectwv_coeff1 = session.rectwv_coeff_from_mos_library(
+        create_csu_image(), master_rectwv
+    )
+    # the module cache is not needed within the session
+    mos_library._rectwv_coeff_cache.clear()
+    rectwv_coeff2 = session.rectwv_coeff_from_mos_library(
+        create_csu_image(seed=1), master_rectwv
+    )
+    assert len(calls) == 1
+    assert rectwv_coeff2 is not rectwv_coeff1
+    assert rectwv_coeff2.uuid == rectwv_coeff1.uuid
+    assert session.info() == rectwv_session.SessionInfo(1, 1, 0, 0, 1)
+
+    session.clear()
+    assert session.info() == rectwv_session.SessionInfo(0, 0, 0, 0, 0)
+
+
+def test_session_apply_rectwv_coeff():
+    rectwv_coeff = create_rectwv_coeff(missing_slitlets=[1, 55], nc2=100)
+    expected = apply_rectwv_coeff(create_mos_image(), rectwv_coeff)
+    # by default, the images are rectified directly
+    session = rectwv_session.RectWaveSession()
+    computed = session.apply_rectwv_coeff(create_mos_image(), rectwv_coeff)
+    assert numpy.array_equal(computed[0].data, expected[0].data)
+    assert session.info().operator_misses == 0
+
+    session = rectwv_session.RectWaveSession(use_rectification_operator=True)
+    for _ in range(2):
+        computed = session.apply_rectwv_coeff(create_mos_image(), rectwv_coeff)
+        assert numpy.allclose(computed[0].data, expected[0].data, rtol=1e-5)
+    info = session.info()
+    assert (info.operator_hits, info.operator_misses) == (1, 1)
+    # the operator is kept by the session
+    rectop._operator_cache.clear()
+    operator = session.rectification_operator(rectwv_coeff, 2)
+    assert operator is session.rectification_operator(rectwv_coeff, 2)
+
+
+def test_get_rectwv_session():
+    rectwv_session.set_rectwv_session(None)
+    session = rectwv_session.get_rectwv_session()
+    assert rectwv_session.get_rectwv_session() is session
+    newsession = rectwv_session.RectWaveSession(use_rectification_operator=True)
+    rectwv_session.set_rectwv_session(newsession)
+    assert rectwv_session.get_rectwv_session() is newsession
+    rectwv_session.set_rectwv_session(None)
+
+
+def test_configure_rectwv_session(calls, tmp_path):
+    rectwv_session.set_rectwv_session(None)
+    session = rectwv_session.get_rectwv_session()
+    session.rectwv_coeff_from_mos_library(
+        create_csu_image(), MasterRectWave(instrument="EMIR")
+    )
+    configured = rectwv_session.configure_rectwv_session(
+        use_rectification_operator=True, cache_dir=str(tmp_path)
+    )
+    # the coefficients of the session are preserved
+    assert configured is session
+    assert session.info().currsize == 1
+    assert session.use_rectification_operator
+    assert session.cache_dir == str(tmp_path)
+    rectwv_session.configure_rectwv_session()
+    assert not session.use_rectification_operator
+    assert session.cache_dir is None
+    rectwv_session.set_rectwv_session(None)
+
+
+@pytest.mark.parametrize(
+    "recipe_class",
+    [SkySpecRecipe, StareSpectraRectwv, ABBASpectraFastRectwv],
+)
+def test_recipes_rectwv_session_parameters(recipe_class):
+    requirements = recipe_class.requirements()
+    assert requirements["use_rectification_operator"].default_value() is False
+    assert requirements["rectwv_cache_dir"].default_value() == ""
@@ -0,0 +1,98 @@
+import json
+
+import numpy
+import pytest
+
+from numina.util.jsonencoder import ExtEncoder
+
+from emirdrp.products import MasterRectWave
+from emirdrp.products import RectWaveCoeff
+from emirdrp.processing.wavecal.rectwv_storage import RectWaveStorage
+from emirdrp.processing.wavecal.rectwv_storage import convert_rectwv_storage
+from emirdrp.processing.wavecal.rectwv_storage import load_rectwv_npz
+from emirdrp.processing.wavecal.rectwv_storage import save_rectwv_npz
+from emirdrp.testing.create_rectwv import create_rectwv_coeff
+
+
+def json_state(obj):
+    return json.loads(json.dumps(obj.__getstate__(), cls=ExtEncoder))
+
+
+def create_master_rectwv():
+    master_rectwv = MasterRectWave(instrument="EMIR")
+    master_rectwv.tags = {"grism": "J", "filter": "J"}
+    master_rectwv.total_slitlets = 3
+    master_rectwv.missing_slitlets = [2]
+    master_rectwv.contents = [
+        {
+            "islitlet": 1,
+            "bb_nc1_orig": 1,
+            "list_csu_bar_slit_center": [10.5, 20.25, 30.0],
+            "list_spectrails": [[1.0, 2.0], [3.0, 4.0]],
+            "ttd_order": 2,
+            "wpoly_degree": 3,
+        },
+        {
+            "islitlet": 2,
+            "bb_nc1_orig": 0,
+            "list_csu_bar_slit_center": [],
+            "ttd_order": 0,
+        },
+        {
+            "islitlet": 3,
+            "bb_nc1_orig": 7,
+            "list_csu_bar_slit_center": [11.0, 12.0],
+            "list_spectrails": [[5.0]],
+            "ttd_order": 1,
+            "wpoly_degree": None,
+        },
+    ]
+    return master_rectwv
+
+
+@pytest.mark.parametrize(
+    "obj",
+    [create_rectwv_coeff(missing_slitlets=[3, 7]), create_master_rectwv()],
+    ids=["rectwv_coeff", "master_rectwv"],
+)
+def test_rectwv_storage_roundtrip(obj, tmp_path):
+    filename = tmp_path / "coeff.npz"
+    save_rectwv_npz(obj, filename)
+    result = load_rectwv_npz(filename)
+    assert type(result) is type(obj)
+    assert json.dumps(json_state(result)) == json.dumps(json_state(obj))
+
+
+def test_rectwv_storage_lazy(tmp_path):
+    rectwv_coeff = create_rectwv_coeff(missing_slitlets=[3])
+    filename = tmp_path / "coeff.npz"
+    save_rectwv_npz(rectwv_coeff, filename)
+    with RectWaveStorage(filename) as storage:
+        assert storage.nslitlets == len(rectwv_coeff.contents)
+        assert storage.slitlet(5) == rectwv_coeff.contents[4]
+        data, present, length = storage.array("ttd_aij")
+        assert data.dtype == numpy.float64
+        assert data.flags.c_contiguous
+        assert not data.flags.writeable
+        assert not present[2] and present.sum() == storage.nslitlets - 1
+        assert list(data[0, : length[0]]) == rectwv_coeff.contents[0]["ttd_aij"]
+        data, _, length = storage.array("spectrail/poly_coef_lower")
+        assert length is not None
+        data, _, length = storage.array("islitlet")
+        assert length is None
+        assert data.tolist() == list(range(1, storage.nslitlets + 1))
+        with pytest.raises(ValueError):
+            storage.slitlet(0)
+
+
+def test_convert_rectwv_storage(tmp_path):
+    rectwv_coeff = create_rectwv_coeff()
+    json_file = str(tmp_path / "coeff.json")
+    npz_file = str(tmp_path / "coeff.npz")
+    json_file2 = str(tmp_path / "coeff2.json")
+    rectwv_coeff.writeto(json_file)
+    convert_rectwv_storage(json_file, npz_file)
+    convert_rectwv_storage(npz_file, json_file2)
+    with open(json_file) as fd1, open(json_file2) as fd2:
+        assert json.load(fd1) == json.load(fd2)
+    assert isinstance(RectWaveCoeff._datatype_load(json_file2), RectWaveCoeff)
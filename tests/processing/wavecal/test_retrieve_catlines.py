@@ -0,0 +1,61 @@
+import pkgutil
+from io import StringIO
+
+import numpy as np
+import pytest
+
+from emirdrp.processing.wavecal.retrieve_catlines import retrieve_catlines
+from emirdrp.processing.wavecal.retrieve_catlines import retrieve_catlines_range
+
+
+def genfromtxt_catalogue(catlines_file):
+    dumdata = pkgutil.get_data("emirdrp.instrument.configs", catlines_file)
+    return np.genfromtxt(StringIO(dumdata.decode("utf8")))
+
+
+@pytest.mark.parametrize(
+    "mode, grism_name, catlines_file",
+    [
+        (1, "J", "lines_argon_neon_xenon_empirical.dat"),
+        (2, "LR", "lines_argon_neon_xenon_empirical_LR.dat"),
+    ],
+)
+def test_retrieve_catlines_arc(mode, grism_name, catlines_file):
+    catlines = genfromtxt_catalogue(catlines_file)
+    wave, flux = retrieve_catlines(mode, grism_name)
+    assert np.array_equal(wave, catlines[:, 0])
+    assert np.array_equal(flux, catlines[:, 1])
+
+
+def test_retrieve_catlines_oh():
+    catlines = genfromtxt_catalogue("Oliva_etal_2013.dat")
+    wave, flux = retrieve_catlines(11, "H")
+    assert np.array_equal(wave, np.concatenate((catlines[:, 1], catlines[:, 0])))
+    assert np.array_equal(flux, np.concatenate((catlines[:, 2], catlines[:, 2])))
+
+
+def test_retrieve_catlines_cached_readonly():
+    wave1, flux1 = retrieve_catlines(12, "K")
+    wave2, flux2 = retrieve_catlines(11, "H")
+    assert wave1 is wave2
+    assert flux1 is flux2
+    assert wave1.flags.c_contiguous
+    assert not wave1.flags.writeable
+    with pytest.raises(ValueError):
+        wave1[0] = 0.0
+
+
+def test_retrieve_catlines_range():
+    wave, flux = retrieve_catlines(11, "H")
+    wave_min, wave_max = 15000.0, 16500.0
+    lok = (wave >= wave_min) & (wave <= wave_max)
+    wave_range, flux_range = retrieve_catlines_range(11, "H", wave_min, wave_max)
+    isort = np.argsort(wave[lok], kind="stable")
+    assert np.array_equal(wave_range, wave[lok][isort])
+    assert np.array_equal(flux_range, flux[lok][isort])
+    assert not flux_range.flags.writeable
+
+
+def test_retrieve_catlines_invalid_mode():
+    with pytest.raises(ValueError):
+        retrieve_catlines(3, "J")
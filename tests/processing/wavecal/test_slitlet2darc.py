@@ -0,0 +1,63 @@
+import pickle
+
+import numpy
+from numina.array.ccd_line import ArcLine
+from scipy import ndimage
+
+from emirdrp.instrument.csu_configuration import CsuConfiguration
+from emirdrp.processing.wavecal.slitlet2darc import Slitlet2dArc
+from emirdrp.processing.wavecal.slitlet2darc import fit_arc_lines
+
+
+def test_slitlet2darc_pickle():
+    header = {"CSUP{}".format(ibar): 150.0 for ibar in range(1, 111)}
+    csu_conf = CsuConfiguration.define_from_header(header)
+    slt = Slitlet2dArc(
+        islitlet=3, csu_conf=csu_conf, ymargin_bb=2, params=None, parmodel=None
+    )
+    slt2 = pickle.loads(pickle.dumps(slt))
+    assert slt2.islitlet == 3
+    assert slt2.csu_bar_slit_center == slt.csu_bar_slit_center
+    assert slt2.y0_frontier_lower_expected == slt.y0_frontier_lower_expected
+
+
+def create_labels2d():
+    # tilted arc lines in a 40x200 slitlet
+    image2d = numpy.zeros((40, 200))
+    yy = numpy.arange(40)
+    for k, x0 in enumerate([20.0, 60.0, 110.0, 170.0]):
+        xx = x0 + (0.02 * (k + 1)) * (yy - 20)
+        for ix in range(-1, 2):
+            image2d[yy, numpy.round(xx).astype(int) + ix] = 100.0 * (2 - abs(ix))
+    return image2d
+
+
+def test_fit_arc_lines():
+    image2d = create_labels2d()
+    labels2d, nobjects = ndimage.label(image2d > 0)
+    assert nobjects == 4
+    slices = ndimage.find_objects(labels2d)
+    bbox = numpy.array(
+        [[slc[0].start, slc[0].stop, slc[1].start, slc[1].stop] for slc in slices]
+    )
+    list_labels = [1, 3, 4]
+    first_pixel = (100, 300)
+    list_arc_lines = fit_arc_lines(
+        labels2d, list_labels, image2d, bbox[[0, 2, 3]], first_pixel
+    )
+    for label, arc_line in zip(list_labels, list_arc_lines):
+        ii, jj = numpy.where(labels2d == label)
+        expected = ArcLine()
+        expected.fit(
+            x=jj + first_pixel[0],
+            y=ii + first_pixel[1],
+            deg=1,
+            w=image2d[ii, jj],
+            y_vs_x=False,
+        )
+        assert numpy.allclose(arc_line.poly_funct.coef, expected.poly_funct.coef)
+        for attr in ["bb_nc1_orig", "bb_nc2_orig", "bb_ns1_orig", "bb_ns2_orig"]:
+            assert getattr(arc_line, attr) == getattr(expected, attr)
+        assert numpy.isclose(arc_line.xlower_line, expected.xlower_line)
+        assert numpy.isclose(arc_line.xupper_line, expected.xupper_line)
+    assert fit_arc_lines(labels2d, [], image2d, bbox[:0], first_pixel) == []
@@ -0,0 +1,54 @@
+import numpy
+from numpy.polynomial import Polynomial
+
+from emirdrp.processing.wavecal.slitlet_geometry import ds9_polylines
+from emirdrp.processing.wavecal.slitlet_geometry import eval_polynomials
+from emirdrp.processing.wavecal.slitlet_geometry import plot_polylines
+
+
+def test_eval_polynomials():
+    list_poly = [
+        [10.0],
+        [1.0, 2.0e-3, -1.0e-7],
+        Polynomial([3.0, 0.5]),
+        Polynomial([1.0, 2.0, 3.0], domain=[0, 100]),
+    ]
+    xdum = numpy.linspace(1, 2048, num=100)
+    ydum = eval_polynomials(list_poly, xdum)
+    assert ydum.shape == (4, 100)
+    for poly, ydum_row in zip(list_poly, ydum):
+        if not isinstance(poly, Polynomial):
+            poly = Polynomial(poly)
+        assert numpy.allclose(ydum_row, poly(xdum), rtol=1e-12)
+    # exact values for polynomials with the default domain
+    assert numpy.array_equal(ydum[1], Polynomial(list_poly[1])(xdum))
+    assert eval_polynomials(list_poly, 1024.5).shape == (4,)
+
+
+def test_ds9_polylines():
+    xdum = numpy.linspace(1, 2048, num=10)
+    ydum = numpy.array([xdum * 0.01 + 5, xdum**2 * 1e-5])
+    list_output = ds9_polylines(xdum, ydum, ["#ff00ff", "#00ffff"])
+    for output, ydum_row, color in zip(list_output, ydum, ["#ff00ff", "#00ffff"]):
+        expected = ""
+        for i in range(len(xdum) - 1):
+            expected += "line {0} {1} {2} {3}".format(
+                xdum[i], ydum_row[i], xdum[i + 1], ydum_row[i + 1]
+            )
+            expected += " # color={0}\n".format(color)
+        assert output == expected
+
+
+def test_plot_polylines():
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots()
+    xdum = numpy.arange(5.0)
+    ydum = numpy.arange(15.0).reshape(3, 5)
+    plot_polylines(ax, xdum, ydum, ["m", "c", "m"], "--")
+    assert len(ax.lines) == 3
+    assert sorted(line.get_color() for line in ax.lines) == ["c", "m", "m"]
+    plt.close(fig)
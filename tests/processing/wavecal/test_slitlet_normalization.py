@@ -0,0 +1,93 @@
+import numpy
+import pytest
+from numpy.polynomial import Polynomial
+
+from emirdrp.core import EMIR_NAXIS2
+from emirdrp.processing.wavecal.slitlet_normalization import frontier_scan_limits
+from emirdrp.processing.wavecal.slitlet_normalization import insert_slitlet
+from emirdrp.processing.wavecal.slitlet_normalization import normalize_slitlet
+from emirdrp.processing.wavecal.slitlet_normalization import scale_rows
+from emirdrp.tools.nscan_minmax_frontiers import nscan_minmax_frontiers
+from emirdrp.tools.nscan_minmax_frontiers import nscan_minmax_frontiers_array
+
+
+@pytest.mark.parametrize("dtype", [numpy.float64, numpy.float32])
+def test_normalize_slitlet(dtype):
+    rng = numpy.random.default_rng(1234)
+    slitlet2d = rng.uniform(1.0, 2.0, size=(10, 30)).astype(dtype)
+    den = rng.uniform(0.5, 1.5, size=(10, 30))
+    den[rng.uniform(size=den.shape) < 0.3] = 0
+    expected = numpy.zeros_like(slitlet2d)
+    for j in range(30):
+        for i in range(10):
+            if den[i, j] == 0:
+                expected[i, j] = 1.0
+            else:
+                expected[i, j] = slitlet2d[i, j] / den[i, j]
+    result = normalize_slitlet(slitlet2d, den)
+    assert result.dtype == expected.dtype
+    assert result.tobytes() == expected.tobytes()
+
+
+def test_normalize_slitlet_shape():
+    with pytest.raises(ValueError):
+        normalize_slitlet(numpy.ones((3, 4)), numpy.ones((4, 3)))
+
+
+def test_scale_rows():
+    image2d = numpy.arange(12.0).reshape(3, 4)
+    factors = numpy.array([1.0, 2.0, 0.5])
+    expected = image2d * numpy.array([[1.0], [2.0], [0.5]])
+    assert numpy.array_equal(scale_rows(image2d, factors), expected)
+    scale_rows(image2d, factors, out=image2d)
+    assert numpy.array_equal(image2d, expected)
+    spectrum = numpy.arange(4.0)
+    assert numpy.array_equal(scale_rows(spectrum, factors), factors[:, None] * spectrum)
+
+
+@pytest.mark.parametrize("y0", [-3.5, 10.0, 100.25, EMIR_NAXIS2 - 10.5])
+def test_frontier_scan_limits(y0):
+    list_frontiers = [Polynomial([y0, 0.01, -1e-5]), Polynomial([y0 + 30, 0.01, -1e-5])]
+    n1, n2 = frontier_scan_limits(list_frontiers, naxis1=100)
+    for j in range(100):
+        expected = nscan_minmax_frontiers(
+            list_frontiers[0](j + 1), list_frontiers[1](j + 1), resize=True
+        )
+        assert (n1[j], n2[j]) == expected
+
+
+def test_nscan_minmax_frontiers_array_errors():
+    with pytest.raises(ValueError):
+        nscan_minmax_frontiers_array([0.5, -2.0], [20.0, 30.0])
+    with pytest.raises(ValueError):
+        nscan_minmax_frontiers_array([10.0], [EMIR_NAXIS2 + 5.0])
+
+
+@pytest.mark.parametrize("force_lower", [True, False])
+@pytest.mark.parametrize("force_upper", [True, False])
+def test_insert_slitlet(force_lower, force_upper):
+    rng = numpy.random.default_rng(1234)
+    naxis2, naxis1, bb_ns1_orig = 80, 40, 15
+    n1 = rng.integers(17, 22, size=naxis1)
+    n2 = rng.integers(45, 52, size=naxis1)
+    slitlet2d = rng.uniform(size=(45, naxis1))
+    image2d = numpy.zeros((naxis2, naxis1))
+    expected = image2d.copy()
+    for j in range(naxis1):
+        nn1 = n1[j] - bb_ns1_orig + 1
+        nn2 = n2[j] - bb_ns1_orig + 1
+        expected[(n1[j] - 1) : n2[j], j] = slitlet2d[(nn1 - 1) : nn2, j]
+        if force_lower:
+            expected[(n1[j] - 1) : (n1[j] + 2), j] = 1
+        if force_upper:
+            expected[(n2[j] - 5) : n2[j], j] = 1
+    insert_slitlet(
+        image2d,
+        slitlet2d,
+        bb_ns1_orig,
+        n1,
+        n2,
+        force_lower=force_lower,
+        force_upper=force_upper,
+    )
+    assert numpy.array_equal(image2d, expected)
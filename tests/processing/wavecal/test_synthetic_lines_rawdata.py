@@ -0,0 +1,65 @@
+import numpy
+import pytest
+
+from emirdrp.core import EMIR_NAXIS1
+from emirdrp.processing.wavecal.synthetic_lines_rawdata import render_lines
+from emirdrp.processing.wavecal.synthetic_lines_rawdata import synthetic_lines_rawdata
+from emirdrp.processing.wavecal.synthetic_lines_rawdata import wpoly_roots
+from emirdrp.testing.create_rectwv import create_rectwv_coeff
+
+
+@pytest.mark.parametrize(
+    "wpoly_coeff",
+    [[15000.0, 0.75], [15000.0, 0.75, 1.0e-6, -1.0e-10], [15000.0, 1.0, -2.0e-4]],
+)
+def test_wpoly_roots(wpoly_coeff):
+    waves = numpy.linspace(14500.0, 17500.0, 101)
+    xroots, iline = wpoly_roots(wpoly_coeff, waves)
+    expected = []
+    for i, wave in enumerate(waves):
+        tmp_coeff = numpy.array(wpoly_coeff)
+        tmp_coeff[0] -= wave
+        for dum in numpy.polynomial.Polynomial(tmp_coeff).roots():
+            if numpy.isreal(dum) and 1 <= dum.real <= EMIR_NAXIS1:
+                expected.append((i, dum.real))
+    expected.sort()
+    computed = sorted(zip(iline, xroots))
+    assert [i for i, _ in computed] == [i for i, _ in expected]
+    assert numpy.allclose([x for _, x in computed], [x for _, x in expected])
+
+
+def test_render_lines_flux():
+    image = numpy.zeros((100, 200))
+    flux = numpy.array([10.0, 5.0])
+    render_lines(
+        image,
+        numpy.array([50.3, 120.0]),
+        numpy.array([10.0, 20.25]),
+        numpy.array([52.7, 120.0]),
+        numpy.array([40.0, 30.75]),
+        flux,
+        sigma_gauss_pix=1.5,
+        nside_pix=8,
+    )
+    # the end rows receive fractional contributions
+    assert numpy.isclose(image[:, :100].sum(), 10.0 * 31.0)
+    assert numpy.isclose(image[:, 100:].sum(), 5.0 * 11.5)
+    assert image[25, 100:].argmax() == 120 - 1 - 100
+
+
+def test_synthetic_lines_rawdata():
+    rectwv_coeff = create_rectwv_coeff(missing_slitlets=[3])
+    crval1 = rectwv_coeff.contents[0]["crval1_linear"]
+    cdelt1 = rectwv_coeff.contents[0]["cdelt1_linear"]
+    wave = crval1 + 1000.0 * cdelt1
+    image = synthetic_lines_rawdata(
+        numpy.array([wave]), numpy.array([1.0]), [1], rectwv_coeff
+    )
+    assert image.sum(axis=0).argmax() == 1000
+    rows = numpy.nonzero(image.sum(axis=1))[0]
+    assert rows.min() >= rectwv_coeff.contents[0]["bb_ns1_orig"] - 1
+    assert rows.max() <= rectwv_coeff.contents[0]["bb_ns2_orig"] - 1
+    empty = synthetic_lines_rawdata(
+        numpy.array([]), numpy.array([]), [1, 2], rectwv_coeff
+    )
+    assert not empty.any()
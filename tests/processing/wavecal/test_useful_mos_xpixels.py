@@ -0,0 +1,33 @@
+import astropy.io.fits as fits
+import numpy
+
+import emirdrp.processing.wavecal.useful_mos_xpixels as uxp
+
+
+def create_header():
+    header = fits.Header()
+    header["naxis1"] = 100
+    header["naxis2"] = 200
+    header["crpix1"] = 1.0
+    header["crval1"] = 10000.0
+    header["cdelt1"] = 10.0
+    for islitlet in range(1, 56):
+        header["jmnslt{:02d}".format(islitlet)] = 5
+        header["jmxslt{:02d}".format(islitlet)] = 90
+    return header
+
+
+def test_cached_useful_mos_xpixels():
+    uxp._xpixels_cache.clear()
+    header = create_header()
+    kwargs = dict(vpix_region=(20, 30), list_valid_wvregions=[[10100.0, 10200.0]])
+    xisok = uxp.cached_useful_mos_xpixels(header, **kwargs)
+    expected = uxp.useful_mos_xpixels(None, header, **kwargs)
+    assert numpy.array_equal(xisok, expected)
+    assert numpy.count_nonzero(xisok) == 11
+    xisok[:] = False
+    assert numpy.array_equal(uxp.cached_useful_mos_xpixels(header, **kwargs), expected)
+    assert len(uxp._xpixels_cache) == 1
+    header["crval1"] = 10050.0
+    uxp.cached_useful_mos_xpixels(header, **kwargs)
+    assert len(uxp._xpixels_cache) == 2
@@ -81,3 +81,43 @@ def test_init_aggregate_result(nimages):
     assert frame_hdul[0].header["NUM-NCOM"] == nimages * nstare
 
     assert numpy.allclose(frame_hdul[0].data, accum_hdul[0].data)
+
+
+def test_join_accum_warm_cold():
+    import emirdrp.processing.accumulator as acc
+
+    nimages = 3
+    nstare = 3
+    exptime = 105.0
+    starttime = 1030040001.00034
+    crpix = dither_pattern([50, 50], 0.0, 20.0, nimages)
+    list_obsresult = []
+    for naccum in range(1, 5):
+        obsresult = create_ob_1(
+            13.0 * naccum, nimages, crpix, nstare, exptime, starttime
+        )
+        obsresult.naccum = naccum
+        list_obsresult.append(obsresult)
+        starttime += exptime * (nimages + 1)
+
+    # rounds using the accumulator of the previous round, or initializing
+    # it from the accumulated result
+    recipe = JoinDitheredImagesRecipe()
+    results = {}
+    for cold in [False, True]:
+        acc._accumulators.clear()
+        prev_accum = None
+        results[cold] = []
+        for obsresult in list_obsresult:
+            if cold:
+                acc._accumulators.clear()
+            result = recipe(recipe.create_input(obresult=obsresult, accum=prev_accum))
+            prev_accum = result.accum
+            results[cold].append(result.accum.open())
+    acc._accumulators.clear()
+
+    for warm_hdul, cold_hdul in zip(results[False][1:], results[True][1:]):
+        for extname in ["PRIMARY", "VARIANCE", "MAP"]:
+            assert numpy.array_equal(warm_hdul[extname].data, cold_hdul[extname].data)
+    assert results[False][-1][0].header["NACCUM"] == 4
+    assert results[False][-1]["MAP"].data.max() == 4
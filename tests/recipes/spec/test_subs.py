@@ -143,3 +143,123 @@ def test_accum_spec(naccum):
     assert frame_hdul[0].header["TSUTC1"] == starttime
     assert accum_hdul[0].header["NUM-NCOM"] == nimages * nstare * naccum
     assert accum_hdul[0].header["TSUTC1"] == starttime
+
+
+def test_accum_spec_registry():
+    import emirdrp.processing.accumulator as acc
+
+    value = 13.0
+    starttime = 1030040001.00034
+    exptime = 105.0
+    recipe = BaseABBARecipe()
+    obsresult = create_ob_abba(value, exptime, starttime)
+    obsresult.naccum = 1
+    result1 = recipe.run(recipe.create_input(obresult=obsresult))
+    obsresult = create_ob_abba(2 * value, exptime, starttime)
+    obsresult.naccum = 2
+    obsresult.accum = result1.accum
+    result2 = recipe.run(recipe.create_input(obresult=obsresult))
+
+    # the same round, using the accumulator of the previous round or
+    # initializing it from the accumulated image
+    accum2 = result2.accum.open()
+    results = []
+    for clear in [False, True]:
+        if clear:
+            acc._accumulators.clear()
+        numpy.random.seed(1234)
+        obsresult = create_ob_abba(3 * value, exptime, starttime)
+        obsresult.naccum = 3
+        obsresult.accum = result2.accum
+        results.append(recipe.run(recipe.create_input(obresult=obsresult)))
+    data = [result.accum.open()[0].data for result in results]
+    assert numpy.allclose(data[0], data[1], rtol=0, atol=1e-3)
+    assert data[0].dtype == numpy.float32
+    assert results[0].accum.open()[0].header["NUM-NCOM"] == 6
+    assert accum2[0].header["UUID"] != results[0].accum.open()[0].header["UUID"]
+
+
+def test_accum_spec_registry_failed_round(monkeypatch):
+    import emirdrp.processing.accumulator as acc
+
+    value = 13.0
+    starttime = 1030040001.00034
+    exptime = 105.0
+    recipe = BaseABBARecipe()
+    results = []
+    for naccum in [1, 2]:
+        obsresult = create_ob_abba(naccum * value, exptime, starttime)
+        obsresult.naccum = naccum
+        if results:
+            obsresult.accum = results[-1].accum
+        results.append(recipe.run(recipe.create_input(obresult=obsresult)))
+
+    def run_round3():
+        numpy.random.seed(1234)
+        obsresult = create_ob_abba(3 * value, exptime, starttime)
+        obsresult.naccum = 3
+        obsresult.accum = results[-1].accum
+        return recipe.run(recipe.create_input(obresult=obsresult))
+
+    # a round that fails after adding the frame, and is retried
+    with monkeypatch.context() as m:
+
+        def fail(*args, **kwargs):
+            raise RuntimeError("failed")
+
+        m.setattr(recipe, "create_accum_hdulist", fail)
+        with pytest.raises(RuntimeError):
+            run_round3()
+    computed = run_round3().accum.open()[0].data
+    acc._accumulators.clear()
+    expected = run_round3().accum.open()[0].data
+    assert numpy.allclose(computed, expected, rtol=0, atol=1e-3)
+
+
+def test_accum_spec_warm_cold():
+    import astropy.io.fits as fits
+    import emirdrp.processing.accumulator as acc
+
+    rng = numpy.random.default_rng(4321)
+    frames = []
+    for naccum in range(1, 5):
+        hdu = fits.PrimaryHDU(rng.normal(10.0, 2.0, size=(20, 30)).astype("float32"))
+        for key, value in [("NUM-NCOM", 2), ("TSUTC1", 1.0), ("TSUTC2", 2.0)]:
+            hdu.header[key] = value
+        bpm = numpy.zeros((20, 30), dtype="uint8")
+        if naccum in [2, 3]:
+            bpm[4, 5] = 1
+        hdul = fits.HDUList([hdu, fits.ImageHDU(bpm, name="BPM")])
+        frames.append(numina.core.DataFrame(frame=hdul))
+
+    # rounds using the accumulator of the previous round, or initializing
+    # it from the accumulated result
+    recipe = BaseABBARecipe()
+    results = {}
+    for cold in [False, True]:
+        acc._accumulators.clear()
+        accum = frames[0]
+        results[cold] = []
+        for naccum, frame in enumerate(frames[1:], start=2):
+            if cold:
+                acc._accumulators.clear()
+            result = recipe.aggregate2(accum, frame, naccum)
+            results[cold].append(result)
+            accum = numina.core.DataFrame(frame=result)
+    acc._accumulators.clear()
+
+    for warm_result, cold_result in zip(results[False], results[True]):
+        for extname in ["PRIMARY", "VARIANCE", "MAP"]:
+            assert numpy.array_equal(
+                warm_result[extname].data, cold_result[extname].data
+            )
+    result = results[False][-1]
+    stack = numpy.ma.array(
+        [frame.frame[0].data for frame in frames],
+        mask=[frame.frame["BPM"].data for frame in frames],
+    )
+    assert numpy.allclose(result[0].data, stack.mean(axis=0), rtol=1e-6)
+    assert numpy.allclose(result["VARIANCE"].data, stack.var(axis=0, ddof=1), rtol=1e-5)
+    assert result["MAP"].data[4, 5] == 2
+    assert result["MAP"].data[0, 0] == 4
+    assert result[0].header["NACCUM"] == 4
@@ -0,0 +1,52 @@
+import astropy.io.fits as fits
+import numpy
+import pytest
+from numina.types.dataframe import DataFrame
+
+from emirdrp.datamodel import EmirDataModel
+
+
+@pytest.fixture
+def hdulist():
+    return fits.HDUList(
+        [
+            fits.PrimaryHDU(numpy.arange(12.0).reshape(3, 4)),
+            fits.ImageHDU(numpy.zeros((3, 4), dtype="uint8"), name="BPM"),
+            fits.ImageHDU(numpy.arange(4, dtype="uint16").reshape(2, 2), name="RAW"),
+        ]
+    )
+
+
+def test_read_frame_file(tmp_path, hdulist):
+    filename = tmp_path / "frame.fits"
+    hdulist.writeto(filename)
+    datamodel = EmirDataModel()
+    result = datamodel.read_frame(DataFrame(filename=str(filename)))
+    # the image can be modified, the file remains unchanged
+    result[0].data += 1
+    result[0].header["TEST"] = 1
+    assert numpy.array_equal(result[0].data, hdulist[0].data + 1)
+    # scaled data are decoded
+    assert numpy.array_equal(result["RAW"].data, hdulist["RAW"].data)
+    with fits.open(filename) as saved:
+        assert numpy.array_equal(saved[0].data, hdulist[0].data)
+        assert "TEST" not in saved[0].header
+
+
+def test_read_frame_memory(hdulist):
+    datamodel = EmirDataModel()
+    result = datamodel.read_frame(DataFrame(frame=hdulist))
+    result[0].data += 1
+    assert numpy.array_equal(result[0].data, hdulist[0].data + 1)
+
+
+def test_copy_hdulist(hdulist):
+    datamodel = EmirDataModel()
+    result = datamodel.copy_hdulist(hdulist)
+    assert numpy.shares_memory(result["BPM"].data, hdulist["BPM"].data)
+    with pytest.raises(ValueError):
+        result[0].data += 1
+    result[0].data = numpy.ones((3, 4))
+    result[0].header["TEST"] = 1
+    assert hdulist[0].data[0, 0] == 0
+    assert "TEST" not in hdulist[0].header